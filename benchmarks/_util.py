@@ -0,0 +1,105 @@
+"""基准测试的公共工具"""
+import os
+import sys
+import time
+import typing as t
+
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# 直接运行 benchmarks 下的脚本时，保证可以导入仓库中的 miniapi
+sys.path.insert(0, os.path.dirname(ROOT_PATH))
+
+from miniapi.testing import make_environ, start_response  # noqa: E402
+
+__all__ = ['ROOT_PATH', 'bench', 'make_environ', 'report', 'start_response']
+
+
+def bench(func: t.Callable[[], t.Any], number: int = 10000, repeat: int = 5) -> float:
+    """返回单次调用的最优耗时（微秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1e6
+
+
+def report(name: str, micros: float):
+    print(f'{name:<48} {micros:>10.3f} us')  # noqa
+
+
+# 机器可读结果的格式版本，格式变化时递增
+RESULTS_VERSION = 1
+
+
+def metadata() -> dict:
+    """运行环境信息，写入结果文件便于对比时确认两次运行的环境是否一致"""
+    import datetime
+    import platform
+    import subprocess
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_PATH, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'commit': commit,
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def result(name: str, group: str, value: float, unit: str = 'us', better: str = 'lower', **extra) -> dict:
+    """一条测量结果，better表示数值越低(lower)或越高(higher)越好"""
+    return {'name': name, 'group': group, 'value': value, 'unit': unit, 'better': better, **extra}
+
+
+def write_results(results: t.List[dict], output: t.Optional[str] = None, **meta) -> dict:
+    """将结果写为JSON，output为None时只返回"""
+    import json
+
+    document = {'version': RESULTS_VERSION, 'meta': {**metadata(), **meta}, 'results': results}
+    if output == '-':
+        print(json.dumps(document, indent=2, ensure_ascii=False))  # noqa
+    elif output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+    return document
+
+
+def compare_results(baseline_path: str, document: dict, threshold: float = 0.1) -> bool:
+    """与保存的基线对比，打印每一项的变化，存在超过threshold的退化时返回False"""
+    import json
+
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('version') != RESULTS_VERSION:
+        raise ValueError(f'基线文件格式版本为{baseline.get("version")},当前为{RESULTS_VERSION}.')
+    previous = {r['name']: r for r in baseline['results']}
+
+    regressions = 0
+    print(f'{"name":<56} {"baseline":>12} {"current":>12} {"change":>9}')  # noqa
+    for current in document['results']:
+        old = previous.pop(current['name'], None)
+        if old is None or not old['value']:
+            print(f'{current["name"]:<56} {"-":>12} {current["value"]:>12.3f} {"new":>9}')  # noqa
+            continue
+        change = current['value'] / old['value'] - 1
+        # 统一成正数表示变差
+        worse = change if current['better'] == 'lower' else -change
+        flag = ''
+        if worse > threshold:
+            flag = 'REGRESSION'
+            regressions += 1
+        elif worse < -threshold:
+            flag = 'improved'
+        print(f'{current["name"]:<56} {old["value"]:>12.3f} {current["value"]:>12.3f} '  # noqa
+              f'{change:>+8.1%} {flag}')
+    if previous:
+        print(f'\n{len(previous)} baseline result(s) not run')  # noqa
+    print(f'\n{regressions} regression(s), threshold {threshold:.0%}')  # noqa
+    return regressions == 0
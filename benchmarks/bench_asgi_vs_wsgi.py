@@ -0,0 +1,93 @@
+"""WSGI线程模式与ASGI异步模式的负载对比
+
+模拟 1000 个并发的慢请求（接口函数等待下游 I/O 100ms）：
+    - wsgi: 每个请求一个线程（与 ThreadingWSGIServer 的并发模型一致）
+    - asgi async: async def 接口函数，在同一个事件循环中并发执行
+    - asgi sync: 同步接口函数，在 ASGI 模式下放到有界线程池中执行
+
+输出总耗时、峰值线程数以及 tracemalloc 统计的内存峰值。
+
+    python benchmarks/bench_asgi_vs_wsgi.py [并发数]
+"""
+import asyncio
+import sys
+import threading
+import time
+import tracemalloc
+
+from _util import ROOT_PATH, make_environ, start_response
+
+from miniapi import Application
+
+DELAY = 0.1
+
+
+def build() -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+
+    @app.get('/sync')
+    def slow_sync(request):
+        time.sleep(DELAY)
+        return 'ok'
+
+    @app.get('/async')
+    async def slow_async(request):
+        await asyncio.sleep(DELAY)
+        return 'ok'
+
+    return app
+
+
+def run_wsgi(app: Application, concurrency: int) -> int:
+    peak_threads = 0
+    threads = [threading.Thread(target=app, args=(make_environ('/sync'), start_response)) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+        peak_threads = max(peak_threads, threading.active_count())
+    for thread in threads:
+        thread.join()
+    return peak_threads
+
+
+def make_scope(path: str) -> dict:
+    return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': []}
+
+
+async def receive():
+    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+
+async def send(message):
+    pass
+
+
+def run_asgi(app: Application, concurrency: int, path: str) -> int:
+    async def main():
+        await asyncio.gather(*(app.asgi_app(make_scope(path), receive, send) for _ in range(concurrency)))
+        return threading.active_count()
+
+    return asyncio.run(main())
+
+
+def measure(name: str, func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    peak_threads = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<14} {elapsed:>8.3f} s  peak threads {peak_threads:>5}  '  # noqa
+          f'peak memory {peak_memory / 1024:>10.1f} KiB')
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    app = build()
+    print(f'{concurrency} concurrent requests, handler waits {DELAY}s, asgi threads {app.executor._max_workers}')  # noqa
+    measure('wsgi threads', run_wsgi, app, concurrency)
+    measure('asgi async', run_asgi, app, concurrency, '/async')
+    measure('asgi sync', run_asgi, app, concurrency, '/sync')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""响应压缩基准测试
+
+对约2MB的JSON列表响应，比较各编码(未安装的跳过)以及压缩级别下节省的字节数与消耗的CPU时间，
+并测量经过CompressionMiddleware的一次完整 dispatch_request(包括压缩结果缓存命中的情况)。
+
+    python benchmarks/bench_compression.py
+"""
+import json
+import time
+
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+from miniapi.middleware.compress import COMPRESSORS, CompressionMiddleware
+
+RECORDS = [{'id': i, 'name': f'item{i}', 'price': i * 1.5, 'tags': ['a', 'b'], 'active': i % 2 == 0}
+           for i in range(25000)]
+PAYLOAD = json.dumps(RECORDS).encode('utf-8')
+LEVELS = {'gzip': (1, 6, 9), 'br': (1, 4, 11), 'zstd': (1, 3, 19)}
+
+
+def available_encodings():
+    return [name for name, (_, module) in COMPRESSORS.items() if module is not None]
+
+
+def build(**options) -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+    app.add_middlewares(CompressionMiddleware(**options))
+
+    @app.get('/items')
+    def items(request):
+        return PAYLOAD
+
+    return app
+
+
+def main():
+    print(f'payload: {len(PAYLOAD)} bytes')  # noqa
+    for encoding in available_encodings():
+        for level in LEVELS[encoding]:
+            middleware = CompressionMiddleware(encodings=[encoding], levels={encoding: level})
+            start = time.process_time()
+            compressed = middleware.compress(encoding, PAYLOAD)
+            cpu = (time.process_time() - start) * 1000
+            saved = 1 - len(compressed) / len(PAYLOAD)
+            print(f'{encoding:<5} level {level:<3} {len(compressed):>10} bytes  '  # noqa
+                  f'saved {saved:>6.1%}  cpu {cpu:>8.2f} ms')
+
+    environ = make_environ('/items', headers={'Accept-Encoding': 'gzip, deflate, br, zstd'})
+    report('dispatch, no compression', bench(lambda: b''.join(build(encodings=[])(environ, start_response)),
+                                             number=20, repeat=3))
+    for encoding in available_encodings():
+        app = build(encodings=[encoding])
+        report(f'dispatch, {encoding}', bench(lambda: b''.join(app(environ, start_response)), number=20, repeat=3))
+        app = build(encodings=[encoding], cache_size=16)
+        report(f'dispatch, {encoding} cached', bench(lambda: b''.join(app(environ, start_response)),
+                                                     number=20, repeat=3))
+
+
+if __name__ == '__main__':
+    main()
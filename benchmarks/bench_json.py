@@ -0,0 +1,74 @@
+"""JSON后端基准测试
+
+在常见的几种负载上比较各个JSON后端(未安装的后端会被跳过)：
+    - 编码/解码：小对象、100条记录的列表、1万条记录的列表
+    - 一次完整的 dispatch_request：接口返回dict、接口读取JSON请求体
+
+    python benchmarks/bench_json.py
+"""
+import io
+
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+from miniapi.codec import JSON_CODECS, make_json_codec
+
+SMALL = {'code': 0, 'message': 'ok', 'data': {'id': 1, 'name': 'miniapi', 'enabled': True}}
+RECORDS_100 = [{'id': i, 'name': f'item{i}', 'price': i * 1.5, 'tags': ['a', 'b'], 'active': i % 2 == 0}
+               for i in range(100)]
+RECORDS_10K = RECORDS_100 * 100
+
+PAYLOADS = (
+    ('small dict', SMALL, 10000),
+    ('100 records', RECORDS_100, 1000),
+    ('10k records', RECORDS_10K, 10),
+)
+
+
+def available_codecs():
+    for name in JSON_CODECS:
+        try:
+            yield make_json_codec(name)
+        except ImportError:
+            print(f'{name} 未安装,跳过')  # noqa
+
+
+def build(backend) -> Application:
+    app = Application(__name__, root_path=ROOT_PATH, json_backend=backend)
+
+    @app.get('/dict')
+    def return_dict(request):
+        return {'items': RECORDS_100}
+
+    @app.post('/json')
+    def read_json(request):
+        return str(len(request.get_json()))
+
+    return app
+
+
+def main():
+    codecs = list(available_codecs())
+    for name, payload, number in PAYLOADS:
+        for codec in codecs:
+            data = codec.dumps(payload)
+            report(f'{codec.name:<8} dumps {name}', bench(lambda: codec.dumps(payload), number=number))
+            report(f'{codec.name:<8} loads {name}', bench(lambda: codec.loads(data), number=number))
+
+    for codec in codecs:
+        app = build(codec)
+        body = codec.dumps(RECORDS_100)
+        get_environ = make_environ('/dict')
+        post_environ = make_environ('/json', method='POST', body=body,
+                                    headers={'Content-Type': 'application/json'})
+
+        def post():
+            post_environ['wsgi.input'] = io.BytesIO(body)
+            app(post_environ, start_response)
+
+        report(f'{codec.name:<8} dispatch, return dict', bench(lambda: app(get_environ, start_response), number=2000))
+        report(f'{codec.name:<8} dispatch, read json body', bench(post, number=2000))
+
+
+if __name__ == '__main__':
+    main()
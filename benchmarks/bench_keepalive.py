@@ -0,0 +1,65 @@
+"""长连接基准测试
+
+在本地启动内置服务，分别使用长连接(同一个连接发送全部请求)和短连接(每个请求新建连接)
+顺序发送请求，输出每秒请求数。
+
+    python benchmarks/bench_keepalive.py [请求数]
+"""
+import http.client
+import sys
+import threading
+import time
+
+from _util import ROOT_PATH
+
+from miniapi import Application
+from miniapi.httpserver.handler import WSGIRequestHandler
+from miniapi.httpserver.server import PooledWSGIServer
+
+
+def build() -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+
+    @app.get('/ping')
+    def ping(request):
+        return 'pong'
+
+    return app
+
+
+def serve(keep_alive: bool) -> PooledWSGIServer:
+    server = PooledWSGIServer(('127.0.0.1', 0), WSGIRequestHandler, workers=4, keep_alive=keep_alive,
+                              max_keep_alive_requests=1000000)
+    server.set_app(build())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(port: int, count: int, reuse: bool) -> float:
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    for _ in range(count):
+        if not reuse:
+            conn = http.client.HTTPConnection('127.0.0.1', port)
+        conn.request('GET', '/ping')
+        response = conn.getresponse()
+        response.read()
+        if not reuse:
+            conn.close()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return count / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for keep_alive in (True, False):
+        server = serve(keep_alive)
+        rps = run(server.server_address[1], count, reuse=keep_alive)
+        print(f"{'keep-alive' if keep_alive else 'connection per request':<24} {rps:>10.1f} req/s")  # noqa
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
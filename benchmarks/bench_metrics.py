@@ -0,0 +1,58 @@
+"""指标统计基准测试
+
+测量启用/未启用指标统计时一次完整 dispatch_request 的耗时、8个线程并发记录时的耗时，
+以及100个路由时输出一次 /metrics 的耗时。
+
+    python benchmarks/bench_metrics.py
+"""
+import threading
+import time
+
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+
+
+def build(metrics: bool, routes: int = 1) -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+    if metrics:
+        app.enable_metrics()
+
+    for i in range(routes):
+        app.add_url_rule(f'/users/{{id:int}}/items{i}', lambda request: 'ok', ['GET'])
+    return app
+
+
+def concurrent(app: Application, threads: int = 8, number: int = 5000) -> float:
+    """多个线程同时请求，返回单次请求的平均耗时(微秒)"""
+    environ = make_environ('/users/1/items0')
+
+    def run():
+        for _ in range(number):
+            app(dict(environ), start_response)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (threads * number) * 1e6
+
+
+def main():
+    environ = make_environ('/users/1/items0')
+    for metrics in (False, True):
+        app = build(metrics)
+        name = 'with metrics' if metrics else 'without metrics'
+        report(f'dispatch {name}', bench(lambda: app(environ, start_response)))
+        report(f'dispatch {name}, 8 threads', concurrent(app))
+
+    app = build(True, routes=100)
+    for i in range(100):
+        app(make_environ(f'/users/1/items{i}'), start_response)
+    report('render /metrics with 100 routes', bench(lambda: app.metrics.render(), number=200))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""中间件链基准测试
+
+注册 0 / 5 / 10 个全局中间件（其中一个在路由上被禁用，另有一个局部中间件），
+测量一次完整 dispatch_request 的耗时。
+
+    python benchmarks/bench_middleware_chain.py
+"""
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+from miniapi.middleware.base import MiddlewareBase
+
+
+def make_middleware(index: int) -> MiddlewareBase:
+    def before_request(self, request):
+        return request
+
+    def after_request(self, request, response):
+        return response
+
+    cls = type(f'Middleware{index}', (MiddlewareBase,), {
+        'before_request': before_request,
+        'after_request': after_request,
+    })
+    return cls()
+
+
+def build(count: int) -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+    for i in range(count):
+        app.add_middlewares(make_middleware(i))
+    forbidden = ['Middleware0'] if count else None
+
+    @app.get('/ping', middlewares=[make_middleware(count)], forbidden=forbidden)
+    def ping(request):
+        return 'pong'
+
+    return app
+
+
+def main():
+    environ = make_environ('/ping')
+    for count in (0, 5, 10):
+        app = build(count)
+        report(f'dispatch with {count} global middlewares', bench(lambda: app(environ, start_response)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""DataObjects基准测试
+
+在1万、10万、100万行的字典列表上，比较DataObjects原有的逐行循环与列式存储Columns的耗时(毫秒)。
+Columns的耗时单独列出转换为列式存储的开销，转换只需要进行一次，之后的操作可以复用。
+
+    python benchmarks/bench_objects.py
+"""
+from _util import bench
+
+from miniapi.codec import set_json_codec
+from miniapi.objects.columns import Columns, numpy
+from miniapi.objects.data import DataObjects
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def make_rows(size: int) -> list:
+    return [{'id': i, 'group': i % 10, 'name': f'item{i}', 'price': i * 0.5, 'stock': i % 100}
+            for i in range(size)]
+
+
+def timeit(func, repeat: int = 3) -> float:
+    """单次调用的最优耗时(毫秒)"""
+    return bench(func, number=1, repeat=repeat) / 1000
+
+
+def row(name: str, millis: float):
+    print(f'{name:<48} {millis:>10.2f} ms')  # noqa
+
+
+def main():
+    print(f'numpy: {"installed" if numpy is not None else "not installed"}')  # noqa
+    try:
+        print(f'json: {set_json_codec("orjson").name}')  # noqa
+    except ImportError:
+        print('json: stdlib')  # noqa
+    for size in SIZES:
+        rows = make_rows(size)
+        lists = [list(r.values()) for r in rows]
+        print(f'--- {size} rows')  # noqa
+        row('loop o_get', timeit(lambda: DataObjects.o_get(rows, 'price')))
+        row('loop o_index', timeit(lambda: DataObjects.o_index(lists, 3)))
+        row('loop filter price > half', timeit(lambda: [r for r in rows if r['price'] > size / 4]))
+        row('loop sort by stock', timeit(lambda: sorted(rows, key=lambda r: r['stock'])))
+        row('loop group by group', timeit(lambda: _group(rows, 'group')))
+
+        columns = Columns.from_rows(rows)
+        row('columns from_rows', timeit(lambda: Columns.from_rows(rows)))
+        row('columns get', timeit(lambda: columns.get('price')))
+        row('columns index', timeit(lambda: columns.index(3)))
+        row('columns drop', timeit(lambda: columns.drop(['name', 'stock'])))
+        row('columns where price > half', timeit(lambda: columns.where('price', '>', size / 4)))
+        row('columns sort by stock', timeit(lambda: columns.sort('stock')))
+        row('columns group by group', timeit(lambda: columns.group_by('group')))
+        row('columns to_json(columns)', timeit(lambda: columns.to_json(orient='columns')))
+        # o_drop会修改原数据，放在最后
+        row('loop o_drop', timeit(lambda: DataObjects.o_drop(rows, ['name', 'stock']), repeat=1))
+
+
+def _group(rows, column):
+    groups = {}
+    for r in rows:
+        groups.setdefault(r[column], []).append(r)
+    return groups
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""参数注入基准测试
+
+同一个接口(路径参数 + 查询参数 + JSON请求体)分别使用三种写法，测量一次完整 dispatch_request 的耗时：
+    - 手写解析：request.query()、request.get_json() 以及手写的类型检查
+    - 类型注解 + dataclass
+    - 类型注解 + msgspec.Struct(未安装msgspec时跳过)
+以及参数校验失败返回422的耗时。
+
+    python benchmarks/bench_params.py
+"""
+import dataclasses
+import io
+import typing as t
+
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+from miniapi.response import JsonResponse
+from miniapi.status import HTTPStatus
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BODY = b'{"name": "keyboard", "price": 199.5, "tags": ["office", "mechanical"], "stock": 30}'
+INVALID_BODY = b'{"name": "keyboard", "price": "free", "tags": ["office", 1]}'
+
+
+@dataclasses.dataclass
+class Item:
+    name: str
+    price: float
+    tags: t.List[str] = dataclasses.field(default_factory=list)
+    stock: int = 0
+
+
+def build_manual(app: Application):
+    @app.post('/manual/shops/{shop_id:int}/items')
+    def manual(request):
+        errors = []
+        dry_run = request.query('dry_run', 'false')
+        if dry_run not in ('true', 'false'):
+            errors.append('dry_run')
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return JsonResponse({'detail': ['body']}, HTTPStatus.UNPROCESSABLE_ENTITY)
+        name, price = data.get('name'), data.get('price')
+        tags, stock = data.get('tags', []), data.get('stock', 0)
+        if not isinstance(name, str):
+            errors.append('name')
+        if isinstance(price, bool) or not isinstance(price, (int, float)):
+            errors.append('price')
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            errors.append('tags')
+        if isinstance(stock, bool) or not isinstance(stock, int):
+            errors.append('stock')
+        if errors:
+            return JsonResponse({'detail': errors}, HTTPStatus.UNPROCESSABLE_ENTITY)
+        item = Item(name, float(price), tags, stock)
+        return {'shop_id': request.path_params['shop_id'], 'name': item.name, 'dry_run': dry_run == 'true'}
+
+
+def build_dataclass(app: Application):
+    @app.post('/dataclass/shops/{shop_id:int}/items')
+    def typed(request, shop_id: int, item: Item, dry_run: bool = False):
+        return {'shop_id': shop_id, 'name': item.name, 'dry_run': dry_run}
+
+
+def build_msgspec(app: Application):
+    class StructItem(msgspec.Struct):
+        name: str
+        price: float
+        tags: t.List[str] = []
+        stock: int = 0
+
+    @app.post('/msgspec/shops/{shop_id:int}/items')
+    def typed(request, shop_id: int, item: StructItem, dry_run: bool = False):
+        return {'shop_id': shop_id, 'name': item.name, 'dry_run': dry_run}
+
+
+def main():
+    app = Application(__name__, root_path=ROOT_PATH)
+    variants = ['manual', 'dataclass']
+    build_manual(app)
+    build_dataclass(app)
+    if msgspec is not None:
+        build_msgspec(app)
+        variants.append('msgspec')
+    else:
+        print('msgspec 未安装,跳过')  # noqa
+
+    headers = {'Content-Type': 'application/json'}
+    for variant in variants:
+        for name, body in (('valid', BODY), ('invalid, 422', INVALID_BODY)):
+            environ = make_environ(f'/{variant}/shops/3/items', method='POST', query='dry_run=true', body=body,
+                                   headers=headers)
+
+            def run():
+                environ['wsgi.input'] = io.BytesIO(body)
+                app(environ, start_response)
+
+            report(f'{variant:<10} dispatch, {name}', bench(run))
+
+
+if __name__ == '__main__':
+    main()
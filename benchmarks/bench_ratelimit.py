@@ -0,0 +1,70 @@
+"""限流中间件竞争基准测试
+
+64个线程同时请求，比较限流存储后端分片数为1与64时单次请求的平均耗时，
+每个线程使用不同的客户端IP(分散的key)或者所有线程使用同一个IP(热点key)，以及sqlite共享存储后端。
+
+    python benchmarks/bench_ratelimit.py
+"""
+import os
+import tempfile
+import threading
+import time
+
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+from miniapi.middleware.ratelimit import RateLimitMiddleware
+
+THREADS = 64
+
+
+def build(**options) -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+    # 限制足够大，测量的是记录以及判断的开销，而不是429响应
+    limiter = RateLimitMiddleware(limit=1e9, period=1, **options)
+    app.add_url_rule('/items', lambda request: 'ok', ['GET'], middlewares=[limiter])
+    return app
+
+
+def concurrent(app: Application, hot_key: bool, number: int = 2000) -> float:
+    """THREADS个线程同时请求，返回单次请求的平均耗时(微秒)"""
+
+    def run(index: int):
+        environ = make_environ('/items')
+        environ['REMOTE_ADDR'] = '10.0.0.1' if hot_key else f'10.0.{index // 256}.{index % 256}'
+        for _ in range(number):
+            app(dict(environ), start_response)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (THREADS * number) * 1e6
+
+
+def main():
+    plain = Application(__name__, root_path=ROOT_PATH)
+    plain.add_url_rule('/items', lambda request: 'ok', ['GET'])
+    environ = make_environ('/items')
+    report('dispatch without rate limit', bench(lambda: plain(environ, start_response)))
+    report(f'dispatch without rate limit, {THREADS} threads', concurrent(plain, False))
+
+    for shards in (1, 64):
+        app = build(shards=shards)
+        report(f'token bucket, {shards} shards', bench(lambda: app(environ, start_response)))
+        report(f'token bucket, {shards} shards, {THREADS} threads', concurrent(app, False))
+        report(f'token bucket, {shards} shards, {THREADS} threads, hot key', concurrent(app, True))
+
+    app = build(algorithm='sliding_window')
+    report(f'sliding window, 64 shards, {THREADS} threads', concurrent(app, False))
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = build(backend='sqlite:' + os.path.join(directory, 'ratelimit.db'))
+        report('token bucket, sqlite', bench(lambda: app(environ, start_response), number=2000))
+        report(f'token bucket, sqlite, {THREADS} threads', concurrent(app, False, number=100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""请求解析基准测试
+
+测量不同接口在一次完整 dispatch_request 中的耗时：
+    - 不访问任何请求数据
+    - 只读取查询参数
+    - 读取JSON请求体
+以及单独构造 Request 对象的耗时。
+
+    python benchmarks/bench_request.py
+"""
+import io
+import json
+
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+from miniapi.request import Request
+
+HEADERS = {
+    'Host': 'example.com',
+    'User-Agent': 'bench/1.0',
+    'Accept': '*/*',
+    'Accept-Encoding': 'gzip, deflate',
+    'Authorization': 'Bearer token',
+    'X-Request-Id': 'abcdef',
+    'Content-Type': 'application/json',
+}
+BODY = json.dumps({'items': [{'id': i, 'name': f'item{i}'} for i in range(30)]}).encode('utf-8')
+
+
+def build() -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+
+    @app.post('/noop')
+    def noop(request):
+        return 'ok'
+
+    @app.post('/query')
+    def query(request):
+        return request.query('page', '1')
+
+    @app.post('/json')
+    def read_json(request):
+        return str(len(request.get_json()['items']))
+
+    return app
+
+
+def main():
+    app = build()
+    environ = make_environ('/noop', method='POST', query='page=2&size=20', body=BODY, headers=HEADERS)
+
+    def call(path):
+        def run():
+            environ['PATH_INFO'] = path
+            environ['wsgi.input'] = io.BytesIO(BODY)
+            app(environ, start_response)
+        return run
+
+    report('Request() construction', bench(lambda: Request(environ)))
+    report('dispatch, handler touches nothing', bench(call('/noop')))
+    report('dispatch, handler reads query', bench(call('/query')))
+    report('dispatch, handler reads json body', bench(call('/json')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""响应构建基准测试
+
+测量响应对象的构建、响应头读写以及错误路径的耗时：
+    - Response、JsonResponse的构建以及prepare
+    - 响应头的查找、设置
+    - 抛出HTTPException、未匹配到路由(404)以及请求方式不被允许(405)时一次完整的 dispatch_request
+
+    python benchmarks/bench_response.py
+"""
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+from miniapi.exc import HTTPException
+from miniapi.response import JsonResponse, Response
+from miniapi.status import HTTPStatus
+
+DATA = {'code': 0, 'message': 'ok', 'data': {'id': 1, 'name': 'miniapi'}}
+
+
+def build() -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+
+    @app.get('/ok')
+    def ok(request):
+        return 'ok'
+
+    @app.get('/raise')
+    def raise_error(request):
+        raise HTTPException(HTTPStatus.FORBIDDEN)
+
+    return app
+
+
+def main():
+    environ = make_environ()
+    report('Response()', bench(lambda: Response('ok')))
+    report('Response() with 3 headers', bench(lambda: Response('ok', headers=[
+        ('Cache-Control', 'no-cache'), ('X-Request-Id', 'abc'), ('Vary', 'Accept')])))
+    report('JsonResponse()', bench(lambda: JsonResponse(DATA)))
+    report('Response().prepare()', bench(lambda: Response('ok').prepare(environ)))
+
+    response = Response('ok', headers=[('Cache-Control', 'no-cache'), ('X-Request-Id', 'abc')])
+    report('get_header', bench(lambda: response.get_header('x-request-id'), number=100000))
+    report('set_default_header (exists)',
+           bench(lambda: response.set_default_header('Cache-Control', 'x'), number=100000))
+    report('HTTPException()', bench(lambda: HTTPException(HTTPStatus.NOT_FOUND), number=100000))
+
+    app = build()
+    for name, environ in (
+            ('dispatch 200', make_environ('/ok')),
+            ('dispatch handler raises 403', make_environ('/raise')),
+            ('dispatch 404', make_environ('/missing')),
+            ('dispatch 405', make_environ('/ok', method='POST'))):
+        report(name, bench(lambda: app(environ, start_response)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""路由查找基准测试
+
+分别注册 100 / 1000 / 10000 条路由（一半静态路由，一半带路径参数的路由），
+测量静态路由、参数路由以及未命中路径的单次查找耗时，并与逐条正则匹配的线性查找做对比。
+
+    python benchmarks/bench_router.py
+"""
+import re
+
+from _util import bench, report
+
+from miniapi.route import HandlerMapper
+
+
+def handler(request):
+    return ''
+
+
+def build(count: int):
+    mapper = HandlerMapper()
+    patterns = []
+    for i in range(count // 2):
+        mapper.add(f'/api/v1/resource{i}/list', 'GET', handler)
+        mapper.add(f'/api/v1/resource{i}/{{id:int}}/detail', 'GET', handler)
+        patterns.append(re.compile(f'^/api/v1/resource{i}/list$'))
+        patterns.append(re.compile(f'^/api/v1/resource{i}/(?P<id>\\d+)/detail$'))
+    return mapper, patterns
+
+
+def linear_match(patterns, path):
+    for pattern in patterns:
+        m = pattern.match(path)
+        if m:
+            return m.groupdict()
+    return None
+
+
+def main():
+    for count in (100, 1000, 10000):
+        mapper, patterns = build(count)
+        last = count // 2 - 1
+        static_path = f'/api/v1/resource{last}/list'
+        dynamic_path = f'/api/v1/resource{last}/42/detail'
+        missing_path = f'/api/v1/resource{last}/abc/detail'
+
+        print(f'--- {count} routes')  # noqa
+        report('radix static', bench(lambda: mapper.match(static_path)))
+        report('radix dynamic', bench(lambda: mapper.match(dynamic_path)))
+        report('radix miss', bench(lambda: mapper.match(missing_path)))
+        number = max(10, 100000 // count)
+        report('linear regex dynamic (worst case)', bench(lambda: linear_match(patterns, dynamic_path), number=number))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""中间件提前返回基准测试
+
+鉴权中间件位于5个全局中间件的最前面，测量一次完整 dispatch_request 的耗时：
+    - 鉴权通过，执行完整的中间件链以及接口函数
+    - 鉴权失败，抛出HTTPException拒绝请求
+    - 鉴权失败，before_request直接返回Response拒绝请求
+
+    python benchmarks/bench_short_circuit.py
+"""
+from _util import ROOT_PATH, bench, make_environ, report, start_response
+
+from miniapi import Application
+from miniapi.exc import HTTPException
+from miniapi.middleware.base import MiddlewareBase
+from miniapi.response import Response
+from miniapi.status import HTTPStatus
+
+
+class RaiseAuthMiddleware(MiddlewareBase):
+    def before_request(self, request):
+        if request.get_header('Authorization') != 'Bearer ok':
+            raise HTTPException(HTTPStatus.UNAUTHORIZED)
+        return request
+
+
+class ReturnAuthMiddleware(MiddlewareBase):
+    def before_request(self, request):
+        if request.get_header('Authorization') != 'Bearer ok':
+            return Response('unauthorized', HTTPStatus.UNAUTHORIZED, content_type='text/plain')
+        return request
+
+
+def make_middleware(index: int) -> MiddlewareBase:
+    return type(f'Middleware{index}', (MiddlewareBase,), {})()
+
+
+def build(auth: MiddlewareBase) -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+    app.add_middlewares(auth)
+    for i in range(5):
+        app.add_middlewares(make_middleware(i))
+
+    @app.get('/ping')
+    def ping(request):
+        return 'pong'
+
+    return app
+
+
+def main():
+    accepted = make_environ('/ping', headers={'Authorization': 'Bearer ok'})
+    rejected = make_environ('/ping', headers={'Authorization': 'Bearer bad'})
+    for auth in (RaiseAuthMiddleware(), ReturnAuthMiddleware()):
+        app = build(auth)
+        name = type(auth).__name__
+        report(f'{name} accepted', bench(lambda: app(accepted, start_response)))
+        report(f'{name} rejected', bench(lambda: app(rejected, start_response)))
+
+
+if __name__ == '__main__':
+    main()
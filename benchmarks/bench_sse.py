@@ -0,0 +1,88 @@
+"""服务器推送事件负载测试
+
+在ASGI模式下(进程内调用 asgi_app，不经过网络)建立5000个空闲的 EventStreamResponse 订阅连接，
+测量每个连接占用的内存(tracemalloc)，以及发布一个事件后所有连接都发送出去的耗时。
+
+    python benchmarks/bench_sse.py [连接数]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from _util import ROOT_PATH
+
+from miniapi import Application
+from miniapi.sse import Broadcaster, EventStreamResponse
+
+
+def build(hub: Broadcaster) -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+
+    async def events(request):
+        return EventStreamResponse(hub.subscribe(request.get_header('Last-Event-ID')), heartbeat=30)
+
+    app.add_url_rule('/events', events, ['GET'])
+    return app
+
+
+class Connection:
+    """模拟一个ASGI连接，记录所有连接收到的事件总数"""
+
+    received = 0
+
+    def __init__(self):
+        self.disconnected = asyncio.Event()
+        self._requested = False
+
+    async def receive(self):
+        if not self._requested:
+            self._requested = True
+            return {'type': 'http.request', 'body': b''}
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.body' and message.get('body'):
+            Connection.received += 1
+
+
+async def run(count: int):
+    hub = Broadcaster(history=10)
+    app = build(hub)
+    scope = {'type': 'http', 'method': 'GET', 'path': '/events', 'headers': []}
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    connections = [Connection() for _ in range(count)]
+    tasks = [asyncio.ensure_future(app.asgi_app(dict(scope), c.receive, c.send)) for c in connections]
+    while len(hub) < count:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.1)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'{count} idle subscribers, memory per connection: {(after - before) / count / 1024:.2f} KB')  # noqa
+
+    for round_ in range(3):
+        received = Connection.received
+        start = time.perf_counter()
+        hub.publish({'progress': round_}, event='progress')
+        while Connection.received < received + count:
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter() - start
+        print(f'fan-out to {count} subscribers: {elapsed * 1000:.2f} ms '  # noqa
+              f'({elapsed / count * 1e6:.2f} us per subscriber)')
+
+    for connection in connections:
+        connection.disconnected.set()
+    await asyncio.gather(*tasks)
+    print(f'subscribers after disconnect: {len(hub)}')  # noqa
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    asyncio.run(run(count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""启动耗时基准测试
+
+在新的子进程中测量 import miniapi、导入Application以及创建Application(读取application.yaml)的耗时，
+分别在没有配置缓存(冷启动)与有配置缓存时运行，并用 python -X importtime 列出自身导入耗时最多的模块。
+
+    python benchmarks/bench_startup.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+from _util import ROOT_PATH
+
+REPO_PATH = os.path.dirname(ROOT_PATH)
+
+SNIPPETS = {
+    'import miniapi': 'import miniapi',
+    'from miniapi import Application': 'from miniapi import Application',
+    'create Application': f'from miniapi import Application; Application("bench", root_path={ROOT_PATH!r})',
+}
+
+# 计时代码，输出秒数
+TIMER = 'import time; _start = time.perf_counter(); {code}; print(time.perf_counter() - _start)'
+
+
+def run(code: str, *options: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=REPO_PATH)
+    return subprocess.run([sys.executable, *options, '-c', code], env=env, capture_output=True, text=True,
+                          check=True)
+
+
+def clear_config_cache():
+    try:
+        os.remove(os.path.join(ROOT_PATH, '__pycache__', 'application.yaml.cache'))
+    except OSError:
+        pass
+
+
+def measure(code: str, repeat: int = 10, cold: bool = False) -> float:
+    """返回子进程中执行code的耗时中位数(毫秒)"""
+    times = []
+    for _ in range(repeat):
+        if cold:
+            clear_config_cache()
+        times.append(float(run(TIMER.format(code=code)).stdout) * 1000)
+    return statistics.median(times)
+
+
+def importtime(code: str, top: int = 10):
+    """python -X importtime 的结果中自身耗时最多的模块"""
+    rows = []
+    for line in run(code, '-X', 'importtime').stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    print(f'{"total self time":<48} {sum(r[0] for r in rows) / 1000:>10.3f} ms')  # noqa
+    for self_us, cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f'  {name:<46} {self_us / 1000:>10.3f} ms (cumulative {cumulative_us / 1000:.3f} ms)')  # noqa
+
+
+def main():
+    for name, code in SNIPPETS.items():
+        print(f'{name:<48} {measure(code):>10.3f} ms')  # noqa
+    code = SNIPPETS['create Application']
+    print(f'{"create Application, no config cache":<48} {measure(code, cold=True):>10.3f} ms')  # noqa
+
+    print()  # noqa
+    importtime(code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""流式JSON响应基准测试
+
+比较 JsonResponse 与 StreamingJsonResponse/NDJSONResponse 在不同行数下的首字节时间以及峰值内存(tracemalloc)，
+行数据由生成器逐行产生，模拟数据库游标。
+
+    python benchmarks/bench_streaming_json.py
+"""
+import time
+import tracemalloc
+
+from _util import ROOT_PATH, make_environ, start_response
+
+from miniapi import Application
+from miniapi.response import JsonResponse, NDJSONResponse, StreamingJsonResponse
+
+
+def rows(count: int):
+    for i in range(count):
+        yield {'id': i, 'name': f'user{i}', 'email': f'user{i}@example.com', 'enabled': i % 2 == 0}
+
+
+def build(count: int) -> Application:
+    app = Application(__name__, root_path=ROOT_PATH)
+    app.add_url_rule('/json', lambda request: JsonResponse(list(rows(count))), ['GET'])
+    app.add_url_rule('/stream', lambda request: StreamingJsonResponse(rows(count)), ['GET'])
+    app.add_url_rule('/ndjson', lambda request: NDJSONResponse(rows(count)), ['GET'])
+    return app
+
+
+def measure(app: Application, path: str):
+    """返回 (首字节时间ms, 总耗时ms, 峰值内存KB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    body = app(make_environ(path), start_response)
+    first = None
+    for chunk in body:
+        if first is None and chunk:
+            first = time.perf_counter()
+    if hasattr(body, 'close'):
+        body.close()
+    end = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (first - start) * 1000, (end - start) * 1000, peak / 1024
+
+
+def main():
+    print(f'{"":<32} {"ttfb ms":>10} {"total ms":>10} {"peak KB":>10}')  # noqa
+    for count in (1000, 100000):
+        app = build(count)
+        for path in ('/json', '/stream', '/ndjson'):
+            ttfb, total, peak = measure(app, path)
+            print(f'{path + " rows=" + str(count):<32} {ttfb:>10.3f} {total:>10.3f} {peak:>10.1f}')  # noqa
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""端到端压测
+
+在子进程中通过 Application.run 启动内置服务(临时目录中生成application.yaml，使用空闲端口)，
+多个线程各自使用一个长连接在指定时间内持续发送请求，输出每秒请求数与延迟分位数。
+客户端与服务在同一台机器上运行并且客户端受GIL限制，结果用于同一台机器上前后版本的对比，而不是服务的极限吞吐。
+
+结果格式与 suite.py 相同，同样支持 --compare:
+
+    python benchmarks/loadgen.py --scenario json --connections 16 --duration 5 --output load.json
+    python benchmarks/loadgen.py --scenario json --compare load.json
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import typing as t
+
+from _util import compare_results, result, write_results
+
+SCENARIOS = {
+    # 名称: (方法, 路径, 请求体)
+    'ping': ('GET', '/ping', None),
+    'json': ('GET', '/items', None),
+    'echo': ('POST', '/echo', b'{"id": 1, "name": "miniapi", "tags": ["a", "b", "c"]}'),
+}
+
+CONFIG_TEMPLATE = """\
+socket:
+  host: 127.0.0.1
+  port: {port}
+  threads: {threads}
+  prefork: {prefork}
+  workers: {workers}
+
+middlewares: []
+"""
+
+
+def serve(root_path: str):
+    """子进程中运行的服务"""
+    from miniapi import Application
+
+    app = Application(__name__, root_path=root_path)
+    items = [{'id': i, 'name': f'item{i}', 'price': i * 1.5} for i in range(20)]
+
+    @app.get('/ping')
+    def ping(request):
+        return 'pong'
+
+    @app.get('/items')
+    def list_items(request):
+        return {'items': items}
+
+    @app.post('/echo')
+    def echo(request):
+        return request.get_json()
+
+    app.run()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'服务进程已退出，返回码{process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f'等待服务启动超时: 127.0.0.1:{port}')
+
+
+def worker(port: int, scenario: tuple, deadline: float, latencies: t.List[float], errors: t.List[int]):
+    method, path, body = scenario
+    headers = {'Content-Type': 'application/json'} if body else {}
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    perf_counter = time.perf_counter
+    while perf_counter() < deadline:
+        start = perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors[0] += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            errors[0] += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+            continue
+        latencies.append(perf_counter() - start)
+    conn.close()
+
+
+def load(port: int, scenario: tuple, connections: int, duration: float) -> t.Tuple[t.List[float], int, float]:
+    """返回 (全部请求的延迟秒数, 错误数, 实际耗时)"""
+    deadline = time.perf_counter() + duration
+    per_thread = [([], [0]) for _ in range(connections)]
+    threads = [threading.Thread(target=worker, args=(port, scenario, deadline, latencies, errors))
+               for latencies, errors in per_thread]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = [latency for thread_latencies, _ in per_thread for latency in thread_latencies]
+    return latencies, sum(errors[0] for _, errors in per_thread), elapsed
+
+
+def percentile(sorted_values: t.List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main(argv: t.Optional[t.List[str]] = None):
+    parser = argparse.ArgumentParser(description='miniapi 端到端压测')
+    parser.add_argument('--scenario', choices=list(SCENARIOS), default='ping')
+    parser.add_argument('-c', '--connections', type=int, default=16, help='并发连接数')
+    parser.add_argument('-d', '--duration', type=float, default=5.0, help='压测时间(秒)')
+    parser.add_argument('--warmup', type=float, default=1.0, help='预热时间(秒)，不计入结果')
+    parser.add_argument('--threads', type=int, default=16, help='服务每个进程的工作线程数')
+    parser.add_argument('--prefork', type=int, default=0, help='大于0时使用多进程模式并指定进程数')
+    parser.add_argument('-o', '--output', help='将结果写入JSON文件，- 表示输出到标准输出')
+    parser.add_argument('--compare', metavar='BASELINE', help='与保存的基线结果对比')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定为退化的相对变化，默认0.1(10%%)')
+    parser.add_argument('--serve', metavar='ROOT_PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    port = free_port()
+    scenario = SCENARIOS[args.scenario]
+    with tempfile.TemporaryDirectory() as root_path:
+        with open(os.path.join(root_path, 'application.yaml'), 'w', encoding='utf-8') as f:
+            f.write(CONFIG_TEMPLATE.format(port=port, threads=args.threads, prefork=str(bool(args.prefork)).lower(),
+                                           workers=args.prefork or 1))
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', root_path],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port, process)
+            if args.warmup:
+                load(port, scenario, args.connections, args.warmup)
+            latencies, errors, elapsed = load(port, scenario, args.connections, args.duration)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    latencies.sort()
+    prefix = f'loadgen: {args.scenario}, {args.connections} connections'
+    results = [result(f'{prefix}, throughput', 'loadgen', len(latencies) / elapsed, unit='req/s', better='higher',
+                      requests=len(latencies), errors=errors, duration=elapsed)]
+    for q in (0.5, 0.9, 0.99):
+        results.append(result(f'{prefix}, p{int(q * 100)} latency', 'loadgen', percentile(latencies, q) * 1000,
+                              unit='ms'))
+    for item in results:
+        print(f'{item["name"]:<56} {item["value"]:>12.3f} {item["unit"]}', file=sys.stderr)  # noqa
+    if errors:
+        print(f'{errors} 个请求失败', file=sys.stderr)  # noqa
+
+    document = write_results(results, args.output, suite='loadgen', server_threads=args.threads,
+                             prefork=args.prefork)
+    if args.compare:
+        if not compare_results(args.compare, document, args.threshold):
+            sys.exit(1)
+    elif not args.output:
+        print(json.dumps(document, indent=2, ensure_ascii=False))  # noqa
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""进程内基准测试套件
+
+通过 miniapi.testing.TestClient 直接调用 wsgi_app，覆盖热点路径：
+    - routing: 100 / 1000 / 10000 条路由下的静态路由、参数路由以及404
+    - middleware: 0 / 5 / 10 / 20 层中间件链
+    - request: 不同大小请求体的读取与JSON解析，查询参数解析
+    - json: 当前JSON后端的编码以及接口返回dict
+    - objects: DataObjects的常用方法
+
+结果以JSON输出，--compare 与保存的基线对比，存在超过阈值的退化时以状态码1退出，可以在CI中使用:
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --compare baseline.json --threshold 0.1
+    python benchmarks/suite.py -k routing -k json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import typing as t
+
+from _util import ROOT_PATH, compare_results, result, write_results
+
+from miniapi import Application
+from miniapi.codec import get_json_codec, set_json_codec
+from miniapi.middleware.base import MiddlewareBase
+from miniapi.objects.data import DataObjects
+from miniapi.testing import TestClient
+
+# 所有测试组 {组名: 生成 (名称, 无参函数) 的函数}
+GROUPS: t.Dict[str, t.Callable[[], t.Iterator[t.Tuple[str, t.Callable[[], t.Any]]]]] = {}
+
+
+def group(func):
+    GROUPS[func.__name__] = func
+    return func
+
+
+def request_case(client: TestClient, method: str, path: str, status: int = 200, **kwargs):
+    """返回发送一次请求的函数，先确认响应状态，避免路由写错时测量的是404"""
+    response = client.request(method, path, **kwargs)
+    if response.status_code != status:
+        raise AssertionError(f'{method} {path} 返回{response.status}，期望{status}: {response.body[:200]!r}')
+    return lambda: client.request(method, path, **kwargs)
+
+
+def new_app() -> Application:
+    # 沿用--json-backend选择的后端，否则会被application.yaml中的配置覆盖
+    return Application(__name__, root_path=ROOT_PATH, json_backend=get_json_codec())
+
+
+@group
+def routing():
+    for count in (100, 1000, 10000):
+        app = new_app()
+        for i in range(count // 2):
+            app.add_url_rule(f'/api/v1/resource{i}/list', lambda request: 'ok', ['GET'])
+            app.add_url_rule(f'/api/v1/resource{i}/{{id:int}}/detail', lambda request: 'ok', ['GET'])
+        client = TestClient(app)
+        last = count // 2 - 1
+        yield f'{count} routes, static', request_case(client, 'GET', f'/api/v1/resource{last}/list')
+        yield f'{count} routes, dynamic', request_case(client, 'GET', f'/api/v1/resource{last}/42/detail')
+        yield f'{count} routes, not found', request_case(client, 'GET', f'/api/v1/resource{last}/abc/detail',
+                                                         status=404)
+
+
+class _PassMiddleware(MiddlewareBase):
+
+    def before_request(self, request):
+        return request
+
+    def after_request(self, request, response):
+        return response
+
+
+@group
+def middleware():
+    for depth in (0, 5, 10, 20):
+        app = new_app()
+        for i in range(depth):
+            app.add_middlewares(type(f'Middleware{i}', (_PassMiddleware,), {})())
+        app.add_url_rule('/ping', lambda request: 'pong', ['GET'])
+        yield f'{depth} middlewares', request_case(TestClient(app), 'GET', '/ping')
+
+
+@group
+def request():
+    app = new_app()
+
+    @app.post('/body')
+    def read_body(request):
+        return str(len(request.data))
+
+    @app.post('/json')
+    def read_json(request):
+        return str(len(request.get_json()))
+
+    @app.get('/query')
+    def read_query(request):
+        return request.query('page', '1')
+
+    client = TestClient(app, headers={
+        'Host': 'example.com',
+        'User-Agent': 'bench/1.0',
+        'Accept': '*/*',
+        'Authorization': 'Bearer token',
+    })
+    for size in (0, 1024, 64 * 1024, 1024 * 1024):
+        body = b'x' * size
+        yield f'raw body {_size(size)}', request_case(client, 'POST', '/body', body=body)
+    for count in (1, 100, 10000):
+        payload = get_json_codec().dumps([{'id': i, 'name': f'item{i}'} for i in range(count)])
+        yield f'json body {_size(len(payload))}', request_case(
+            client, 'POST', '/json', body=payload, headers={'Content-Type': 'application/json'})
+    yield 'query string, 10 params', request_case(
+        client, 'GET', '/query', query={'page': '2', **{f'key{i}': str(i) for i in range(9)}})
+
+
+@group
+def json_encoding():
+    codec = get_json_codec()
+    small = {'code': 0, 'message': 'ok', 'data': {'id': 1, 'name': 'miniapi', 'enabled': True}}
+    records = [{'id': i, 'name': f'item{i}', 'price': i * 1.5, 'tags': ['a', 'b'], 'active': i % 2 == 0}
+               for i in range(100)]
+    yield f'{codec.name} dumps small dict', lambda: codec.dumps(small)
+    yield f'{codec.name} dumps 100 records', lambda: codec.dumps(records)
+    data = codec.dumps(records)
+    yield f'{codec.name} loads 100 records', lambda: codec.loads(data)
+
+    app = new_app()
+    app.add_url_rule('/small', lambda request: small, ['GET'])
+    app.add_url_rule('/records', lambda request: {'items': records}, ['GET'])
+    client = TestClient(app)
+    yield 'dispatch, return small dict', request_case(client, 'GET', '/small')
+    yield 'dispatch, return 100 records', request_case(client, 'GET', '/records')
+
+
+@group
+def objects():
+    rows = [{'id': i, 'group': i % 10, 'name': f'item{i}', 'price': i * 0.5} for i in range(10000)]
+    lists = [list(row.values()) for row in rows]
+    yield 'o_get 10k rows', lambda: DataObjects.o_get(rows, 'price')
+    yield 'o_index 10k rows', lambda: DataObjects.o_index(lists, 3)
+    yield 'iter_get 10k rows', lambda: sum(1 for _ in DataObjects.iter_get(rows, 'price'))
+    yield 'iter_drop 10k rows', lambda: sum(1 for _ in DataObjects.iter_drop(rows, ['name']))
+    # o_drop会修改原数据，每次使用新的拷贝，拷贝的耗时单独列出
+    yield 'copy 10k rows', lambda: [dict(row) for row in rows]
+    yield 'o_drop 10k rows (with copy)', lambda: DataObjects.o_drop([dict(row) for row in rows], ['name'])
+
+
+def _size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f'{size // (1024 * 1024)}MB'
+    if size >= 1024:
+        return f'{size // 1024}KB'
+    return f'{size}B'
+
+
+def measure(func: t.Callable[[], t.Any], repeat: int, min_time: float) -> dict:
+    """先确定每轮的调用次数使一轮至少耗时min_time秒，再运行repeat轮，返回单次调用耗时(微秒)的统计"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = number * 10 if elapsed < min_time / 10 else number * 2
+    samples = [elapsed / number * 1e6]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        'value': min(samples),
+        'median': statistics.median(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def run(selected: t.List[str], repeat: int, min_time: float, quiet: bool = False) -> t.List[dict]:
+    results = []
+    for group_name, cases in GROUPS.items():
+        for name, func in cases():
+            full_name = f'{group_name}: {name}'
+            if selected and not any(keyword in full_name for keyword in selected):
+                continue
+            stats = measure(func, repeat, min_time)
+            results.append(result(full_name, group_name, **stats))
+            if not quiet:
+                print(f'{full_name:<56} {stats["value"]:>12.3f} us  '  # noqa
+                      f'(median {stats["median"]:.3f}, stdev {stats["stdev"]:.3f})', file=sys.stderr)
+    return results
+
+
+def main(argv: t.Optional[t.List[str]] = None):
+    parser = argparse.ArgumentParser(description='miniapi 进程内基准测试')
+    parser.add_argument('-o', '--output', help='将结果写入JSON文件，- 表示输出到标准输出')
+    parser.add_argument('-k', dest='keywords', action='append', default=[], help='只运行名称包含该关键字的测试，可重复')
+    parser.add_argument('--compare', metavar='BASELINE', help='与保存的基线结果对比')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定为退化的相对变化，默认0.1(10%%)')
+    parser.add_argument('--repeat', type=int, default=5, help='每个测试的轮数')
+    parser.add_argument('--min-time', type=float, default=0.1, help='每轮的最少耗时(秒)')
+    parser.add_argument('--json-backend', help='使用的JSON后端，默认stdlib')
+    args = parser.parse_args(argv)
+
+    if args.json_backend:
+        set_json_codec(args.json_backend)
+    results = run(args.keywords, args.repeat, args.min_time)
+    document = write_results(results, args.output, suite='inprocess', json_backend=get_json_codec().name)
+    if args.compare:
+        if not compare_results(args.compare, document, args.threshold):
+            sys.exit(1)
+    elif not args.output:
+        print(json.dumps(document, indent=2, ensure_ascii=False))  # noqa
+
+
+if __name__ == '__main__':
+    main()
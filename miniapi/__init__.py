@@ -1,3 +1,30 @@
-from miniapi.app import Application
-from miniapi.objects import Objects
-from miniapi import g
+# 按需导入，import miniapi 时不加载整个框架
+_lazy_attributes = {
+    'Application': ('miniapi.app', 'Application'),
+    'Objects': ('miniapi.objects', 'Objects'),
+    'g': ('miniapi.g', None),
+}
+
+# 不导入typing，类型检查工具会把TYPE_CHECKING识别为True
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from miniapi import g
+    from miniapi.app import Application
+    from miniapi.objects import Objects
+
+
+def __getattr__(name: str):
+    target = _lazy_attributes.get(name)
+    if target is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    import importlib
+
+    module_name, attribute = target
+    module = importlib.import_module(module_name)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attributes))
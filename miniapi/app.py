@@ -1,21 +1,29 @@
+import functools
 import inspect
 import traceback
 import typing as t
-from wsgiref.simple_server import make_server
 
 from miniapi import g
+from miniapi.codec import JsonCodec, set_json_codec
 from miniapi.config import _SetupConfig
 from miniapi.exc import HTTPException
-from miniapi.httpserver.handler import WSGIRequestHandler
-from miniapi.httpserver.server import ThreadingWSGIServer
 from miniapi.middleware.base import MiddlewareBase
 from miniapi.objects import Objects
+from miniapi.params import compile_params, inject_params
 from miniapi.request import Request
-from miniapi.response import Response, JsonResponse
-from miniapi.route import HandlerMapper
+from miniapi.response import Response, JsonResponse, error_response, iter_async
+from miniapi.route import Endpoint, HandlerMapper
 from miniapi.status import HTTPStatus
 from miniapi.utils import get_root_path, import_string
 
+# 内置服务、ASGI、指标以及耗时分析只在使用时导入，减少只处理请求的工作进程的启动时间
+if t.TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from miniapi.httpserver.server import PooledWSGIServer
+    from miniapi.metrics import Metrics
+    from miniapi.profiling import Profiler
+
 HTTP_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH']
 
 
@@ -25,7 +33,12 @@ class Application:
     def __call__(self, environ, start_response):
         return self.wsgi_app(environ, start_response)
 
-    def __init__(self, import_name: str, obj_cls: t.Type[Objects] = None, root_path: t.Optional[str] = None):
+    def __init__(
+            self,
+            import_name: str,
+            obj_cls: t.Type[Objects] = None,
+            root_path: t.Optional[str] = None,
+            json_backend: t.Union[str, JsonCodec, None] = None):
         # 生成root_path
         self.import_name = import_name
         if root_path is None:
@@ -37,24 +50,48 @@ class Application:
         # 初始化application.yaml配置
         self._config = self.init_config(root_path)
 
+        # JSON编解码后端，参数json_backend优先于application.yaml中的json.backend
+        self.json_codec: JsonCodec = set_json_codec(json_backend or self._config.get_json_backend())
+
+        # 是否已经冻结，冻结后不能再注册路由以及全局中间件
+        self.frozen = False
+
+        # 路由映射执行函数
+        # 每个路由的中间件链(全局中间件排除禁用的 + 局部中间件)在注册时编译好保存在Endpoint上
+        self._handlers_mapper = HandlerMapper()
+
         # 全局中间件列表
         # middleware_mapper: 全局中间件映射表 {中间件类名: 中间件对象}
-        # middleware_forbidden_mapper: 禁用全局中间件映射表 {请求方法 + 请求路径: 中间件类名列表}
-        # middleware_partial_mapper: 局部中间件映射表 {请求方法 + 请求路径: 中间件对象列表}
         self.middleware_mapper: dict = {}
-        self.middleware_forbidden_mapper: dict = {}
-        self.middleware_partial_mapper: dict = {}
         self._load_config_middlewares()
 
+        # 允许的最大请求体字节数，None表示不限制
+        self.max_body_size: t.Optional[int] = self._config.get_max_body_size()
+
         # 自定义异常拦截函数列表
         self.error_blocking_funcs: list = []
 
-        # 路由映射执行函数
-        self._handlers_mapper = HandlerMapper()
-
         # 扩展
         self.extensions = {}
 
+        # run启动的内置服务
+        self.server: t.Optional['PooledWSGIServer'] = None
+
+        # ASGI模式下执行同步函数的线程池，首次使用时创建
+        self._executor: t.Optional['ThreadPoolExecutor'] = None
+
+        # 请求指标，通过enable_metrics或者application.yaml中的metrics启用
+        self.metrics: t.Optional['Metrics'] = None
+        metrics_options = self._config.get_metrics_options()
+        if metrics_options is not None:
+            self.enable_metrics(**metrics_options)
+
+        # 请求耗时分析，通过enable_profiling或者application.yaml中的profiling启用
+        self.profiler: t.Optional['Profiler'] = None
+        profiling_options = self._config.get_profiling_options()
+        if profiling_options is not None:
+            self.enable_profiling(**profiling_options)
+
         # app挂在g对象上
         g.app = self
 
@@ -86,135 +123,437 @@ class Application:
         return _objs
 
     def run(self):
+        from miniapi.httpserver.handler import WSGIRequestHandler
+        from miniapi.httpserver.prefork import PreforkServer
+        from miniapi.httpserver.server import PooledWSGIServer
+
         host, port = self._config.get_socket_info()
+        options = self._config.get_server_options()
+        self.freeze()
+
+        # 多进程模式，app在fork之前已经创建好，工作进程通过写时复制共享
+        prefork_options = self._config.get_prefork_options()
+        if prefork_options is not None:
+            server = PreforkServer(self, (host, port), WSGIRequestHandler, server_options=options, **prefork_options)
+            print(f"Serving on http://{host}:{port} with {server.workers} workers")  # noqa
+            server.serve_forever()
+            return
+
         try:
-            with make_server(host, port, self, ThreadingWSGIServer, WSGIRequestHandler) as server:
+            with PooledWSGIServer((host, port), WSGIRequestHandler, **options) as server:
+                server.set_app(self)
+                self.server = server
                 print(f"Serving on http://{host}:{port}")  # noqa
                 server.serve_forever()
         except KeyboardInterrupt:
             server.shutdown()
 
+    def freeze(self):
+        """启动服务前预先计算所有路由以及中间件结构，之后不能再注册路由以及全局中间件
+
+        run以及ASGI的lifespan.startup会自动调用。重新编译所有路由的中间件链，启用指标时预先创建每个路由的指标，
+        并预先加载mimetypes数据库；多进程模式下这些都在fork之前完成，由工作进程共享。
+        """
+        if self.frozen:
+            return
+        import mimetypes
+
+        self._handlers_mapper.compile(self.middleware_mapper)
+        if self.metrics is not None:
+            for endpoint in self._handlers_mapper.endpoints():
+                self.metrics.route(endpoint)
+        mimetypes.init()
+        self.frozen = True
+
+    def _check_not_frozen(self):
+        if self.frozen:
+            raise AssertionError('应用已经冻结(freeze),不能再注册路由或者全局中间件,请在启动服务之前注册.')
+
     @staticmethod
-    def adapt_response(func):
+    def make_response(response) -> Response:
+        """将执行函数的返回值转换为Response"""
+        if isinstance(response, str):
+            return Response(body=response)
+        elif isinstance(response, bytes):
+            return Response(body=response)
+        elif isinstance(response, dict):
+            return JsonResponse(response)
+        elif isinstance(response, Response):
+            return response
+        else:
+            raise ValueError(f"返回值类型错误,请返回str,bytes,dict,Response类型,当前返回值类型为{type(response)}")
 
+    @classmethod
+    def adapt_response(cls, func):
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return cls.make_response(await func(*args, **kwargs))
+
+            return async_wrapper
+
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            response = func(*args, **kwargs)
-            if isinstance(response, str):
-                return Response(body=response)
-            elif isinstance(response, bytes):
-                return Response(body=response)
-            elif isinstance(response, dict):
-                return JsonResponse(response)
-            elif isinstance(response, Response):
-                return response
-            else:
-                raise ValueError(f"返回值类型错误,请返回str,bytes,dict,Response类型,当前返回值类型为{type(response)}")
+            return cls.make_response(func(*args, **kwargs))
 
         return wrapper
 
+    def enable_metrics(self, path: t.Optional[str] = '/metrics', buckets: t.Optional[t.Sequence[float]] = None):
+        """启用请求指标统计，path不为None时注册以Prometheus文本格式输出指标的接口"""
+        from miniapi.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Metrics
+
+        self.metrics = Metrics(buckets)
+        if path is None:
+            return
+
+        def metrics_endpoint(request):
+            return Response(self.metrics.render(self.server), content_type=METRICS_CONTENT_TYPE)
+
+        self.add_url_rule(path, metrics_endpoint, ['GET'])
+
+    def enable_profiling(
+            self,
+            threshold: float = 0.5,
+            keep: int = 50,
+            profile_rate: float = 0.0,
+            profile_dir: t.Optional[str] = None,
+            path: t.Optional[str] = '/debug/slow-requests'):
+        """启用请求分阶段耗时分析，path不为None时注册列出最近慢请求的调试接口"""
+        from miniapi.profiling import Profiler
+
+        self.profiler = Profiler(threshold, keep, profile_rate, profile_dir)
+        if path is None:
+            return
+
+        def slow_requests_endpoint(request):
+            limit = request.query('limit')
+            return JsonResponse({
+                'threshold_ms': self.profiler.threshold * 1000,
+                'requests': self.profiler.slowest(int(limit) if limit and limit.isdigit() else None),
+            })
+
+        self.add_url_rule(path, slow_requests_endpoint, ['GET'])
+
     def wsgi_app(self, environ, start_response):
         """wsgi请求上下文"""
         return self.dispatch_request(environ, start_response)
 
-    def dispatch_request(self, environ, start_response):
-        """请求处理"""
-        request = Request(environ)
-
+    async def asgi_app(self, scope, receive, send):
+        """asgi请求上下文"""
+        if scope['type'] == 'lifespan':
+            await self._asgi_lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise NotImplementedError(f"不支持的ASGI协议类型:{scope['type']}")
+        from miniapi.asgi import read_body, scope_to_environ, send_response
+
+        endpoint, path_params = self._handlers_mapper.resolve(scope['method'], scope['path'])
+        if endpoint.stream_body:
+            # 请求体由接口函数通过request.aiter_body()读取
+            environ = scope_to_environ(scope, None)
+            environ['asgi.receive'] = receive
+        else:
+            try:
+                body = await read_body(receive, self.max_body_size)
+            except HTTPException:
+                endpoint, body = self._handlers_mapper.payload_too_large, b''
+            environ = scope_to_environ(scope, body)
+
+        # 长时间的流式响应(例如EventStreamResponse)通过receive得知客户端已经断开
+        environ['miniapi.receive'] = receive
+        request = Request(environ, self.max_body_size)
+        request.path_params = path_params
+        if self._is_body_too_large(request):
+            endpoint = self._handlers_mapper.payload_too_large
+        metrics = self.metrics
+        if metrics is not None:
+            token = metrics.start(endpoint)
+        response = await self.handle_request_async(request, endpoint)
+        if metrics is not None:
+            metrics.finish(token, response.status)
+        await send_response(send, response, environ, self.executor)
+
+    async def _asgi_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.freeze()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @property
+    def executor(self) -> 'ThreadPoolExecutor':
+        """ASGI模式下执行同步函数的有界线程池"""
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(self._config.get_asgi_threads(), thread_name_prefix='miniapi')
+        return self._executor
+
+    def dispatch_request(self, environ, start_response, trace: t.Optional[t.Callable[[str], None]] = None):
+        """请求处理
+
+        trace不为None时，在解析请求(parse)、handle_request中的各阶段以及序列化响应(serialize)完成后以阶段名称调用，
+        启用耗时分析时由Profiler传入。
+        """
+        if trace is None and self.profiler is not None:
+            return self.profiler.dispatch(self, environ, start_response)
+
+        request = Request(environ, self.max_body_size)
+        endpoint, request.path_params = self._handlers_mapper.resolve(request.method, request.path)
+        if self._is_body_too_large(request):
+            endpoint = self._handlers_mapper.payload_too_large
+        metrics = self.metrics
+        if metrics is not None:
+            token = metrics.start(endpoint)
+        if trace is not None:
+            trace('parse')
+
+        # 包含async执行函数或中间件的路由，在WSGI模式下为当前请求单独运行事件循环
+        if endpoint.is_async:
+            import asyncio
+            response = asyncio.run(self.handle_request_async(request, endpoint, trace))
+        else:
+            response = self.handle_request(request, endpoint, trace)
+        if metrics is not None:
+            metrics.finish(token, response.status)
+
+        body = response.prepare(environ)
+        if hasattr(body, '__aiter__'):
+            body = iter_async(body)
+        if trace is not None:
+            trace('serialize')
+        start_response(response.status, response.headers.to_list())
+        return body
+
+    def _is_body_too_large(self, request: Request) -> bool:
+        """请求头中声明的请求体长度超过限制时，不读取请求体直接返回413"""
+        if self.max_body_size is None:
+            return False
+        content_length = request.content_length
+        return content_length is not None and content_length > self.max_body_size
+
+    def handle_request(
+            self,
+            request: Request,
+            endpoint: Endpoint,
+            trace: t.Optional[t.Callable[[str], None]] = None) -> Response:
+        """执行中间件以及接口函数，返回响应
+
+        trace不为None时，每个中间件的before_request/after_request以及接口函数执行完后以阶段名称调用，
+        阶段名称为before:<中间件名称>、handler、after:<中间件名称>，用于记录各阶段耗时。
+        """
+        request.endpoint = endpoint
         try:
             # 请求前
-            request_key = f'{request.method}:{request.path}'
-            forbidden_middleware_names = self.middleware_forbidden_mapper.get(request_key, [])
-            partial_middleware_objs = self.middleware_partial_mapper.get(request_key, [])
-            request = self.execute_before_request(request, partial_middleware_objs, forbidden_middleware_names)
+            result, after_middlewares = self.execute_before_request(request, endpoint, trace)
 
-            try:
-                response = self.context(request)
-
-            # 拦截接口执行函数的异常
-            except HTTPException as e:
-                response = Response('', e.status)
-            except Exception:  # noqa
-                traceback.print_exc()
-                response = Response('', HTTPStatus.INTERNAL_SERVER_ERROR)
+            # 请求前的中间件返回Response时不再执行接口函数以及剩余的中间件
+            if isinstance(result, Response):
+                response = result
+            else:
+                request = result
+                try:
+                    response = endpoint.handler(request)
+
+                # 拦截接口执行函数的异常，没有请求后的中间件时直接使用共享的错误响应
+                except HTTPException as e:
+                    response = error_response(e.status, shared=not after_middlewares)
+                except Exception:  # noqa
+                    traceback.print_exc()
+                    response = error_response(HTTPStatus.INTERNAL_SERVER_ERROR, shared=not after_middlewares)
+                if trace is not None:
+                    trace('handler')
 
             # 请求后
-            response = self.execute_after_request(request, response, partial_middleware_objs,
-                                                  forbidden_middleware_names)
+            response = self.execute_after_request(request, response, after_middlewares, trace)
 
-        # 拦截中间件引发的异常
+        # 拦截中间件引发的异常，之后不再执行中间件，可以使用共享的错误响应
         except HTTPException as e:
-            response = Response('', e.status)
+            response = error_response(e.status, shared=True)
         except Exception:  # noqa
             traceback.print_exc()
-            response = Response('', HTTPStatus.INTERNAL_SERVER_ERROR)
+            response = error_response(HTTPStatus.INTERNAL_SERVER_ERROR, shared=True)
+        finally:
+            if endpoint.teardown_middlewares:
+                self.execute_teardown_request(request, endpoint)
+        return response
 
-        start_response(response.status, response.headers)
-        if isinstance(response.body, str):
-            return [response.body.encode('utf-8')]
-        elif isinstance(response.body, bytes):
-            return [response.body]
-        else:
-            return [response.body]
+    async def handle_request_async(
+            self,
+            request: Request,
+            endpoint: Endpoint,
+            trace: t.Optional[t.Callable[[str], None]] = None) -> Response:
+        """handle_request的异步版本，同步的接口函数放到线程池中执行，避免阻塞事件循环"""
+        request.endpoint = endpoint
+        try:
+            # 请求前
+            result, after_middlewares = await self.execute_before_request_async(request, endpoint, trace)
 
-    def execute_after_request(self, request, response, partial, forbidden):
-        for middleware_obj in reversed(partial):
-            response = middleware_obj.after_request(request, response)
-        for name, middleware_obj in self.middleware_mapper.items():
-            if name in forbidden:
-                continue
+            # 请求前的中间件返回Response时不再执行接口函数以及剩余的中间件
+            if isinstance(result, Response):
+                response = result
+            else:
+                request = result
+                try:
+                    if endpoint.handler_is_async:
+                        response = await endpoint.handler(request)
+                    elif endpoint.offload:
+                        import asyncio
+                        loop = asyncio.get_running_loop()
+                        response = await loop.run_in_executor(self.executor, endpoint.handler, request)
+                    else:
+                        response = endpoint.handler(request)
+
+                # 拦截接口执行函数的异常，没有请求后的中间件时直接使用共享的错误响应
+                except HTTPException as e:
+                    response = error_response(e.status, shared=not after_middlewares)
+                except Exception:  # noqa
+                    traceback.print_exc()
+                    response = error_response(HTTPStatus.INTERNAL_SERVER_ERROR, shared=not after_middlewares)
+                if trace is not None:
+                    trace('handler')
+
+            # 请求后
+            response = await self.execute_after_request_async(request, response, after_middlewares, trace)
+
+        # 拦截中间件引发的异常，之后不再执行中间件，可以使用共享的错误响应
+        except HTTPException as e:
+            response = error_response(e.status, shared=True)
+        except Exception:  # noqa
+            traceback.print_exc()
+            response = error_response(HTTPStatus.INTERNAL_SERVER_ERROR, shared=True)
+        finally:
+            if endpoint.teardown_middlewares:
+                self.execute_teardown_request(request, endpoint)
+        return response
+
+    @staticmethod
+    def execute_after_request(request, response, middlewares: t.Sequence[MiddlewareBase], trace=None):
+        for middleware_obj in middlewares:
             response = middleware_obj.after_request(request, response)
+            if trace is not None:
+                trace(f'after:{middleware_obj.uni_name()}')
         return response
 
-    def execute_before_request(self, request, partial, forbidden):
-        for name, middleware_obj in self.middleware_mapper.items():
-            if name in forbidden:
-                continue
-            request = middleware_obj.before_request(request)
-        for middleware_obj in partial:
+    @staticmethod
+    def execute_teardown_request(request, endpoint: Endpoint):
+        """请求结束处理，中间件抛出的异常不影响响应"""
+        for middleware_obj in endpoint.teardown_middlewares:
+            try:
+                middleware_obj.teardown_request(request)
+            except Exception:  # noqa
+                traceback.print_exc()
+
+    @staticmethod
+    def execute_before_request(
+            request, endpoint: Endpoint, trace=None) -> t.Tuple[t.Union[Request, Response], tuple]:
+        """依次执行请求前的中间件
+
+        返回(请求, 需要执行请求后处理的中间件)；某个中间件返回Response时立即停止，
+        返回该Response以及已经执行过的中间件。
+        """
+        for index, middleware_obj in enumerate(endpoint.before_middlewares):
             request = middleware_obj.before_request(request)
-        return request
+            if trace is not None:
+                trace(f'before:{middleware_obj.uni_name()}')
+            if isinstance(request, Response):
+                return request, endpoint.short_circuit_middlewares[index]
+        return request, endpoint.after_middlewares
 
-    def context(self, request: Request) -> Response:
-        # 404异常处理
-        method_handlers = self._handlers_mapper.get_method_handlers(request.path)
-        if not method_handlers:
-            raise HTTPException(HTTPStatus.NOT_FOUND)
+    @staticmethod
+    async def execute_after_request_async(request, response, middlewares: t.Sequence[MiddlewareBase], trace=None):
+        for middleware_obj in middlewares:
+            response = middleware_obj.after_request(request, response)
+            if inspect.isawaitable(response):
+                response = await response
+            if trace is not None:
+                trace(f'after:{middleware_obj.uni_name()}')
+        return response
 
-        # 405异常处理
-        handler = method_handlers.get(request.method, None)
-        if not handler:
-            raise HTTPException(HTTPStatus.METHOD_NOT_ALLOWED)
+    @staticmethod
+    async def execute_before_request_async(
+            request, endpoint: Endpoint, trace=None) -> t.Tuple[t.Union[Request, Response], tuple]:
+        for index, middleware_obj in enumerate(endpoint.before_middlewares):
+            request = middleware_obj.before_request(request)
+            if inspect.isawaitable(request):
+                request = await request
+            if trace is not None:
+                trace(f'before:{middleware_obj.uni_name()}')
+            if isinstance(request, Response):
+                return request, endpoint.short_circuit_middlewares[index]
+        return request, endpoint.after_middlewares
 
-        return handler(request)
+    def context(self, request: Request) -> Response:
+        # 未匹配到路由时抛出404异常，请求方式不被允许时抛出405异常
+        endpoint, request.path_params = self._handlers_mapper.resolve(request.method, request.path)
+        return endpoint.handler(request)
 
     def route(
             self,
             rule: str,
             methods: t.List[str],
             middlewares: t.Optional[list] = None,
-            forbidden: t.Optional[list] = None):
+            forbidden: t.Optional[list] = None,
+            stream_body: bool = False):
         """注册普通函数的装饰器"""
 
         def decorator(func):
-            self.add_url_rule(rule, func, methods, middlewares, forbidden)
+            self.add_url_rule(rule, func, methods, middlewares, forbidden, stream_body)
             return func
 
         return decorator
 
-    def get(self, rule: str, middlewares: t.Optional[list] = None, forbidden: t.Optional[list] = None):
-        return self.route(rule, methods=['GET'], middlewares=middlewares, forbidden=forbidden)
+    def get(
+            self,
+            rule: str,
+            middlewares: t.Optional[list] = None,
+            forbidden: t.Optional[list] = None,
+            stream_body: bool = False):
+        return self.route(rule, methods=['GET'], middlewares=middlewares, forbidden=forbidden,
+                          stream_body=stream_body)
 
-    def post(self, rule: str, middlewares: t.Optional[list] = None, forbidden: t.Optional[list] = None):
-        return self.route(rule, methods=['POST'], middlewares=middlewares, forbidden=forbidden)
+    def post(
+            self,
+            rule: str,
+            middlewares: t.Optional[list] = None,
+            forbidden: t.Optional[list] = None,
+            stream_body: bool = False):
+        return self.route(rule, methods=['POST'], middlewares=middlewares, forbidden=forbidden,
+                          stream_body=stream_body)
 
-    def put(self, rule: str, middlewares: t.Optional[list] = None, forbidden: t.Optional[list] = None):
-        return self.route(rule, methods=['PUT'], middlewares=middlewares, forbidden=forbidden)
+    def put(
+            self,
+            rule: str,
+            middlewares: t.Optional[list] = None,
+            forbidden: t.Optional[list] = None,
+            stream_body: bool = False):
+        return self.route(rule, methods=['PUT'], middlewares=middlewares, forbidden=forbidden,
+                          stream_body=stream_body)
 
-    def delete(self, rule: str, middlewares: t.Optional[list] = None, forbidden: t.Optional[list] = None):
-        return self.route(rule, methods=['DELETE'], middlewares=middlewares, forbidden=forbidden)
+    def delete(
+            self,
+            rule: str,
+            middlewares: t.Optional[list] = None,
+            forbidden: t.Optional[list] = None,
+            stream_body: bool = False):
+        return self.route(rule, methods=['DELETE'], middlewares=middlewares, forbidden=forbidden,
+                          stream_body=stream_body)
 
-    def patch(self, rule: str, middlewares: t.Optional[list] = None, forbidden: t.Optional[list] = None):
-        return self.route(rule, methods=['PATCH'], middlewares=middlewares, forbidden=forbidden)
+    def patch(
+            self,
+            rule: str,
+            middlewares: t.Optional[list] = None,
+            forbidden: t.Optional[list] = None,
+            stream_body: bool = False):
+        return self.route(rule, methods=['PATCH'], middlewares=middlewares, forbidden=forbidden,
+                          stream_body=stream_body)
 
     def add_url_rule(
             self,
@@ -222,8 +561,10 @@ class Application:
             func=None,
             methods: t.Optional[t.List[str]] = None,
             middlewares: t.Optional[t.List[t.Union[MiddlewareBase, str]]] = None,
-            forbidden: t.Optional[t.List[t.Union[MiddlewareBase, str]]] = None):
+            forbidden: t.Optional[t.List[t.Union[MiddlewareBase, str]]] = None,
+            stream_body: bool = False):
         """函数的方式注册函数路由"""
+        self._check_not_frozen()
         _methods = []
         for method in methods:
             method = method.upper()
@@ -236,20 +577,22 @@ class Application:
         if 'request' not in signature.parameters:
             raise ValueError(f"函数 '{func.__name__}' 必须包含 'request' 参数.")
 
+        # 带类型注解的路径参数、查询参数以及请求体参数在注册时编译好读取以及校验函数
+        bind = compile_params(func, path, stream_body)
+        if bind is not None:
+            func = inject_params(func, bind)
+
         # 添加自适应返回结果
         func = self.adapt_response(func)
 
         # 禁用全局中间件
-        forbidden_middleware_objs = self._parse_route_middlewares(forbidden, is_obj=False)
+        forbidden_middleware_names = self._parse_route_middlewares(forbidden, is_obj=False)
 
         # 局部中间件
         middleware_objs = self._parse_route_middlewares(middlewares)
 
         for method in _methods:
-            key = f'{method}:{path}'
-            self.middleware_forbidden_mapper[key] = forbidden_middleware_objs
-            self.middleware_partial_mapper[key] = middleware_objs
-            self._handlers_mapper.add(path, method, func)
+            self._handlers_mapper.add(path, method, func, middleware_objs, forbidden_middleware_names, stream_body)
 
     def _parse_route_middlewares(self, middlewares, is_obj=True):
         """检查路由注册的中间件"""
@@ -274,6 +617,7 @@ class Application:
 
     def add_middlewares(self, middleware: t.Union[MiddlewareBase, str]):
         """注册全局中间件"""
+        self._check_not_frozen()
         if isinstance(middleware, str):
             middleware = import_string(middleware)()
 
@@ -282,6 +626,9 @@ class Application:
 
         self.middleware_mapper[middleware.uni_name()] = middleware
 
+        # 重新编译已注册路由的中间件链
+        self._handlers_mapper.compile(self.middleware_mapper)
+
     def _load_config_middlewares(self):
         """加载配置文件中的中间件"""
         for middleware_config in self._config.get_middleware():  # type: dict
@@ -292,4 +639,11 @@ class Application:
                                  'middlewares:\n'
                                  '  - name: demo.middleware.DemoMiddleware\n'
                                  '    demo_param: "*"')
-            self.add_middlewares(name)
+            # options中的配置项作为中间件的初始化参数，其他配置项不传给中间件
+            options = middleware_config.get('options')
+            if options is None:
+                self.add_middlewares(name)
+                continue
+            if not isinstance(options, dict):
+                raise ValueError(f'application.yaml 中间件 {name} 的 options 必须是字典,当前值为{options!r}')
+            self.add_middlewares(import_string(name)(**options))
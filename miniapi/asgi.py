@@ -0,0 +1,109 @@
+"""ASGI模式下的请求转换以及响应发送"""
+import io
+import sys
+import typing as t
+
+from miniapi.exc import HTTPException
+from miniapi.response import Response
+from miniapi.status import HTTPStatus
+
+if t.TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+
+def scope_to_environ(scope: dict, body: t.Optional[bytes]) -> dict:
+    """将ASGI的http scope转换为WSGI风格的environ，使Request在两种模式下保持一致
+
+    body为None表示请求体尚未读取，Content-Length以请求头为准
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': '',
+        'wsgi.input': io.BytesIO(body or b''),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'asgi.scope': scope,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in environ and key.startswith('HTTP_'):
+            value = environ[key] + ',' + value
+        environ[key] = value
+
+    # 请求体已经完整读取，以实际长度为准
+    if body is not None:
+        environ['CONTENT_LENGTH'] = str(len(body)) if body else ''
+    return environ
+
+
+async def read_body(receive: t.Callable, max_size: t.Optional[int] = None) -> bytes:
+    """读取完整的请求体，超过max_size时抛出413异常"""
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise HTTPException(HTTPStatus.PAYLOAD_TOO_LARGE)
+        chunks.append(chunk)
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def send_response(send: t.Callable, response: Response, environ: dict, executor: t.Optional['Executor'] = None):
+    """发送响应，同步的文件以及迭代器响应体在线程池中读取，避免阻塞事件循环"""
+    body = response.prepare(environ)
+
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': response.asgi_headers(),
+    })
+
+    if isinstance(body, list):
+        await send({'type': 'http.response.body', 'body': bytes(b''.join(body))})
+        return
+
+    if hasattr(body, '__aiter__'):
+        async for chunk in body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                await send({'type': 'http.response.body', 'body': bytes(chunk), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    import asyncio
+    loop = asyncio.get_running_loop()
+    iterator = iter(body)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next, iterator, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': bytes(chunk), 'more_body': True})
+    finally:
+        if hasattr(body, 'close'):
+            await loop.run_in_executor(executor, body.close)
+    await send({'type': 'http.response.body', 'body': b''})
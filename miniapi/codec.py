@@ -0,0 +1,209 @@
+"""可替换的JSON编解码
+
+JsonResponse、Application.adapt_response以及Request.get_json统一使用这里选择的JSON后端，
+可以在application.yaml的json.backend或者Application(json_backend=...)中选择。
+"""
+import json
+import typing as t
+
+
+class JsonCodec:
+    """JSON编解码后端，dumps统一返回bytes
+
+    dumps的参数中ensure_ascii、indent、sort_keys、default各后端都可以使用，由后端转换为自己的参数；
+    native_kwargs中列出的是后端自己的参数，原样传递；其他参数直接抛出TypeError，而不是在换用后端后才出错。
+    """
+
+    name = ''
+    # loads解析失败时抛出的异常类型
+    decode_error: t.Type[Exception] = ValueError
+
+    # 各后端通用的dumps参数
+    PORTABLE_KWARGS = ('ensure_ascii', 'indent', 'sort_keys', 'default')
+    # 后端自己的dumps参数
+    native_kwargs: t.Tuple[str, ...] = ()
+
+    def dumps(self, data: t.Any, **kwargs) -> bytes:
+        if kwargs:
+            return self.dumps_native(data, self.translate_kwargs(kwargs))
+        return self.dumps_native(data, {})
+
+    def loads(self, data: t.Union[bytes, str]) -> t.Any:
+        raise NotImplementedError
+
+    def dumps_native(self, data: t.Any, native: dict) -> bytes:
+        """使用translate_kwargs转换后的参数序列化"""
+        raise NotImplementedError
+
+    def translate_kwargs(self, kwargs: dict) -> dict:
+        """校验dumps参数并转换为后端自己的参数"""
+        self.check_kwargs(kwargs)
+        return kwargs
+
+    def check_kwargs(self, kwargs: dict):
+        unknown = [key for key in kwargs if key not in self.PORTABLE_KWARGS and key not in self.native_kwargs]
+        if unknown:
+            raise TypeError(f'{self.name} JSON后端不支持参数{unknown},'
+                            f'可用的参数为{list(self.PORTABLE_KWARGS + self.native_kwargs)}')
+
+    def encoder(self, **kwargs) -> t.Callable[[t.Any], bytes]:
+        """返回使用指定参数的序列化函数，参数只校验、转换一次，用于逐个序列化大量对象"""
+        if not kwargs:
+            return self.dumps
+        native = self.translate_kwargs(kwargs)
+        dumps_native = self.dumps_native
+
+        def dumps(data):
+            return dumps_native(data, native)
+        return dumps
+
+
+class StdlibJsonCodec(JsonCodec):
+    name = 'stdlib'
+    native_kwargs = ('skipkeys', 'check_circular', 'allow_nan', 'cls', 'separators')
+
+    def dumps(self, data, **kwargs) -> bytes:
+        if kwargs:
+            self.check_kwargs(kwargs)
+        return json.dumps(data, **kwargs).encode('utf-8')
+
+    def dumps_native(self, data, native) -> bytes:
+        return json.dumps(data, **native).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+    native_kwargs = ('option',)
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, data, **kwargs) -> bytes:
+        if kwargs:
+            return self._orjson.dumps(data, **self.translate_kwargs(kwargs))
+        return self._orjson.dumps(data)
+
+    def dumps_native(self, data, native) -> bytes:
+        return self._orjson.dumps(data, **native)
+
+    def translate_kwargs(self, kwargs):
+        self.check_kwargs(kwargs)
+        if kwargs.get('ensure_ascii'):
+            raise ValueError('orjson总是输出UTF-8,不支持ensure_ascii=True')
+        option = kwargs.get('option') or 0
+        indent = kwargs.get('indent')
+        if indent:
+            if indent != 2:
+                raise ValueError(f'orjson只支持indent=2,当前值为{indent}')
+            option |= self._orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys'):
+            option |= self._orjson.OPT_SORT_KEYS
+        native = {}
+        if option:
+            native['option'] = option
+        if kwargs.get('default') is not None:
+            native['default'] = kwargs['default']
+        return native
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+    # 通用参数与ujson.dumps的参数同名，不需要转换
+    native_kwargs = ('encode_html_chars', 'escape_forward_slashes', 'allow_nan', 'reject_bytes', 'separators')
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, data, **kwargs) -> bytes:
+        if kwargs:
+            self.check_kwargs(kwargs)
+        return self._ujson.dumps(data, **kwargs).encode('utf-8')
+
+    def dumps_native(self, data, native) -> bytes:
+        return self._ujson.dumps(data, **native).encode('utf-8')
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+
+class MsgspecCodec(JsonCodec):
+    name = 'msgspec'
+    native_kwargs = ('enc_hook', 'order')
+
+    def __init__(self):
+        import msgspec
+        self.decode_error = msgspec.DecodeError
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+        self._msgspec = msgspec
+
+    def dumps(self, data, **kwargs) -> bytes:
+        if kwargs:
+            return self.dumps_native(data, self.translate_kwargs(kwargs))
+        return self._encoder.encode(data)
+
+    def dumps_native(self, data, native) -> bytes:
+        # native: {'encode': msgspec.json.encode的参数, 'indent': 缩进}
+        encode_kwargs = native.get('encode')
+        body = self._msgspec.json.encode(data, **encode_kwargs) if encode_kwargs else self._encoder.encode(data)
+        if native.get('indent'):
+            body = self._msgspec.json.format(body, indent=native['indent'])
+        return body
+
+    def translate_kwargs(self, kwargs):
+        self.check_kwargs(kwargs)
+        if kwargs.get('ensure_ascii'):
+            raise ValueError('msgspec总是输出UTF-8,不支持ensure_ascii=True')
+        encode_kwargs = {key: kwargs[key] for key in self.native_kwargs if kwargs.get(key) is not None}
+        if kwargs.get('default') is not None:
+            encode_kwargs['enc_hook'] = kwargs['default']
+        if kwargs.get('sort_keys'):
+            encode_kwargs['order'] = 'sorted'
+        return {'encode': encode_kwargs, 'indent': kwargs.get('indent')}
+
+    def loads(self, data):
+        return self._decoder.decode(data)
+
+
+# 可选的JSON后端 {名称: 后端类}
+JSON_CODECS: t.Dict[str, t.Type[JsonCodec]] = {
+    StdlibJsonCodec.name: StdlibJsonCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    UjsonCodec.name: UjsonCodec,
+    MsgspecCodec.name: MsgspecCodec,
+}
+
+_json_codec: JsonCodec = StdlibJsonCodec()
+
+
+def make_json_codec(backend: t.Union[str, JsonCodec]) -> JsonCodec:
+    """根据名称创建JSON后端"""
+    if isinstance(backend, JsonCodec):
+        return backend
+    codec_cls = JSON_CODECS.get(backend)
+    if codec_cls is None:
+        raise ValueError(f'不支持的JSON后端:{backend},请在{list(JSON_CODECS)}中选择.')
+    try:
+        return codec_cls()
+    except ImportError:
+        raise ImportError(f'{backend}未安装，请安装它以使用{backend} JSON后端.') from None
+
+
+def set_json_codec(backend: t.Union[str, JsonCodec]) -> JsonCodec:
+    """设置全局使用的JSON后端"""
+    global _json_codec
+    _json_codec = make_json_codec(backend)
+    return _json_codec
+
+
+def get_json_codec() -> JsonCodec:
+    """获取全局使用的JSON后端"""
+    return _json_codec
@@ -1,27 +1,50 @@
+import marshal
 import os
+import sys
 import typing as t
 
-import yaml
+# 编译后的配置缓存 {配置文件路径: (修改时间, 文件大小, 内容摘要, 配置, 全局常量)}
+_compiled_configs: t.Dict[str, tuple] = {}
+
+# 缓存文件格式版本，格式变化时旧的缓存文件自动失效
+_CACHE_FORMAT = 1
 
 
 class _SetupConfig:
-    """初始化的配置管理"""
+    """初始化的配置管理
+
+    application.yaml解析并校验后的结果缓存在进程内以及缓存文件中，以文件的修改时间、大小以及内容摘要作为key；
+    文件没有变化时不需要导入yaml以及重新解析，加快多进程以及冷启动。
+
+    缓存文件默认为配置文件同目录下的 __pycache__/application.yaml.cache；与字节码文件一样，
+    设置了CACHE_DIR(环境变量MINIAPI_CACHE_DIR)或者PYTHONPYCACHEPREFIX时写入该目录下与配置文件路径对应的位置，
+    设置了PYTHONDONTWRITEBYTECODE时只读取不写入。只读的部署目录中无法写入时直接忽略，每次启动重新解析。
+    """
+
+    CONFIG_FILENAME = 'application.yaml'
+    # 是否使用缓存文件
+    CACHE_ENABLED = True
+    # 缓存文件目录，None时使用sys.pycache_prefix或者配置文件同目录下的__pycache__
+    CACHE_DIR: t.Optional[str] = os.environ.get('MINIAPI_CACHE_DIR') or None
 
     SOCKET_CONFIG_KEY = 'socket'
+    ASGI_CONFIG_KEY = 'asgi'
+    REQUEST_CONFIG_KEY = 'request'
+    JSON_CONFIG_KEY = 'json'
+    METRICS_CONFIG_KEY = 'metrics'
+    PROFILING_CONFIG_KEY = 'profiling'
     MIDDLEWARES_CONFIG_KEY = 'middlewares'
     FINAL_CONFIG_KEY = 'final'
 
     DEFAULT_HOST = 'localhost'
     DEFAULT_PORT = 3333
+    DEFAULT_JSON_BACKEND = 'stdlib'
+    DEFAULT_ASGI_THREADS = min(32, (os.cpu_count() or 1) + 4)
 
     def __init__(self, root_path):
-        # 全局配置
-        self.config = self.read_app_yaml(root_path)
-
-        # 全局常量
-        # 全局常量的key以及其签到结构中的字典的key都会转化为大写
-        final = self.recursively_capitalize_keys(self.config.get(self.FINAL_CONFIG_KEY))
-        self.final = final
+        # config: 全局配置
+        # final: 全局常量，全局常量的key以及其嵌套结构中的字典的key都会转化为大写
+        self.config, self.final = self.load(root_path)
 
     def get_socket_info(self) -> t.Tuple[str, int]:
         """获取并校验启动信息配置"""
@@ -30,6 +53,78 @@ class _SetupConfig:
         port = conf.get('port', self.DEFAULT_PORT)
         return host, port
 
+    def get_server_options(self) -> dict:
+        """获取内置服务的线程池以及长连接配置"""
+        conf = self.config.get(self.SOCKET_CONFIG_KEY) or dict()
+        options = {}
+        # socket.threads对应每个进程中的工作线程数
+        for key, option, _type in (('threads', 'workers', int), ('backlog', 'backlog', int),
+                                   ('queue_size', 'queue_size', int),
+                                   ('request_timeout', 'request_timeout', float),
+                                   ('keep_alive_timeout', 'keep_alive_timeout', float),
+                                   ('max_keep_alive_requests', 'max_keep_alive_requests', int)):
+            if conf.get(key) is None:
+                continue
+            value = _type(conf[key])
+            if value <= 0:
+                raise ValueError(f'application.yaml 中 socket.{key} 必须大于0,当前值为{value}')
+            options[option] = value
+        if conf.get('keep_alive') is not None:
+            options['keep_alive'] = bool(conf['keep_alive'])
+        return options
+
+    def get_prefork_options(self) -> t.Optional[dict]:
+        """获取多进程配置，未启用多进程模式时返回None"""
+        conf = self.config.get(self.SOCKET_CONFIG_KEY) or dict()
+        if not conf.get('prefork'):
+            return None
+        workers = int(conf.get('workers') or os.cpu_count() or 1)
+        if workers <= 0:
+            raise ValueError(f'application.yaml 中 socket.workers 必须大于0,当前值为{workers}')
+        return {'workers': workers, 'reuse_port': bool(conf.get('reuse_port', False))}
+
+    def get_asgi_threads(self) -> int:
+        """获取ASGI模式下执行同步函数的线程池大小"""
+        conf = self.config.get(self.ASGI_CONFIG_KEY) or dict()
+        threads = int(conf.get('threads', self.DEFAULT_ASGI_THREADS))
+        if threads <= 0:
+            raise ValueError(f'application.yaml 中 asgi.threads 必须大于0,当前值为{threads}')
+        return threads
+
+    def get_max_body_size(self) -> t.Optional[int]:
+        """获取允许的最大请求体字节数，未配置时不限制"""
+        conf = self.config.get(self.REQUEST_CONFIG_KEY) or dict()
+        if conf.get('max_body_size') is None:
+            return None
+        max_body_size = int(conf['max_body_size'])
+        if max_body_size < 0:
+            raise ValueError(f'application.yaml 中 request.max_body_size 不能小于0,当前值为{max_body_size}')
+        return max_body_size
+
+    def get_json_backend(self) -> str:
+        """获取JSON编解码后端名称"""
+        conf = self.config.get(self.JSON_CONFIG_KEY) or dict()
+        return conf.get('backend') or self.DEFAULT_JSON_BACKEND
+
+    def get_metrics_options(self) -> t.Optional[dict]:
+        """获取指标配置，未启用时返回None"""
+        conf = self.config.get(self.METRICS_CONFIG_KEY) or dict()
+        if not conf.get('enabled'):
+            return None
+        options = {'path': conf.get('path') or '/metrics'}
+        if conf.get('buckets'):
+            options['buckets'] = [float(b) for b in conf['buckets']]
+        return options
+
+    def get_profiling_options(self) -> t.Optional[dict]:
+        """获取请求耗时分析配置，未启用时返回None"""
+        conf = self.config.get(self.PROFILING_CONFIG_KEY) or dict()
+        if not conf.get('enabled'):
+            return None
+        options = {key: conf[key] for key in ('threshold', 'keep', 'profile_rate', 'profile_dir', 'path')
+                   if conf.get(key) is not None}
+        return options
+
     def get_middleware(self) -> t.List[str]:
         """获取中间件配置"""
         return self.config.get(self.MIDDLEWARES_CONFIG_KEY, [])
@@ -38,30 +133,128 @@ class _SetupConfig:
         """定义全局配置常量"""
         return self.config.get(self.FINAL_CONFIG_KEY)
 
+    def validate(self):
+        """校验配置，配置文件变化后重新解析时调用，错误的配置在启动时就抛出异常"""
+        if not isinstance(self.config, dict):
+            raise ValueError(f'application.yaml 的顶层必须是字典,当前为{type(self.config).__name__}')
+        for key in (self.SOCKET_CONFIG_KEY, self.ASGI_CONFIG_KEY, self.REQUEST_CONFIG_KEY, self.JSON_CONFIG_KEY,
+                    self.METRICS_CONFIG_KEY, self.PROFILING_CONFIG_KEY):
+            if not isinstance(self.config.get(key) or {}, dict):
+                raise ValueError(f'application.yaml 中 {key} 必须是字典')
+        self.get_socket_info()
+        self.get_server_options()
+        self.get_prefork_options()
+        self.get_asgi_threads()
+        self.get_max_body_size()
+        self.get_metrics_options()
+        self.get_profiling_options()
+        middlewares = self.get_middleware() or []
+        if not isinstance(middlewares, list) or not all(isinstance(m, dict) for m in middlewares):
+            raise ValueError('application.yaml 中 middlewares 必须是列表,每一项是包含name的字典')
+
+    @classmethod
+    def load(cls, root_path) -> t.Tuple[dict, t.Any]:
+        """读取编译后的配置，返回(配置, 全局常量)"""
+        path = os.path.abspath(os.path.join(root_path, cls.CONFIG_FILENAME))
+        stat = os.stat(path)
+        cached = _compiled_configs.get(path)
+        if cached is None and cls.CACHE_ENABLED:
+            cached = cls._read_cache(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[3], cached[4]
+
+        import hashlib
+
+        with open(path, 'rb') as file:
+            raw = file.read()
+        digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        if cached is None or cached[2] != digest:
+            instance = cls.__new__(cls)
+            instance.config = cls.parse_app_yaml(raw) or {}
+            instance.validate()
+            final = cls.recursively_capitalize_keys(instance.config.get(cls.FINAL_CONFIG_KEY))
+            cached = (stat.st_mtime_ns, stat.st_size, digest, instance.config, final)
+        else:
+            # 只有修改时间变化，内容没有变化
+            cached = (stat.st_mtime_ns, stat.st_size) + cached[2:]
+        _compiled_configs[path] = cached
+        if cls.CACHE_ENABLED:
+            cls._write_cache(path, cached)
+        return cached[3], cached[4]
+
+    @classmethod
+    def _cache_path(cls, path: str) -> str:
+        directory, filename = os.path.split(path)
+        cache_dir = cls.CACHE_DIR or sys.pycache_prefix
+        if cache_dir:
+            # 与PYTHONPYCACHEPREFIX相同，在缓存目录下按配置文件的绝对路径建立目录，不同项目的缓存不会冲突
+            directory = os.path.join(cache_dir, os.path.splitdrive(directory)[1].lstrip(os.sep))
+        else:
+            directory = os.path.join(directory, '__pycache__')
+        return os.path.join(directory, filename + '.cache')
+
+    @classmethod
+    def _read_cache(cls, path: str) -> t.Optional[tuple]:
+        try:
+            with open(cls._cache_path(path), 'rb') as file:
+                data = marshal.load(file)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, tuple) or len(data) != 6 or data[0] != _CACHE_FORMAT:
+            return None
+        return data[1:]
+
+    @classmethod
+    def _write_cache(cls, path: str, cached: tuple):
+        if sys.dont_write_bytecode:
+            return
+        cache_path = cls._cache_path(path)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        try:
+            # 配置中包含marshal不支持的类型(例如yaml中的日期)时不写入缓存文件
+            data = marshal.dumps((_CACHE_FORMAT,) + cached)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, cache_path)
+        except (OSError, ValueError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
     @staticmethod
-    def read_app_yaml(root_path):
-        """读取app所需要的ini配置文件"""
+    def parse_app_yaml(raw: bytes) -> t.Any:
+        """解析配置文件内容，优先按utf-8解码，失败时使用系统默认编码"""
+        import locale
+
+        import yaml
+
         try:
-            with open(os.path.join(root_path, 'application.yaml'), 'r') as file:
-                data = yaml.safe_load(file)
+            text = raw.decode('utf-8-sig')
         except UnicodeDecodeError:
-            with open(os.path.join(root_path, 'application.yaml'), 'r', encoding='utf-8') as file:
-                data = yaml.safe_load(file)
-        return data
+            text = raw.decode(locale.getpreferredencoding(False))
+        return yaml.safe_load(text)
+
+    @classmethod
+    def read_app_yaml(cls, root_path):
+        """读取app所需要的yaml配置文件"""
+        return cls.load(root_path)[0]
 
-    def recursively_capitalize_keys(self, input_data):
+    @classmethod
+    def recursively_capitalize_keys(cls, input_data):
         """将传入数据中的字典的key转化为大写，不管嵌套多深"""
         if isinstance(input_data, dict):
             new_dict = {}
             for key, value in input_data.items():
                 new_key = key.upper()
-                new_value = self.recursively_capitalize_keys(value)
+                new_value = cls.recursively_capitalize_keys(value)
                 new_dict[new_key] = new_value
             return new_dict
         elif isinstance(input_data, list):
             new_list = []
             for item in input_data:
-                new_list.append(self.recursively_capitalize_keys(item))
+                new_list.append(cls.recursively_capitalize_keys(item))
             return new_list
         else:
             return input_data
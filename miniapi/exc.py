@@ -1,14 +1,32 @@
-from miniapi.status import HTTPStatus
+import typing as t
+
+from miniapi.status import STATUS_LINE_SET, HTTPStatus, status_line
 
 
 class HTTPException(Exception):
     """HTTP请求异常基类"""
 
-    def __init__(self, status: HTTPStatus):
-        super().__init__(status)
-        if status not in HTTPStatus.values():
+    def __init__(self, status: t.Union[str, int]):
+        # status可以是状态行或者状态码，统一转换为预先构建好的状态行
+        try:
+            status = status_line(status)
+        except ValueError:
+            raise KeyError(f'非法的HTTP状态码:{status}') from None
+        if status not in STATUS_LINE_SET:
             raise KeyError(f'非法的HTTP状态码:{status}')
+        super().__init__(status)
         self.status = status
 
     def __str__(self):
         return f'HTTPException: {self.status})'
+
+
+class ValidationError(HTTPException):
+    """请求参数校验失败，errors为字段错误列表 [{'loc': [...], 'msg': ..., 'type': ...}]，响应为422"""
+
+    def __init__(self, errors: t.List[dict]):
+        super().__init__(HTTPStatus.UNPROCESSABLE_ENTITY)
+        self.errors = errors
+
+    def __str__(self):
+        return f'ValidationError: {self.errors}'
@@ -0,0 +1,168 @@
+import typing as t
+
+# 允许出现多次的响应头(小写)，add时追加而不是替换
+MULTI_VALUE_HEADER = 'set-cookie'
+
+
+class Headers:
+    """响应头
+
+    按名称忽略大小写，同名的响应头只保留一个(Set-Cookie除外)，保持第一次设置时的顺序，名称使用最后一次设置时的写法。
+    迭代得到 (名称, 值)，兼容原来的响应头列表：append((名称, 值))、以列表初始化都可以使用。
+    """
+
+    __slots__ = ('_store',)
+
+    def __init__(self, headers: t.Union['Headers', t.Iterable[t.Tuple[str, str]], t.Mapping[str, str], None] = None):
+        # _store: {小写名称: (名称, 值)}，Set-Cookie的值为列表
+        self._store: t.Dict[str, t.Tuple[str, t.Any]] = {}
+        if headers is not None:
+            self.update(headers)
+
+    @classmethod
+    def single(cls, name: str, value: str) -> 'Headers':
+        """只有一个响应头的Headers，不经过__init__，用于每个响应都要创建的默认响应头"""
+        headers = cls.__new__(cls)
+        headers._store = {name.lower(): (name, [value] if name.lower() == MULTI_VALUE_HEADER else value)}
+        return headers
+
+    def __iter__(self) -> t.Iterator[t.Tuple[str, str]]:
+        if MULTI_VALUE_HEADER not in self._store:
+            # 没有多值响应头时_store的值就是(名称, 值)
+            return iter(self._store.values())
+        return self._iter_multi()
+
+    def _iter_multi(self) -> t.Iterator[t.Tuple[str, str]]:
+        for name, value in self._store.values():
+            if type(value) is list:
+                for item in value:
+                    yield name, item
+            else:
+                yield name, value
+
+    def __len__(self) -> int:
+        return sum(len(value) if type(value) is list else 1 for _, value in self._store.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._store
+
+    def __getitem__(self, name: str) -> str:
+        value = self._store[name.lower()][1]
+        return value[0] if type(value) is list else value
+
+    def __setitem__(self, name: str, value: str):
+        self.set(name, value)
+
+    def __delitem__(self, name: str):
+        del self._store[name.lower()]
+
+    def __eq__(self, other):
+        if isinstance(other, Headers):
+            return self._store == other._store
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self)!r})'
+
+    def get(self, name: str, default: t.Optional[str] = None) -> t.Optional[str]:
+        item = self._store.get(name.lower())
+        if item is None:
+            return default
+        value = item[1]
+        return value[0] if type(value) is list else value
+
+    def get_all(self, name: str) -> t.List[str]:
+        item = self._store.get(name.lower())
+        if item is None:
+            return []
+        value = item[1]
+        return list(value) if type(value) is list else [value]
+
+    def set(self, name: str, value: str):
+        """设置响应头，替换已有的同名响应头"""
+        key = name.lower()
+        if key == MULTI_VALUE_HEADER:
+            value = [value]
+        self._store[key] = (name, value)
+
+    def add(self, name: str, value: str):
+        """添加响应头，Set-Cookie追加，其他响应头替换已有的值"""
+        key = name.lower()
+        if key == MULTI_VALUE_HEADER:
+            item = self._store.get(key)
+            if item is not None:
+                item[1].append(value)
+                return
+            value = [value]
+        self._store[key] = (name, value)
+
+    def append(self, item: t.Tuple[str, str]):
+        """兼容响应头列表的写法"""
+        self.add(*item)
+
+    def setdefault(self, name: str, value: str) -> str:
+        """不存在同名响应头时设置"""
+        key = name.lower()
+        item = self._store.get(key)
+        if item is None:
+            self._store[key] = (name, [value] if key == MULTI_VALUE_HEADER else value)
+            return value
+        value = item[1]
+        return value[0] if type(value) is list else value
+
+    def pop(self, name: str, default: t.Any = None) -> t.Any:
+        item = self._store.pop(name.lower(), None)
+        if item is None:
+            return default
+        value = item[1]
+        return value[0] if type(value) is list else value
+
+    def update(self, headers: t.Union['Headers', t.Iterable[t.Tuple[str, str]], t.Mapping[str, str]]):
+        if isinstance(headers, Headers):
+            for key, (name, value) in headers._store.items():
+                self._store[key] = (name, list(value) if type(value) is list else value)
+            return
+        if hasattr(headers, 'items'):
+            headers = headers.items()
+        store = self._store
+        for name, value in headers:
+            key = name.lower()
+            if key == MULTI_VALUE_HEADER:
+                self.add(name, value)
+            else:
+                store[key] = (name, value)
+
+    def copy(self) -> 'Headers':
+        store = {key: (name, list(value)) if type(value) is list else (name, value)
+                 for key, (name, value) in self._store.items()}
+        headers = Headers.__new__(Headers)
+        headers._store = store
+        return headers
+
+    def to_list(self) -> t.List[t.Tuple[str, str]]:
+        """WSGI start_response需要的响应头列表，每次返回新的列表"""
+        if MULTI_VALUE_HEADER not in self._store:
+            return list(self._store.values())
+        return list(self._iter_multi())
+
+
+class FrozenHeaders(Headers):
+    """不可修改的响应头，用于预先创建的共享响应"""
+
+    __slots__ = ('_list',)
+
+    def __init__(self, headers=None):
+        # 通过可修改的Headers构造，本类的修改方法都会抛出异常
+        self._store = Headers(headers)._store
+        self._list = list(self)
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('响应头不可修改,请先调用copy()')
+
+    __setitem__ = __delitem__ = set = add = append = setdefault = pop = update = _readonly
+
+    def to_list(self) -> t.List[t.Tuple[str, str]]:
+        # start_response可能会修改列表，返回副本
+        return list(self._list)
@@ -1,4 +1,6 @@
+import io
 import sys
+import typing as t
 from platform import python_implementation
 from wsgiref.handlers import SimpleHandler
 from wsgiref.simple_server import WSGIRequestHandler as _WSGIRequestHandler
@@ -9,32 +11,336 @@ server_version = "WSGIServer/" + __version__
 sys_version = python_implementation() + "/" + sys.version.split()[0]
 software_version = server_version + ' ' + sys_version
 
+# 保持连接时，请求结束后最多丢弃多少字节未读取的请求体，超过则直接关闭连接
+MAX_DRAIN_SIZE = 64 * 1024
+
+
+class LimitedStream:
+    """限制读取长度的请求体输入流
+
+    同一个连接上可能紧跟着下一个请求，读取请求体时不能越过Content-Length。
+    """
+
+    def __init__(self, stream, limit: int):
+        self._stream = stream
+        self.remaining = limit
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self._stream.read(size)
+        self.remaining -= len(data)
+        if not data:
+            self.remaining = 0
+        return data
+
+    def readinto(self, buffer) -> int:
+        if self.remaining <= 0:
+            return 0
+        view = memoryview(buffer).cast('B')[:self.remaining]
+        size = self._stream.readinto(view) or 0
+        self.remaining -= size
+        if not size:
+            self.remaining = 0
+        return size
+
+    def readline(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self._stream.readline(size)
+        self.remaining -= len(data)
+        if not data:
+            self.remaining = 0
+        return data
+
+    def readlines(self, hint: int = -1) -> list:
+        lines = []
+        total = 0
+        for line in self:
+            lines.append(line)
+            total += len(line)
+            if 0 < hint <= total:
+                break
+        return lines
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def drain(self, max_size: int) -> bool:
+        """丢弃未读取的请求体，返回是否已经全部丢弃"""
+        if self.remaining > max_size:
+            return False
+        while self.remaining > 0:
+            if not self.read(min(self.remaining, 8192)):
+                return False
+        return True
+
+
+class ChunkedStream:
+    """分块传输编码(Transfer-Encoding: chunked)的请求体输入流，读取时解码，读取到最后一个分块时结束"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._chunk_remaining = 0
+        self.finished = False
+        self.invalid = False
+
+    def _next_chunk(self):
+        line = self._stream.readline(65537)
+        try:
+            size = int(line.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            size = -1
+        if size < 0:
+            # 分块格式错误或者连接已断开，无法继续读取
+            self.finished = self.invalid = True
+            return
+        if size == 0:
+            # 忽略trailer
+            while line not in (b'\r\n', b'\n', b''):
+                line = self._stream.readline(65537)
+            self.finished = True
+        self._chunk_remaining = size
+
+    def _consume(self, data: bytes) -> bytes:
+        if not data:
+            self.finished = self.invalid = True
+            return data
+        self._chunk_remaining -= len(data)
+        if self._chunk_remaining == 0:
+            # 每个分块后的CRLF
+            self._stream.readline(3)
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return b''.join(iter(lambda: self.read(65536), b''))
+        while not self.finished and self._chunk_remaining == 0:
+            self._next_chunk()
+        if self.finished or size == 0:
+            return b''
+        return self._consume(self._stream.read(min(size, self._chunk_remaining)))
+
+    def readline(self, size: int = -1) -> bytes:
+        while not self.finished and self._chunk_remaining == 0:
+            self._next_chunk()
+        if self.finished:
+            return b''
+        if size is None or size < 0 or size > self._chunk_remaining:
+            size = self._chunk_remaining
+        return self._consume(self._stream.readline(size))
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def drain(self, max_size: int) -> bool:
+        """丢弃未读取的请求体，返回是否已经全部丢弃"""
+        drained = 0
+        while not self.finished and drained <= max_size:
+            drained += len(self.read(8192))
+        return self.finished and not self.invalid
+
 
 class ServerHandler(SimpleHandler):
     server_software = software_version
 
+    # 是否在响应结束后保持连接，由WSGIRequestHandler根据请求头以及服务配置设置
+    keep_alive = False
+
+    # 响应体是否使用分块传输编码发送
+    chunked = False
+
+    def _has_body(self) -> bool:
+        """1xx、204、304响应没有响应体"""
+        return not (self.status.startswith('1') or self.status[:3] in ('204', '304'))
+
+    def _can_chunk(self) -> bool:
+        """HTTP/1.1下有响应体的响应可以使用分块传输编码"""
+        if self.http_version != '1.1' or self.environ.get('REQUEST_METHOD') == 'HEAD':
+            return False
+        return self._has_body()
+
+    def cleanup_headers(self):
+        # 没有响应体的响应不补充Content-Length
+        if self._has_body():
+            super().cleanup_headers()
+        # 无法确定响应体长度时，HTTP/1.1使用分块传输编码，连接可以继续使用；HTTP/1.0只能通过关闭连接来表示响应结束
+        # 请求体过大被拒绝时，不再读取剩余的请求体，直接关闭连接
+        if 'Content-Length' not in self.headers and 'Transfer-Encoding' not in self.headers and self._can_chunk():
+            self.headers['Transfer-Encoding'] = 'chunked'
+            self.chunked = True
+        elif 'Content-Length' not in self.headers and self._has_body():
+            self.keep_alive = False
+        if self.status.startswith('413'):
+            self.keep_alive = False
+
+        if not self.keep_alive:
+            self.headers['Connection'] = 'close'
+        elif self.http_version == '1.0':
+            self.headers['Connection'] = 'keep-alive'
+
+    def send_headers(self):
+        # 状态行以及响应头合并为一次写入
+        buffer = []
+        self._write = buffer.append
+        try:
+            super().send_headers()
+        finally:
+            del self._write
+        self._write(b''.join(buffer))
+
+    def write(self, data: bytes):
+        # 先发送响应头，才能确定是否使用分块传输编码
+        if not self.headers_sent and self.status:
+            self.send_headers()
+        if self.chunked:
+            # 空数据会被当作最后一个分块，直接跳过
+            if not data:
+                return
+            data = b'%x\r\n' % len(data) + data + b'\r\n'
+        super().write(data)
+
+    def finish_content(self):
+        super().finish_content()
+        if self.chunked:
+            # 最后一个分块，表示响应体结束
+            self._write(b'0\r\n\r\n')
+            self._flush()
+
+    def sendfile(self):
+        """通过socket.sendfile(Linux下为os.sendfile)发送文件，避免在用户态复制数据"""
+        filelike = self.result.filelike
+        if not hasattr(filelike, 'fileno') or 'Content-Length' not in self.headers:
+            return False
+
+        # FileSlice表示文件中的一段
+        file = getattr(filelike, 'file', filelike)
+        try:
+            file.fileno()
+        except (OSError, ValueError, io.UnsupportedOperation):
+            return False
+        offset = getattr(filelike, 'offset', None)
+        if offset is None:
+            offset = file.tell()
+        count = int(self.headers['Content-Length'])
+
+        if not self.headers_sent:
+            self.bytes_sent = count
+            self.send_headers()
+        self._flush()
+        if count:
+            self.request_handler.connection.sendfile(file, offset, count)
+        return True
+
+    def handle_error(self):
+        self.keep_alive = False
+        super().handle_error()
+
     def close(self):
         SimpleHandler.close(self)
 
 
 class WSGIRequestHandler(_WSGIRequestHandler):
+    """支持HTTP/1.1长连接的请求处理
+
+    同一个连接上的多个请求(包括pipelining)按顺序依次处理，空闲超时、单连接最大请求数以及是否启用长连接
+    由服务的keep_alive、keep_alive_timeout、max_keep_alive_requests属性控制。
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    # 长连接上的小响应不需要等待Nagle算法合并
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # 在读取请求行之前设置超时，StreamRequestHandler.setup会将timeout设置到连接上
+        self.timeout = getattr(self.server, 'request_timeout', None)
+        super().setup()
 
     def handle(self):
-        """Handle a single HTTP request"""
+        """Handle HTTP requests on a persistent connection"""
+        keep_alive = getattr(self.server, 'keep_alive', False)
+        max_requests = getattr(self.server, 'max_keep_alive_requests', 100)
+        idle_timeout = getattr(self.server, 'keep_alive_timeout', None)
+
+        # 第一个请求同样使用空闲超时等待，超时后关闭连接；未配置空闲超时时使用读取请求的超时
+        if idle_timeout is not None:
+            self.connection.settimeout(idle_timeout)
+        handled = 0
+        while True:
+            if not self.handle_one_request(keep_alive and handled + 1 < max_requests, idle_timeout):
+                return
+            handled += 1
+            if self.close_connection:
+                return
+
+    def handle_one_request(self, keep_alive: bool = False, idle_timeout: t.Optional[float] = None) -> bool:
+        """处理一个请求，返回是否成功处理，连接是否可以继续使用记录在close_connection中"""
+        self.close_connection = True
+        try:
+            self.raw_requestline = self.rfile.readline(65537)  # noqa
+        except (TimeoutError, ConnectionError):
+            return False
+        if not self.raw_requestline:
+            return False
+        self.connection.settimeout(self.timeout)
 
-        self.raw_requestline = self.rfile.readline(65537)  # noqa
         if len(self.raw_requestline) > 65536:
             self.requestline = ''  # noqa
             self.request_version = ''
             self.command = ''
             self.send_error(414)
-            return
+            return False
 
         if not self.parse_request():
-            return
+            return False
+
+        environ = self.get_environ()
+        transfer_encoding = self.headers.get('Transfer-Encoding')
+        if transfer_encoding:
+            if transfer_encoding.strip().lower() != 'chunked':
+                self.send_error(501, 'Unsupported Transfer-Encoding')
+                return False
+            # 分块传输时忽略Content-Length，请求体读取到最后一个分块为止
+            environ.pop('CONTENT_LENGTH', None)
+            environ['wsgi.input_terminated'] = True
+            stdin = ChunkedStream(self.rfile)
+        else:
+            try:
+                content_length = int(environ.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                self.send_error(400, 'Invalid Content-Length')
+                return False
+            stdin = LimitedStream(self.rfile, content_length)
 
-        handler = ServerHandler(
-            self.rfile, self.wfile, self.get_stderr(), self.get_environ()
-        )
+        handler = ServerHandler(stdin, self.wfile, self.get_stderr(), environ)
         handler.request_handler = self
+        handler.http_version = '1.1' if self.request_version == 'HTTP/1.1' else '1.0'
+        handler.keep_alive = keep_alive and not self.close_connection
         handler.run(self.server.get_app())  # noqa
+
+        self.close_connection = not (handler.keep_alive and self._drain(stdin, idle_timeout))
+        if not self.close_connection:
+            # 等待下一个请求时使用空闲超时
+            self.connection.settimeout(idle_timeout)
+        return True
+
+    def _drain(self, stdin, timeout: t.Optional[float]) -> bool:
+        """丢弃接口未读取的请求体，使连接可以继续处理下一个请求"""
+        self.connection.settimeout(timeout)
+        try:
+            return stdin.drain(MAX_DRAIN_SIZE)
+        except OSError:
+            return False
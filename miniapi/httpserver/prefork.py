@@ -0,0 +1,192 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import typing as t
+
+from miniapi.httpserver.server import PooledWSGIServer
+
+
+class PreforkServer:
+    """预派生多进程服务
+
+    主进程绑定监听socket后fork出多个工作进程共享该socket(或者每个工作进程使用SO_REUSEPORT各自绑定)，
+    主进程只负责监控：工作进程异常退出时自动重启，收到SIGTERM/SIGINT时通知所有工作进程处理完当前请求后退出，
+    收到SIGHUP时逐个滚动重启工作进程。
+
+    app需要在fork之前创建好，工作进程通过写时复制共享已经加载的路由、中间件等内存。
+    """
+
+    # 工作进程启动后在该时间(秒)内退出视为启动失败，重启前等待，避免频繁fork
+    MIN_WORKER_LIFETIME = 1
+    # 优雅退出时等待工作进程的最长时间(秒)，超时后强制结束
+    GRACEFUL_TIMEOUT = 30
+
+    def __init__(
+            self,
+            app,
+            server_address: t.Tuple[str, int],
+            handler_class,
+            workers: t.Optional[int] = None,
+            reuse_port: bool = False,
+            server_options: t.Optional[dict] = None):
+        if not hasattr(os, 'fork'):
+            raise RuntimeError('当前平台不支持fork,无法使用多进程模式')
+        if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError('当前平台不支持SO_REUSEPORT')
+
+        self.app = app
+        self.server_address = server_address
+        self.handler_class = handler_class
+        self.workers = workers or os.cpu_count() or 1
+        self.reuse_port = reuse_port
+        self.server_options = server_options or {}
+
+        self.socket: t.Optional[socket.socket] = None
+        # 工作进程 {进程号: 启动时间}
+        self._children: t.Dict[int, float] = {}
+        self._stopping = False
+        self._reloading = False
+
+    def serve_forever(self):
+        if not self.reuse_port:
+            self.socket = self._make_socket()
+            self.server_address = self.socket.getsockname()[:2]
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        # 把fork之前创建的对象移出垃圾回收的扫描范围，工作进程不会因为垃圾回收修改这些对象而触发写时复制
+        gc.collect()
+        gc.freeze()
+        try:
+            for _ in range(self.workers):
+                self._spawn_worker()
+            while not self._stopping:
+                self._reap_workers()
+                if self._reloading:
+                    self._reloading = False
+                    self._reload_workers()
+                time.sleep(0.2)
+        finally:
+            self._stop_workers()
+            if self.socket is not None:
+                self.socket.close()
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reloading = True
+
+    def _make_socket(self) -> socket.socket:
+        sock = socket.socket(PooledWSGIServer.address_family, PooledWSGIServer.socket_type)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(self.server_address)
+        sock.listen(self.server_options.get('backlog', PooledWSGIServer.DEFAULT_BACKLOG))
+        return sock
+
+    def _spawn_worker(self) -> int:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = time.monotonic()
+            return pid
+
+        # 工作进程
+        exit_code = 0
+        try:
+            self._run_worker()
+        except BaseException:  # noqa
+            import traceback
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def _run_worker(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+
+        server = PooledWSGIServer(self.server_address, self.handler_class, bind_and_activate=False,
+                                  **self.server_options)
+        server.socket.close()
+        server.socket = self._make_socket() if self.reuse_port else self.socket
+        server.server_address = server.socket.getsockname()[:2]
+        host, port = server.server_address
+        server.server_name = socket.getfqdn(host)
+        server.server_port = port
+        server.setup_environ()
+        server.set_app(self.app)
+        self.app.server = server
+
+        # serve_forever所在的线程中不能调用shutdown，需要在新线程中通知退出
+        def stop(signum, frame):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        server.serve_forever()
+
+    def _reap_workers(self):
+        """回收已退出的工作进程，非主动停止的进程自动重启"""
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self._children.pop(pid, None)
+            if started is None or self._stopping:
+                continue
+            print(f'工作进程{pid}异常退出,退出码{os.waitstatus_to_exitcode(status)},正在重启')  # noqa
+            if time.monotonic() - started < self.MIN_WORKER_LIFETIME:
+                time.sleep(self.MIN_WORKER_LIFETIME)
+            self._spawn_worker()
+
+    def _reload_workers(self):
+        """滚动重启：先启动新的工作进程，再停止一个旧的工作进程，依次进行"""
+        for pid in list(self._children):
+            if self._stopping:
+                return
+            self._spawn_worker()
+            self._terminate([pid])
+
+    def _stop_workers(self):
+        self._terminate(list(self._children))
+
+    def _terminate(self, pids: t.List[int]):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.GRACEFUL_TIMEOUT
+        pending = set(pids)
+        while pending:
+            for pid in list(pending):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    pending.discard(pid)
+                    self._children.pop(pid, None)
+            if not pending:
+                return
+            if time.monotonic() > deadline:
+                for pid in pending:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = float('inf')
+            time.sleep(0.05)
@@ -1,6 +1,155 @@
+import queue
+import threading
 from socketserver import ThreadingMixIn
 from wsgiref.simple_server import WSGIServer
 
+# 等待队列已满时直接写回的响应，不经过WSGI应用
+SERVICE_UNAVAILABLE_RESPONSE = (
+    b'HTTP/1.1 503 Service Unavailable\r\n'
+    b'Content-Type: text/plain\r\n'
+    b'Content-Length: 19\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n'
+    b'\r\n'
+    b'Service Unavailable'
+)
+
 
 class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
     pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """固定大小线程池的WSGI服务
+
+    主线程只负责accept，连接放入有界的等待队列后由固定数量的工作线程处理；
+    等待队列已满时直接返回503，避免突发流量下无限制地创建线程。
+    """
+
+    DEFAULT_WORKERS = 16
+    DEFAULT_BACKLOG = 128
+    DEFAULT_QUEUE_SIZE = 256
+    DEFAULT_REQUEST_TIMEOUT = 10
+    DEFAULT_KEEP_ALIVE_TIMEOUT = 5
+    DEFAULT_MAX_KEEP_ALIVE_REQUESTS = 100
+
+    def __init__(
+            self,
+            server_address,
+            handler_class,
+            workers: int = DEFAULT_WORKERS,
+            backlog: int = DEFAULT_BACKLOG,
+            queue_size: int = DEFAULT_QUEUE_SIZE,
+            request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+            keep_alive: bool = True,
+            keep_alive_timeout: float = DEFAULT_KEEP_ALIVE_TIMEOUT,
+            max_keep_alive_requests: int = DEFAULT_MAX_KEEP_ALIVE_REQUESTS,
+            bind_and_activate: bool = True):
+        if workers <= 0:
+            raise ValueError(f'工作线程数必须大于0,当前值为{workers}')
+        if queue_size <= 0:
+            raise ValueError(f'等待队列大小必须大于0,当前值为{queue_size}')
+        if request_timeout <= 0:
+            raise ValueError(f'读取请求的超时时间必须大于0,当前值为{request_timeout}')
+
+        # workers: 工作线程数
+        # request_queue_size: 监听socket的backlog，socketserver在listen时使用
+        # queue_size: 已accept但还未被工作线程处理的连接的最大数量
+        self.workers = workers
+        self.request_queue_size = backlog
+        self.queue_size = queue_size
+        # request_timeout: 读取请求时每次读取socket的超时时间(秒)，从连接建立后的第一次读取开始生效，
+        # 连接上迟迟不发送数据时超时关闭，避免空闲或者慢速发送的连接一直占用工作线程
+        self.request_timeout = request_timeout
+
+        # keep_alive: 是否启用HTTP/1.1长连接
+        # keep_alive_timeout: 长连接等待下一个请求的空闲超时时间(秒)
+        # max_keep_alive_requests: 单个连接最多处理的请求数
+        # 空闲的长连接同样会占用工作线程，空闲超时不宜设置过长
+        self.keep_alive = keep_alive
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_keep_alive_requests = max_keep_alive_requests
+
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._threads: list = []
+        self._busy_workers = 0
+        self._busy_lock = threading.Lock()
+        self._rejected_requests = 0
+        super().__init__(server_address, handler_class, bind_and_activate)
+
+    @property
+    def queue_depth(self) -> int:
+        """等待处理的连接数"""
+        return self._queue.qsize()
+
+    @property
+    def busy_workers(self) -> int:
+        """正在处理请求的工作线程数"""
+        return self._busy_workers
+
+    @property
+    def rejected_requests(self) -> int:
+        """因等待队列已满被拒绝的连接数"""
+        return self._rejected_requests
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'busy_workers': self.busy_workers,
+            'queue_size': self.queue_size,
+            'queue_depth': self.queue_depth,
+            'rejected_requests': self.rejected_requests,
+        }
+
+    def serve_forever(self, poll_interval=0.5):
+        self._start_workers()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self._stop_workers()
+
+    def _start_workers(self):
+        for i in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._process_queue, name=f'miniapi-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _stop_workers(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def process_request(self, request, client_address):
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            self._rejected_requests += 1
+            self._reject_request(request)
+
+    def _reject_request(self, request):
+        try:
+            request.settimeout(1)
+            request.sendall(SERVICE_UNAVAILABLE_RESPONSE)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    def _process_queue(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            request, client_address = item
+            with self._busy_lock:
+                self._busy_workers += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:  # noqa
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._busy_lock:
+                    self._busy_workers -= 1
@@ -0,0 +1,154 @@
+"""请求指标
+
+按路由规则(而不是原始请求路径)统计请求数、各状态码类别的响应数、请求耗时直方图以及正在处理的请求数，
+并以Prometheus文本格式输出，包括内置服务的线程池以及等待队列状态。
+
+记录指标时不加锁：每个线程写入自己的分片，输出时再把所有分片相加。
+多进程模式下每个工作进程单独统计。
+"""
+import bisect
+import threading
+import time
+import typing as t
+
+# Prometheus默认的耗时分桶(秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 分片中各项统计的位置
+_STARTED = 0
+_COUNT = 1
+_DURATION_SUM = 2
+# 1xx - 5xx 响应数，其他状态码计入other
+_STATUS = 3
+_STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx', 'other')
+_BUCKETS = _STATUS + len(_STATUS_CLASSES)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class RouteMetrics:
+    """单个路由(路由规则+请求方式)的指标"""
+
+    __slots__ = ('method', 'rule', 'buckets', '_shards', '_lock', '_size')
+
+    def __init__(self, method: str, rule: str, buckets: t.Sequence[float]):
+        self.method = method
+        self.rule = rule
+        self.buckets = tuple(buckets)
+        # 线程分片 {线程标识: 统计数据}，分片只会被所属的线程修改
+        self._shards: t.Dict[int, list] = {}
+        self._lock = threading.Lock()
+        self._size = _BUCKETS + len(self.buckets) + 1
+
+    def shard(self) -> list:
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            with self._lock:
+                shard = self._shards[threading.get_ident()] = [0] * self._size
+                shard[_DURATION_SUM] = 0.0
+        return shard
+
+    def snapshot(self) -> list:
+        """所有分片相加后的统计数据"""
+        total = [0] * self._size
+        total[_DURATION_SUM] = 0.0
+        with self._lock:
+            shards = list(self._shards.values())
+        for shard in shards:
+            for i, value in enumerate(shard):
+                total[i] += value
+        return total
+
+
+class Metrics:
+    """应用的指标"""
+
+    def __init__(self, buckets: t.Optional[t.Sequence[float]] = None, prefix: str = 'miniapi'):
+        buckets = tuple(sorted(buckets)) if buckets else DEFAULT_BUCKETS
+        if any(b <= 0 for b in buckets):
+            raise ValueError(f'耗时分桶必须大于0,当前值为{buckets}')
+        self.buckets = buckets
+        self.prefix = prefix
+        self.routes: t.List[RouteMetrics] = []
+        self._lock = threading.Lock()
+
+    def route(self, endpoint) -> RouteMetrics:
+        """获取路由的指标，不存在时创建"""
+        with self._lock:
+            if endpoint.metrics is None:
+                route = RouteMetrics(endpoint.method or '', endpoint.rule or '', self.buckets)
+                self.routes.append(route)
+                endpoint.metrics = route
+        return endpoint.metrics
+
+    def start(self, endpoint) -> t.Tuple[list, float]:
+        """请求开始，返回传给finish的标记"""
+        route = endpoint.metrics
+        if route is None:
+            route = self.route(endpoint)
+        shard = route.shard()
+        shard[_STARTED] += 1
+        return shard, time.perf_counter()
+
+    def finish(self, token: t.Tuple[list, float], status: str):
+        """请求结束，记录响应状态以及耗时"""
+        shard, start = token
+        duration = time.perf_counter() - start
+        shard[_COUNT] += 1
+        shard[_DURATION_SUM] += duration
+        status_class = ord(status[0]) - 49
+        shard[_STATUS + (status_class if 0 <= status_class < 5 else 5)] += 1
+        shard[_BUCKETS + bisect.bisect_left(self.buckets, duration)] += 1
+
+    def render(self, server=None) -> str:
+        """Prometheus文本格式的指标，server为内置服务时一并输出线程池以及等待队列状态"""
+        prefix = self.prefix
+        with self._lock:
+            routes = list(self.routes)
+        snapshots = [(f'method="{_escape(r.method)}",route="{_escape(r.rule)}"', r.snapshot()) for r in routes]
+
+        lines = [f'# HELP {prefix}_requests_total Total number of handled requests.',
+                 f'# TYPE {prefix}_requests_total counter']
+        lines.extend(f'{prefix}_requests_total{{{labels}}} {data[_COUNT]}' for labels, data in snapshots)
+
+        lines.append(f'# HELP {prefix}_responses_total Total number of responses by status class.')
+        lines.append(f'# TYPE {prefix}_responses_total counter')
+        for labels, data in snapshots:
+            for i, status_class in enumerate(_STATUS_CLASSES):
+                if data[_STATUS + i]:
+                    lines.append(f'{prefix}_responses_total{{{labels},status="{status_class}"}} {data[_STATUS + i]}')
+
+        lines.append(f'# HELP {prefix}_request_duration_seconds Request handling latency.')
+        lines.append(f'# TYPE {prefix}_request_duration_seconds histogram')
+        for labels, data in snapshots:
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += data[_BUCKETS + i]
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {data[_COUNT]}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{{labels}}} {_format_value(data[_DURATION_SUM])}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{{labels}}} {data[_COUNT]}')
+
+        lines.append(f'# HELP {prefix}_requests_in_flight Requests currently being handled.')
+        lines.append(f'# TYPE {prefix}_requests_in_flight gauge')
+        lines.extend(f'{prefix}_requests_in_flight{{{labels}}} {max(data[_STARTED] - data[_COUNT], 0)}'
+                     for labels, data in snapshots)
+
+        stats = server.stats() if server is not None and hasattr(server, 'stats') else None
+        if stats:
+            for key, value in stats.items():
+                kind = 'counter' if key.endswith('_requests') else 'gauge'
+                name = f'{prefix}_server_{key}' + ('_total' if kind == 'counter' else '')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
@@ -1,13 +1,32 @@
+import inspect
+
+
 class MiddlewareBase:
+    """中间件基类，before_request/after_request可以是普通函数，也可以是async函数"""
 
     def before_request(self, request):
-        """请求前处理"""
-        pass
+        """请求前处理，返回请求对象；返回Response时不再执行接口函数以及后续中间件，直接返回该响应"""
+        return request
 
     def after_request(self, request, response):
-        """请求后处理"""
+        """请求后处理，返回响应对象"""
+        return response
+
+    def teardown_request(self, request):
+        """请求结束处理，不论后续中间件以及接口函数是否抛出异常都会执行，用于释放before_request中获取的资源
+
+        只能是普通函数，异常会被打印后忽略；没有重写时不会被调用
+        """
         pass
 
+    def has_teardown(self) -> bool:
+        """是否重写了teardown_request"""
+        return type(self).teardown_request is not MiddlewareBase.teardown_request
+
+    def is_async(self) -> bool:
+        """是否包含异步的请求前/请求后处理，异步中间件只能在ASGI模式下高效运行"""
+        return inspect.iscoroutinefunction(self.before_request) or inspect.iscoroutinefunction(self.after_request)
+
     def uni_name(self):
         """获取中间件名称"""
         return self.__class__.__name__
@@ -0,0 +1,281 @@
+import hashlib
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+from miniapi.middleware.base import MiddlewareBase
+from miniapi.response import Response
+from miniapi.status import HTTPStatus
+
+# 不缓存的响应头，命中缓存时由Response重新生成
+_SKIP_HEADERS = frozenset(('content-type', 'content-length', 'connection', 'set-cookie'))
+# 304响应保留的响应头
+_NOT_MODIFIED_HEADERS = frozenset(('etag', 'cache-control', 'vary', 'expires', 'last-modified'))
+
+
+class CacheEntry:
+    """缓存的响应"""
+
+    __slots__ = ('status', 'headers', 'content_type', 'body', 'etag', 'expires')
+
+    def __init__(self, status: str, headers: list, content_type: str, body: bytes, etag: str, expires: float):
+        self.status = status
+        self.headers = headers
+        self.content_type = content_type
+        self.body = body
+        self.etag = etag
+        # expires: 过期时间，time.monotonic()
+        self.expires = expires
+
+    @property
+    def size(self) -> int:
+        """估算的内存占用字节数"""
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers) + 128
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires
+
+
+class CacheBackend:
+    """缓存存储后端接口，实现需要保证线程安全"""
+
+    def get(self, key: str) -> t.Optional[CacheEntry]:
+        """获取缓存，不存在时返回None；过期的缓存也可以返回，由中间件决定如何处理"""
+        raise NotImplementedError
+
+    def set(self, key: str, entry: CacheEntry):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """进程内LRU缓存，条目数或者总字节数超过限制时淘汰最久未使用的缓存"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        if max_entries <= 0 or max_bytes <= 0:
+            raise ValueError('max_entries和max_bytes必须大于0')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        size = entry.size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.size
+            self._entries[key] = entry
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.size
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+class _Flight:
+    """正在重新执行接口函数生成缓存的请求"""
+
+    __slots__ = ('event', 'started')
+
+    def __init__(self, started: float):
+        self.event = threading.Event()
+        self.started = started
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: t.Optional[str], etag: str) -> bool:
+    """If-None-Match是否匹配ETag(弱比较)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class CacheMiddleware(MiddlewareBase):
+    """响应缓存中间件
+
+    缓存GET请求的200响应，缓存key由请求方式、路径、query_params中列出的查询参数(None表示全部查询参数)
+    以及vary_headers中列出的请求头组成。响应自动带上ETag，请求的If-None-Match匹配时直接返回304。
+    缓存过期后只有一个线程重新执行接口函数，其他线程在有旧缓存时直接返回旧缓存，没有时等待最多lock_timeout秒；
+    重新执行的请求因为后续中间件抛出异常没有执行after_request时，在teardown_request中释放，等待的请求立即接替；
+    重新执行超过lock_timeout秒仍未完成时，由下一个请求接替。
+
+    不同的缓存时间可以通过路由的middlewares参数注册不同的实例:
+        @app.get('/items', middlewares=[CacheMiddleware(ttl=300, query_params=['page'])])
+    多个实例可以通过backend参数共享同一个存储后端。
+    """
+
+    def __init__(
+            self,
+            ttl: float = 60,
+            query_params: t.Optional[t.Iterable[str]] = None,
+            vary_headers: t.Iterable[str] = (),
+            methods: t.Iterable[str] = ('GET',),
+            backend: t.Optional[CacheBackend] = None,
+            max_entries: int = 1024,
+            max_bytes: int = 64 * 1024 * 1024,
+            lock_timeout: float = 10):
+        if ttl <= 0:
+            raise ValueError(f'缓存时间必须大于0,当前值为{ttl}')
+        self.ttl = ttl
+        self.query_params = None if query_params is None else tuple(sorted(query_params))
+        self.vary_headers = tuple(h.title() for h in vary_headers)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.backend = backend if backend is not None else MemoryCacheBackend(max_entries, max_bytes)
+        self.lock_timeout = lock_timeout
+        # 正在重新生成的缓存 {缓存key: _Flight}
+        self._flights: t.Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+
+    def make_key(self, request) -> str:
+        parts = [request.method, request.path]
+        if self.query_params is None:
+            if request.query_string:
+                parts.append('&'.join(sorted(request.query_string.split('&'))))
+        else:
+            params = request.query_params
+            for name in self.query_params:
+                parts.append(f'{name}={",".join(params.get(name, ()))}')
+        for name in self.vary_headers:
+            parts.append(f'{name}:{request.get_header(name) or ""}')
+        return '\n'.join(parts)
+
+    def before_request(self, request):
+        if request.method not in self.methods:
+            return request
+
+        key = self.make_key(request)
+        entry = self.backend.get(key)
+        if entry is not None and entry.is_fresh(time.monotonic()):
+            return self._cached_response(request, entry)
+
+        # 缓存不存在或者已过期，只允许一个线程重新执行接口函数
+        now = time.monotonic()
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            owner = flight is None or now - flight.started > self.lock_timeout
+            if owner:
+                flight = self._flights[key] = _Flight(now)
+        if owner:
+            request.state['cache'] = (key, flight)
+            return request
+
+        if entry is not None:
+            return self._cached_response(request, entry)
+        flight.event.wait(self.lock_timeout)
+        entry = self.backend.get(key)
+        if entry is not None and entry.is_fresh(time.monotonic()):
+            return self._cached_response(request, entry)
+        request.state['cache'] = (key, None)
+        return request
+
+    def after_request(self, request, response):
+        state = request.state.pop('cache', None)
+        if state is None:
+            return response
+        key, flight = state
+        try:
+            entry = self._store(key, response)
+        finally:
+            self._release(key, flight)
+        if entry is None:
+            return response
+        response.set_default_header('ETag', entry.etag)
+        if etag_matches(request.get_header('If-None-Match'), entry.etag):
+            return self._not_modified(entry)
+        return response
+
+    def teardown_request(self, request):
+        # 后续中间件抛出异常时after_request不会执行，在这里释放重新生成缓存的锁
+        state = request.state.pop('cache', None)
+        if state is not None:
+            self._release(*state)
+
+    def _release(self, key: str, flight: t.Optional[_Flight]):
+        if flight is None:
+            return
+        with self._flights_lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.event.set()
+
+    def _store(self, key: str, response) -> t.Optional[CacheEntry]:
+        if not response.status.startswith('200'):
+            return None
+        body = response.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elif body is None:
+            body = b''
+        elif isinstance(body, (bytearray, memoryview)):
+            body = bytes(body)
+        elif not isinstance(body, bytes):
+            # 流式响应不缓存
+            return None
+
+        cache_control = (response.get_header('Cache-Control') or '').lower()
+        if 'no-store' in cache_control or 'private' in cache_control:
+            return None
+        if response.get_header('Set-Cookie') is not None:
+            return None
+
+        etag = response.get_header('ETag') or make_etag(body)
+        headers = [(k, v) for k, v in response.headers if k.lower() not in _SKIP_HEADERS]
+        if response.get_header('ETag') is None:
+            headers.append(('ETag', etag))
+        entry = CacheEntry(response.status, headers, response.content_type, body, etag,
+                           time.monotonic() + self.ttl)
+        self.backend.set(key, entry)
+        return entry
+
+    def _cached_response(self, request, entry: CacheEntry) -> Response:
+        if etag_matches(request.get_header('If-None-Match'), entry.etag):
+            return self._not_modified(entry)
+        return Response(entry.body, entry.status, list(entry.headers), entry.content_type)
+
+    @staticmethod
+    def _not_modified(entry: CacheEntry) -> Response:
+        # 304只包含验证以及缓存相关的响应头，不包含Content-Type等实体头
+        headers = [(k, v) for k, v in entry.headers if k.lower() in _NOT_MODIFIED_HEADERS]
+        return Response(None, HTTPStatus.NOT_MODIFIED, headers, None)
@@ -0,0 +1,324 @@
+import hashlib
+import os
+import threading
+import typing as t
+import zlib
+from collections import OrderedDict
+
+from miniapi.middleware.base import MiddlewareBase
+from miniapi.response import _file_size, _iter_chunks, _iter_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 默认压缩的响应类型
+DEFAULT_CONTENT_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/x-ndjson',
+    'image/svg+xml',
+)
+
+# 默认压缩级别 {编码: 级别}
+DEFAULT_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, level: int):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+# 支持的编码 {编码: (压缩器, 依赖的库)}，按默认的优先级排列
+COMPRESSORS = {
+    'br': (_BrotliCompressor, brotli),
+    'zstd': (_ZstdCompressor, zstandard),
+    'gzip': (_GzipCompressor, zlib),
+}
+
+
+def parse_accept_encoding(header: str) -> t.Dict[str, float]:
+    """解析Accept-Encoding请求头 {编码: q值}"""
+    result = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[coding] = q
+    return result
+
+
+class CompressionMiddleware(MiddlewareBase):
+    """响应压缩中间件
+
+    根据Accept-Encoding在encodings中选择编码(br、zstd需要安装brotli、zstandard)，只压缩content_types中的响应类型
+    以及不小于min_size字节的响应体。文件、迭代器以及异步迭代器响应体会边读取边压缩，迭代器的每个分块压缩后立即发送。
+    cache_size大于0时缓存bytes响应体以及文件路径响应体压缩后的结果，适合内容不变的静态响应。
+
+    在application.yaml中配置:
+        middlewares:
+          - name: miniapi.middleware.compress:CompressionMiddleware
+            options:
+              min_size: 1024
+              levels:
+                gzip: 6
+                br: 4
+    """
+
+    def __init__(
+            self,
+            min_size: int = 1024,
+            content_types: t.Iterable[str] = DEFAULT_CONTENT_TYPES,
+            encodings: t.Optional[t.Iterable[str]] = None,
+            levels: t.Optional[t.Dict[str, int]] = None,
+            cache_size: int = 0,
+            cache_max_bytes: int = 32 * 1024 * 1024):
+        if encodings is None:
+            encodings = [name for name, (_, module) in COMPRESSORS.items() if module is not None]
+        else:
+            encodings = [e.lower() for e in encodings]
+            for name in encodings:
+                if name not in COMPRESSORS:
+                    raise ValueError(f'不支持的压缩编码:{name},请在{list(COMPRESSORS)}中选择.')
+                if COMPRESSORS[name][1] is None:
+                    raise ImportError(f'{name}压缩需要安装{"brotli" if name == "br" else "zstandard"}.')
+        self.encodings = tuple(encodings)
+        self.min_size = min_size
+        self.content_types = tuple(c.lower() for c in content_types)
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+
+        # Accept-Encoding请求头的取值有限，缓存协商结果 {请求头: 编码}
+        self._negotiated: t.Dict[str, t.Optional[str]] = {}
+
+        # 压缩结果缓存 {(编码, 响应体标识): 压缩后的bytes}
+        self.cache_size = cache_size
+        self.cache_max_bytes = cache_max_bytes
+        self._cache: 'OrderedDict[tuple, bytes]' = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_lock = threading.Lock()
+
+    def negotiate(self, accept_encoding: t.Optional[str]) -> t.Optional[str]:
+        """选择响应使用的编码，客户端不接受任何可用的编码时返回None"""
+        if not accept_encoding:
+            return None
+        encoding = self._negotiated.get(accept_encoding, False)
+        if encoding is not False:
+            return encoding
+
+        preferences = parse_accept_encoding(accept_encoding)
+        default = preferences.get('*', 0.0)
+        encoding, best = None, 0.0
+        for name in self.encodings:
+            q = preferences.get(name, default)
+            if q > best:
+                encoding, best = name, q
+
+        if len(self._negotiated) >= 256:
+            self._negotiated.clear()
+        self._negotiated[accept_encoding] = encoding
+        return encoding
+
+    def make_compressor(self, encoding: str):
+        return COMPRESSORS[encoding][0](self.levels[encoding])
+
+    def compress(self, encoding: str, data: bytes) -> bytes:
+        """一次性压缩"""
+        compressor = self.make_compressor(encoding)
+        return compressor.compress(data) + compressor.finish()
+
+    def after_request(self, request, response):
+        if not self._should_compress(request, response):
+            return response
+
+        headers = response.headers
+        headers.set('Vary', self._vary(headers.pop('Vary')))
+        encoding = self.negotiate(request.get_header('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        body = response.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            if len(body) < self.min_size:
+                return response
+            body = self._compress_bytes(encoding, bytes(body), response.get_header('ETag'), request)
+        elif isinstance(body, os.PathLike):
+            size = os.stat(body).st_size
+            if size < self.min_size:
+                return response
+            if self.cache_size > 0:
+                body = self._compress_path(encoding, body)
+            else:
+                body = self._compress_iter(encoding, _iter_file(open(body, 'rb'), response.chunk_size), False)
+        elif hasattr(body, 'read'):
+            size = _file_size(body)
+            if size is not None and size < self.min_size:
+                return response
+            body = self._compress_iter(encoding, _iter_file(body, response.chunk_size), False)
+        elif hasattr(body, '__aiter__'):
+            body = self._compress_aiter(encoding, body)
+        else:
+            body = self._compress_iter(encoding, _iter_chunks(body), True)
+
+        response.body = body
+        headers.pop('Content-Length')
+        headers.pop('Accept-Ranges')
+        headers.set('Content-Encoding', encoding)
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # 压缩后的内容与原始内容不再逐字节相同，只能作为弱ETag
+            headers.set('ETag', 'W/' + etag)
+        return response
+
+    def _should_compress(self, request, response) -> bool:
+        status = response.status
+        if not status.startswith('2') or status.startswith(('204', '206')):
+            return False
+        if response.get_header('Content-Encoding') is not None:
+            return False
+        # 断点续传的文件不压缩
+        if response.get_header('Accept-Ranges') is not None and request.environ.get('HTTP_RANGE'):
+            return False
+        content_type = (response.content_type or '').lower()
+        # 事件流是长连接，每个连接保留一个压缩器的内存开销较大，并且每个事件都需要立即发送
+        if content_type.startswith('text/event-stream'):
+            return False
+        return content_type.startswith(self.content_types)
+
+    @staticmethod
+    def _vary(vary: t.Optional[str]) -> str:
+        if not vary:
+            return 'Accept-Encoding'
+        if 'accept-encoding' in vary.lower():
+            return vary
+        return vary + ', Accept-Encoding'
+
+    def _compress_bytes(self, encoding: str, body: bytes, etag: t.Optional[str] = None, request=None) -> bytes:
+        if self.cache_size <= 0:
+            return self.compress(encoding, body)
+        # 有强ETag时用请求地址以及ETag作为缓存标识，省去计算响应体摘要的开销；
+        # ETag只在同一个资源内唯一，不同地址的响应可能使用相同的ETag，因此必须包含请求地址
+        if etag and not etag.startswith('W/') and request is not None:
+            key = (encoding, request.path, request.query_string, etag, len(body))
+        else:
+            key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = self._cache_get(key)
+        if compressed is None:
+            compressed = self.compress(encoding, body)
+            self._cache_set(key, compressed)
+        return compressed
+
+    def _compress_path(self, encoding: str, path: os.PathLike) -> bytes:
+        stat = os.stat(path)
+        key = (encoding, os.fspath(path), stat.st_mtime_ns, stat.st_size)
+        compressed = self._cache_get(key)
+        if compressed is None:
+            with open(path, 'rb') as file:
+                compressed = b''.join(self._compress_iter(encoding, _iter_file(file, 64 * 1024), False))
+            self._cache_set(key, compressed)
+        return compressed
+
+    def _compress_iter(self, encoding: str, chunks: t.Iterator[bytes], flush: bool) -> t.Iterator[bytes]:
+        """边读取边压缩，flush为True时每个分块压缩后立即输出，不等待压缩器的缓冲区填满"""
+        compressor = self.make_compressor(encoding)
+        try:
+            for chunk in chunks:
+                data = compressor.compress(chunk)
+                if flush:
+                    data += compressor.flush()
+                if data:
+                    yield data
+            data = compressor.finish()
+            if data:
+                yield data
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    async def _compress_aiter(self, encoding: str, chunks: t.AsyncIterable) -> t.AsyncIterator[bytes]:
+        compressor = self.make_compressor(encoding)
+        async for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        data = compressor.finish()
+        if data:
+            yield data
+
+    def _cache_get(self, key: tuple) -> t.Optional[bytes]:
+        with self._cache_lock:
+            compressed = self._cache.get(key)
+            if compressed is not None:
+                self._cache.move_to_end(key)
+            return compressed
+
+    def _cache_set(self, key: tuple, compressed: bytes):
+        if len(compressed) > self.cache_max_bytes:
+            return
+        with self._cache_lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._cache_bytes -= len(old)
+            self._cache[key] = compressed
+            self._cache_bytes += len(compressed)
+            while len(self._cache) > self.cache_size or self._cache_bytes > self.cache_max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted)
@@ -1,57 +1,311 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import random
+import sys
+import threading
 import time
+import typing as t
 from datetime import datetime
+from logging.handlers import QueueHandler
 
 from miniapi.middleware.base import MiddlewareBase
 
-log = logging.getLogger('miniapi')
-log.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG)
-log.addHandler(ch)
+# 访问日志的输出格式
+COLOR_FORMAT = 'color'
+JSON_FORMAT = 'json'
+LOGFMT_FORMAT = 'logfmt'
+
+
+def _format_time(created: float) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(created)) + f'.{int(created % 1 * 1000):03d}'
+
+
+class JsonFormatter(logging.Formatter):
+    """访问日志格式化为一行JSON"""
+
+    def format(self, record):
+        data = {'time': _format_time(record.created), 'level': record.levelname}
+        data.update(getattr(record, 'access', None) or {'message': record.getMessage()})
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class LogfmtFormatter(logging.Formatter):
+    """访问日志格式化为logfmt(key=value)"""
+
+    @staticmethod
+    def _quote(value) -> str:
+        value = str(value)
+        if not value or any(c in value for c in ' ="\\'):
+            return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        return value
+
+    def format(self, record):
+        data = {'time': _format_time(record.created), 'level': record.levelname}
+        data.update(getattr(record, 'access', None) or {'message': record.getMessage()})
+        return ' '.join(f'{key}={self._quote(value)}' for key, value in data.items())
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列已满时丢弃日志并计数，不阻塞请求线程
+
+    日志记录原样放入队列，由后台线程格式化，请求线程只负责创建日志记录。
+    """
+
+    def __init__(self, log_queue: queue.Queue, writer: t.Optional['BackgroundLogWriter'] = None):
+        super().__init__(log_queue)
+        self.dropped = 0
+        # 从队列中取出日志的后台线程，第一次写入日志时启动
+        self.writer = writer
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if self.writer is not None:
+            self.writer.ensure_started()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BackgroundLogWriter:
+    """后台线程从队列中批量取出日志记录，交给handlers输出，作用与logging.handlers.QueueListener相同
+
+    queue_handler添加到logger上，日志经过logger的级别、过滤器后放入队列；handlers为实际输出日志的handler，
+    同样会检查各自的级别以及过滤器。StreamHandler一批日志只写入、刷新一次。
+    线程在第一次写入日志时启动，fork出的子进程会重新创建队列以及线程。
+    """
+
+    def __init__(self, handlers: t.Sequence[logging.Handler], queue_size: int = 10000, batch_size: int = 256):
+        if queue_size <= 0 or batch_size <= 0:
+            raise ValueError('queue_size和batch_size必须大于0')
+        self.handlers = tuple(handlers)
+        self.queue_handler = DroppingQueueHandler(queue.Queue(queue_size), self)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._thread: t.Optional[threading.Thread] = None
+        self._pid: t.Optional[int] = None
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+
+    @property
+    def dropped(self) -> int:
+        """因队列已满被丢弃的日志数"""
+        return self.queue_handler.dropped
+
+    def ensure_started(self):
+        if self._pid != os.getpid():
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # fork出的子进程中，父进程的线程不存在，队列中的日志已经由父进程输出
+                self.queue_handler.queue = queue.Queue(self.queue_size)
+            self._thread = threading.Thread(target=self._run, name='miniapi-logger', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self, timeout: float = 5):
+        """输出队列中剩余的日志后停止后台线程"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self.queue_handler.queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+        self._pid = None
+
+    def _run(self):
+        log_queue = self.queue_handler.queue
+        while True:
+            batch = [log_queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            self._write([record for record in batch if record is not None])
+            if stopping:
+                return
+
+    def _write(self, records: t.List[logging.LogRecord]):
+        for handler in self.handlers:
+            if not isinstance(handler, logging.StreamHandler):
+                for record in records:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+                continue
+            self._write_stream(handler, [record for record in records
+                                         if record.levelno >= handler.level and handler.filter(record)])
+
+    @staticmethod
+    def _write_stream(handler: logging.StreamHandler, records: t.List[logging.LogRecord]):
+        if not records:
+            return
+        try:
+            lines = [handler.format(record) for record in records]
+            with handler.lock:
+                handler.stream.write(handler.terminator.join(lines) + handler.terminator)
+                handler.flush()
+        except Exception:  # noqa
+            for record in records:
+                handler.handleError(record)
 
 
 class LoggerMiddleware(MiddlewareBase):
-    """miniapi提供的简易日志记录中间件，直接使用打印到终端"""
+    """miniapi提供的访问日志中间件
+
+    访问日志通过logger_name(默认miniapi.access)对应的logger输出，logger上配置的级别、过滤器、handler以及propagate都会生效。
+    没有为logger设置级别时设置为INFO；logger以及上级logger都没有handler时，添加一个按fmt格式化的默认handler：fmt为color时以彩色文本打印到终端，
+    生产环境可以使用json或者logfmt格式的结构化日志；传入handler时添加该handler，不修改它的格式化。
+    background为True时logger自身的handler改为在后台线程中批量输出，logger上只保留一个有界队列的QueueHandler，
+    请求线程不等待输出，队列已满时丢弃日志并计数；此时日志不再传递给上级logger，
+    logger自身没有handler时使用按fmt格式化的默认handler。
+    sample_2xx为2xx响应的采样比例，例如0.1表示只记录10%的成功请求，其他状态码的响应总是记录。
+
+    在application.yaml中配置:
+        middlewares:
+          - name: miniapi.middleware.logger:LoggerMiddleware
+            options:
+              fmt: json
+              background: true
+              sample_2xx: 0.1
+    """
+
+    def __init__(
+            self,
+            fmt: str = COLOR_FORMAT,
+            background: bool = False,
+            sample_2xx: float = 1.0,
+            queue_size: int = 10000,
+            batch_size: int = 256,
+            handler: t.Optional[logging.Handler] = None,
+            logger_name: str = 'miniapi.access'):
+        if fmt not in (COLOR_FORMAT, JSON_FORMAT, LOGFMT_FORMAT):
+            raise ValueError(f'不支持的日志格式:{fmt},请在{[COLOR_FORMAT, JSON_FORMAT, LOGFMT_FORMAT]}中选择.')
+        if not 0 <= sample_2xx <= 1:
+            raise ValueError(f'sample_2xx必须在0到1之间,当前值为{sample_2xx}')
+        self.fmt = fmt
+        self.sample_2xx = sample_2xx
+
+        self.logger = logger = logging.getLogger(logger_name)
+        # 访问日志为INFO级别，没有为该logger设置级别时默认输出
+        if logger.level == logging.NOTSET:
+            logger.setLevel(logging.INFO)
+        if handler is None and not logger.hasHandlers():
+            handler = self.default_handler(fmt)
+        if handler is not None and handler not in logger.handlers:
+            logger.addHandler(handler)
+        self.handler = handler
+
+        self.writer = self._background_writer(queue_size, batch_size) if background else None
+
+    @staticmethod
+    def default_handler(fmt: str) -> logging.Handler:
+        """logger没有任何handler时使用的默认handler"""
+        handler = logging.StreamHandler(sys.stderr)
+        if fmt == JSON_FORMAT:
+            handler.setFormatter(JsonFormatter())
+        elif fmt == LOGFMT_FORMAT:
+            handler.setFormatter(LogfmtFormatter())
+        return handler
+
+    def _background_writer(self, queue_size: int, batch_size: int) -> BackgroundLogWriter:
+        """将logger自身的handler移到后台线程中，logger上只保留QueueHandler"""
+        logger = self.logger
+        # 上级logger的handler会在请求线程中输出，后台模式下日志不再向上传递
+        logger.propagate = False
+        for handler in logger.handlers:
+            if isinstance(handler, DroppingQueueHandler) and handler.writer is not None:
+                # 其他LoggerMiddleware已经为同一个logger启用了后台输出
+                return handler.writer
+        if not logger.handlers:
+            # 原本只由上级logger的handler输出，改为在后台线程中使用默认handler输出
+            self.handler = self.default_handler(self.fmt)
+            logger.addHandler(self.handler)
+        writer = BackgroundLogWriter(logger.handlers, queue_size, batch_size)
+        for handler in writer.handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(writer.queue_handler)
+        return writer
+
+    @property
+    def dropped_records(self) -> int:
+        """后台模式下因队列已满被丢弃的日志数"""
+        return self.writer.dropped if self.writer is not None else 0
 
     def before_request(self, request):
-        start = time.time()
-        request.state['start_time'] = start
+        request.state['start_time'] = time.perf_counter()
         return request
 
     def after_request(self, request, response):
-        start = request.state['start_time']
-        end = time.time()
-        if response.status.startswith('2'):
+        start = request.state.get('start_time')
+        duration = time.perf_counter() - start if start is not None else 0.0
+        status = response.status
+        if self.sample_2xx < 1 and status.startswith('2') and random.random() >= self.sample_2xx:
+            return response
+        logger = self.logger
+        if not logger.isEnabledFor(logging.INFO):
+            return response
+
+        if self.fmt == COLOR_FORMAT:
+            message = self.format_color(request, status, duration)
+            access = None
+        else:
+            # 结构化的字段放在access中，使用其他格式化的handler时输出message
+            message = f'{request.method} {request.path} {status[:3]} {round(duration * 1000, 3)}ms'
+            access = {
+                'method': request.method,
+                'path': request.path,
+                'query': request.query_string,
+                'status': int(status[:3]),
+                'duration_ms': round(duration * 1000, 3),
+                'remote_addr': request.environ.get('REMOTE_ADDR', ''),
+            }
+        # 直接创建日志记录并交给logger处理，省去logger.info查找调用位置的开销
+        record = logger.makeRecord(logger.name, logging.INFO, '', 0, message, None, None,
+                                   extra={'access': access} if access else None)
+        logger.handle(record)
+        return response
+
+    def format_color(self, request, status: str, duration: float) -> str:
+        if status.startswith('2'):
             fg_color = 30
             bg_color = 42
-        elif response.status.startswith('3'):
+        elif status.startswith('3'):
             fg_color = 30
             bg_color = 44
-        elif response.status.startswith('4'):
+        elif status.startswith('4'):
             fg_color = 30
             bg_color = 43
-        elif response.status.startswith('5'):
+        elif status.startswith('5'):
             fg_color = 30
             bg_color = 45
         else:
             fg_color = 30
             bg_color = 41
 
-        if request.environ['QUERY_STRING']:
-            path = ' ' + request.path + '?' + request.environ['QUERY_STRING'] + ' '
+        if request.query_string:
+            path = ' ' + request.path + '?' + request.query_string + ' '
         else:
             path = ' ' + request.path + ' '
 
-        status = '"' + response.status + '" ' + str(round(end - start, 3)) + 's '
+        status = '"' + status + '" ' + str(round(duration, 3)) + 's '
 
-        log.info(
+        return (
             f"{self.print_colors(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + ' ', 30, 46)}"
             f"{self.print_colors(' ' + request.method + ' ', 30, 107)}"
             f"{self.print_colors(path, fg_color, bg_color)}"
             f"{self.print_colors(status, fg_color, bg_color)}"
         )
-        return response
 
     @staticmethod
     def print_colors(text, fg_color, bg_color):
@@ -0,0 +1,340 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+from miniapi.middleware.base import MiddlewareBase
+from miniapi.response import Response
+from miniapi.status import HTTPStatus
+
+# 限流状态，由算法解释，存储后端只负责保存；所有算法的状态都是3个数值，便于保存到数据库中
+State = t.Tuple[float, float, float]
+
+
+class Decision:
+    """一次限流判断的结果"""
+
+    __slots__ = ('allowed', 'retry_after', 'remaining')
+
+    def __init__(self, allowed: bool, retry_after: float, remaining: int):
+        self.allowed = allowed
+        # retry_after: 被拒绝时至少需要等待的秒数
+        self.retry_after = retry_after
+        self.remaining = remaining
+
+
+class TokenBucket:
+    """令牌桶：桶容量为burst，每秒补充rate个令牌，每个请求消耗一个令牌，允许短时间的突发请求
+
+    状态为 (剩余令牌数, 上次更新时间, 0)
+    """
+
+    name = 'token_bucket'
+
+    def __init__(self, rate: float, burst: float):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f'令牌桶的rate必须大于0,burst必须不小于1,当前值为rate={rate},burst={burst}')
+        self.rate = rate
+        self.burst = burst
+        self.limit = int(burst)
+        # 空闲超过这个时间后桶已经补满，与新的key没有区别，可以删除
+        self.idle_ttl = burst / rate
+
+    def apply(self, state: t.Optional[State], now: float) -> t.Tuple[State, Decision]:
+        if state is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            return (tokens, now, 0.0), Decision(True, 0.0, int(tokens))
+        return (tokens, now, 0.0), Decision(False, (1 - tokens) / self.rate, 0)
+
+    def is_idle(self, state: State, now: float) -> bool:
+        return now - state[1] >= self.idle_ttl
+
+
+class SlidingWindow:
+    """滑动窗口：任意period秒内最多limit个请求
+
+    使用滑动窗口计数(按上一个固定窗口的请求数在当前窗口中所占的比例估算)，每个key只保存两个计数，
+    状态为 (当前窗口开始时间, 当前窗口请求数, 上一个窗口请求数)
+    """
+
+    name = 'sliding_window'
+
+    def __init__(self, limit: int, period: float):
+        if limit < 1 or period <= 0:
+            raise ValueError(f'滑动窗口的limit必须不小于1,period必须大于0,当前值为limit={limit},period={period}')
+        self.limit = int(limit)
+        self.period = period
+        self.idle_ttl = 2 * period
+
+    def apply(self, state: t.Optional[State], now: float) -> t.Tuple[State, Decision]:
+        period = self.period
+        start = now - now % period
+        if state is None or state[0] <= start - 2 * period:
+            count, previous = 0.0, 0.0
+        elif state[0] < start:
+            # 进入下一个窗口
+            count, previous = 0.0, state[1]
+        else:
+            start, count, previous = state
+        elapsed = now - start
+        estimated = previous * (1 - elapsed / period) + count
+        if estimated + 1 <= self.limit:
+            count += 1
+            return (start, count, previous), Decision(True, 0.0, int(self.limit - estimated - 1))
+
+        if count + 1 <= self.limit and previous:
+            # 等到上一个窗口的占比下降到可以容纳这个请求
+            retry_after = (1 - (self.limit - count - 1) / previous) * period - elapsed
+        else:
+            retry_after = period - elapsed
+        return (start, count, previous), Decision(False, max(retry_after, 0.0), 0)
+
+    def is_idle(self, state: State, now: float) -> bool:
+        return now - state[0] >= self.idle_ttl
+
+
+Algorithm = t.Union[TokenBucket, SlidingWindow]
+
+ALGORITHMS = {
+    TokenBucket.name: TokenBucket,
+    SlidingWindow.name: SlidingWindow,
+}
+
+
+class RateLimitBackend:
+    """限流状态存储后端接口，hit需要保证同一个key的读取-计算-写入是原子的"""
+
+    def hit(self, key: str, algorithm: Algorithm) -> Decision:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class _Shard:
+    __slots__ = ('lock', 'states')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {key: 状态}，按最近一次请求的时间排列，最久未请求的在最前面
+        self.states: 'OrderedDict[str, State]' = OrderedDict()
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """进程内存储，key按哈希分散到多个分片，每个分片单独加锁，减少多线程时的锁竞争
+
+    每个分片最多保存max_keys/shards个key，超过时删除最久未请求的key；每次请求时顺便删除已经空闲的key
+    (空闲到状态与新的key相同，删除不影响限流结果)。多进程模式下每个工作进程单独计数。
+    """
+
+    def __init__(self, shards: int = 64, max_keys: int = 100000):
+        if shards <= 0 or max_keys <= 0:
+            raise ValueError('shards和max_keys必须大于0')
+        self._shards = tuple(_Shard() for _ in range(shards))
+        self.max_keys_per_shard = max(max_keys // shards, 1)
+
+    def __len__(self):
+        return sum(len(shard.states) for shard in self._shards)
+
+    def hit(self, key, algorithm):
+        now = time.monotonic()
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            states = shard.states
+            state = states.get(key)
+            states[key], decision = algorithm.apply(state, now)
+            if state is not None:
+                states.move_to_end(key)
+                return decision
+
+            # 新增key时，最多检查两个最久未请求的key，均摊删除空闲的key
+            if len(states) > self.max_keys_per_shard:
+                states.popitem(last=False)
+            for _ in range(2):
+                oldest = next(iter(states))
+                if oldest == key or not algorithm.is_idle(states[oldest], now):
+                    break
+                del states[oldest]
+        return decision
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.states.clear()
+
+
+class SqliteRateLimitBackend(RateLimitBackend):
+    """基于sqlite文件的存储，多进程模式下所有工作进程共享限流状态
+
+    每次判断是一个IMMEDIATE事务，不同进程之间由sqlite的文件锁保证原子性；文件放在/dev/shm等内存文件系统中时
+    相当于共享内存。每隔cleanup_interval次请求删除空闲的key，key超过max_keys时删除最久未请求的key。
+    """
+
+    def __init__(self, path: str, max_keys: int = 100000, timeout: float = 5.0, cleanup_interval: int = 1000):
+        if max_keys <= 0:
+            raise ValueError(f'max_keys必须大于0,当前值为{max_keys}')
+        self.path = path
+        self.max_keys = max_keys
+        self.timeout = timeout
+        self.cleanup_interval = cleanup_interval
+        self._local = threading.local()
+        self._hits = 0
+        connection = self._connection()
+        connection.execute('''
+            CREATE TABLE IF NOT EXISTS ratelimit (
+                key TEXT PRIMARY KEY, a REAL NOT NULL, b REAL NOT NULL, c REAL NOT NULL, touched REAL NOT NULL)
+        ''')
+        connection.execute('CREATE INDEX IF NOT EXISTS ratelimit_touched ON ratelimit (touched)')
+
+    def _connection(self) -> sqlite3.Connection:
+        """每个线程一个连接，fork之后的子进程重新连接"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # 限流状态丢失的代价很小，不需要每次提交都落盘
+            connection.execute('PRAGMA synchronous=OFF')
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def hit(self, key, algorithm):
+        # 多个进程共享状态，使用系统时间
+        now = time.time()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT a, b, c FROM ratelimit WHERE key = ?', (key,)).fetchone()
+            state, decision = algorithm.apply(row, now)
+            connection.execute('INSERT OR REPLACE INTO ratelimit (key, a, b, c, touched) VALUES (?, ?, ?, ?, ?)',
+                               (key, *state, now))
+            self._hits += 1
+            if self._hits % self.cleanup_interval == 0:
+                self._cleanup(connection, now - algorithm.idle_ttl)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return decision
+
+    def _cleanup(self, connection: sqlite3.Connection, idle_before: float):
+        connection.execute('DELETE FROM ratelimit WHERE touched < ?', (idle_before,))
+        connection.execute('''
+            DELETE FROM ratelimit WHERE key IN (
+                SELECT key FROM ratelimit ORDER BY touched DESC LIMIT -1 OFFSET ?)
+        ''', (self.max_keys,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM ratelimit')
+
+
+def make_backend(backend: t.Union[str, RateLimitBackend, None], shards: int, max_keys: int) -> RateLimitBackend:
+    """根据配置创建存储后端：memory或者sqlite:<文件路径>"""
+    if isinstance(backend, RateLimitBackend):
+        return backend
+    if backend is None or backend == 'memory':
+        return MemoryRateLimitBackend(shards, max_keys)
+    if isinstance(backend, str) and backend.startswith('sqlite:'):
+        return SqliteRateLimitBackend(backend[len('sqlite:'):], max_keys)
+    raise ValueError(f'不支持的限流存储后端:{backend},请使用memory、sqlite:<文件路径>或者RateLimitBackend对象.')
+
+
+class RateLimitMiddleware(MiddlewareBase):
+    """限流中间件，超过限制时返回429以及Retry-After
+
+    algorithm为token_bucket时每period秒补充limit个令牌，burst为桶容量(默认等于limit)；
+    为sliding_window时任意period秒内最多limit个请求。
+    key决定按什么计数：ip(客户端IP)、header:<请求头名称>、route(每个路由规则共用一个计数)、
+    global(所有请求共用一个计数)，或者接收request返回字符串的函数，返回None时不限流；
+    per_route为True时在key的基础上再按路由分别计数。
+
+    全局限流在application.yaml中配置:
+        middlewares:
+          - name: miniapi.middleware.ratelimit:RateLimitMiddleware
+            options:
+              limit: 100
+              period: 1
+              key: ip
+    单个路由的限流通过路由的middlewares参数注册单独的实例:
+        @app.post('/login', middlewares=[RateLimitMiddleware(limit=5, period=60, algorithm='sliding_window')])
+    多进程模式下需要所有工作进程共享限流状态时，使用backend='sqlite:/dev/shm/miniapi-ratelimit.db'。
+    """
+
+    def __init__(
+            self,
+            limit: float = 10,
+            period: float = 1.0,
+            algorithm: str = 'token_bucket',
+            burst: t.Optional[float] = None,
+            key: t.Union[str, t.Callable[[t.Any], t.Optional[str]]] = 'ip',
+            per_route: bool = False,
+            backend: t.Union[str, RateLimitBackend, None] = None,
+            shards: int = 64,
+            max_keys: int = 100000,
+            trust_forwarded: bool = False,
+            namespace: str = ''):
+        # trust_forwarded: 是否使用X-Forwarded-For中的第一个地址作为客户端IP，只应在可信的反向代理之后启用
+        # namespace: 多个中间件共享同一个存储后端时，用于区分各自的key
+        if period <= 0:
+            raise ValueError(f'限流周期必须大于0,当前值为{period}')
+        if algorithm == TokenBucket.name:
+            self.algorithm: Algorithm = TokenBucket(limit / period, burst or limit)
+        elif algorithm == SlidingWindow.name:
+            self.algorithm = SlidingWindow(int(limit), period)
+        else:
+            raise ValueError(f'不支持的限流算法:{algorithm},请在{list(ALGORITHMS)}中选择.')
+        self.key_func = self._make_key_func(key, trust_forwarded)
+        self.per_route = per_route or key == 'route'
+        self.backend = make_backend(backend, shards, max_keys)
+        self.namespace = namespace
+
+    @staticmethod
+    def _make_key_func(key, trust_forwarded: bool) -> t.Callable[[t.Any], t.Optional[str]]:
+        if callable(key):
+            return key
+        if key == 'ip':
+            if trust_forwarded:
+                def client_ip(request):
+                    forwarded = request.environ.get('HTTP_X_FORWARDED_FOR')
+                    if forwarded:
+                        return forwarded.split(',', 1)[0].strip()
+                    return request.environ.get('REMOTE_ADDR', '')
+                return client_ip
+            return lambda request: request.environ.get('REMOTE_ADDR', '')
+        if key.startswith('header:'):
+            environ_key = 'HTTP_' + key[len('header:'):].strip().upper().replace('-', '_')
+            return lambda request: request.environ.get(environ_key)
+        if key in ('route', 'global'):
+            return lambda request: ''
+        raise ValueError(f'不支持的限流key:{key},请使用ip、header:<请求头名称>、route、global或者函数.')
+
+    def make_key(self, request) -> t.Optional[str]:
+        value = self.key_func(request)
+        if value is None:
+            return None
+        if self.per_route:
+            endpoint = request.endpoint
+            if endpoint is not None:
+                return f'{self.namespace}{endpoint.method} {endpoint.rule}\n{value}'
+        return f'{self.namespace}{value}'
+
+    def before_request(self, request):
+        key = self.make_key(request)
+        if key is None:
+            return request
+        decision = self.backend.hit(key, self.algorithm)
+        if decision.allowed:
+            return request
+        return Response('', HTTPStatus.TOO_MANY_REQUESTS, headers=[
+            ('Retry-After', str(max(math.ceil(decision.retry_after), 1))),
+            ('RateLimit-Limit', str(self.algorithm.limit)),
+            ('RateLimit-Remaining', '0'),
+        ])
@@ -0,0 +1,231 @@
+import operator
+import typing as t
+
+from miniapi.codec import get_json_codec
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# where支持的比较方式
+_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# 转换为NumPy数组的列的数据类型：布尔、整数、浮点数
+_NUMERIC_KINDS = frozenset('biuf')
+# 可以转换为NumPy数组的列中值的类型，布尔不能与数值混合，否则转换后值会改变(True变为1)
+_BOOL_TYPES = frozenset((bool,))
+_NUMBER_TYPES = frozenset((int, float))
+
+
+def _to_array(values: list):
+    """全部为布尔或者全部为整数/浮点数的列转换为NumPy数组，其他列(包括含有None的列)保持为list"""
+    if numpy is None or not values:
+        return values
+    types = set(map(type, values))
+    if types != _BOOL_TYPES and not types <= _NUMBER_TYPES:
+        return values
+    try:
+        array = numpy.asarray(values)
+    except (TypeError, ValueError, OverflowError):
+        return values
+    return array if array.dtype.kind in _NUMERIC_KINDS else values
+
+
+def _take(column, indices):
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column[indices]
+    if len(indices) > 1:
+        # itemgetter在C中批量取值，比列表推导式快
+        return list(operator.itemgetter(*indices)(column))
+    return [column[i] for i in indices]
+
+
+def _tolist(column) -> list:
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column.tolist()
+    return column
+
+
+class Columns:
+    """列式存储的数据
+
+    行数据(字典列表或者列表/元组列表)只在创建时按列转换一次，之后的取值、删除字段、过滤、排序、分组都按列批量进行。
+    安装了NumPy并且use_numpy不为False时，数值列保存为NumPy数组，过滤和排序使用向量化计算。
+
+    get/index返回的是内部保存的列，不会复制；drop/select返回的新对象与原对象共享列，不会修改原数据。
+    """
+
+    __slots__ = ('_columns', '_length')
+
+    def __init__(self, columns: t.Dict[t.Any, t.Any], length: t.Optional[int] = None):
+        self._columns = columns
+        if length is None:
+            length = len(next(iter(columns.values()))) if columns else 0
+        self._length = length
+
+    @classmethod
+    def from_rows(
+            cls,
+            rows: t.Iterable[t.Union[dict, t.Sequence]],
+            columns: t.Optional[t.Sequence] = None,
+            default: t.Any = None,
+            use_numpy: t.Optional[bool] = None) -> 'Columns':
+        """从行数据创建
+
+        :param rows: 字典列表，或者列表/元组列表(列名为索引位置)
+        :param columns: 需要保留的列，为None时使用第一行的所有字段
+        :param default: 某一行缺少字段时使用的默认值
+        :param use_numpy: 是否使用NumPy数组保存数值列，为None时安装了NumPy就使用
+        """
+        if use_numpy and numpy is None:
+            raise ImportError('numpy未安装，请安装它以使用NumPy保存列数据.')
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return cls({name: [] for name in columns or ()}, 0)
+
+        first = rows[0]
+        is_mapping = isinstance(first, dict)
+        if columns is None:
+            columns = list(first) if is_mapping else list(range(len(first)))
+
+        data = {}
+        for name in columns:
+            if is_mapping:
+                values = [row.get(name, default) for row in rows]
+            else:
+                values = [row[name] if len(row) > name else default for row in rows]
+            data[name] = _to_array(values) if use_numpy is not False else values
+        return cls(data, len(rows))
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, column):
+        return column in self._columns
+
+    def __repr__(self):
+        return f'<Columns rows={self._length} columns={list(self._columns)}>'
+
+    @property
+    def columns(self) -> list:
+        return list(self._columns)
+
+    def get(self, column, default: t.Any = None):
+        """获取一列，列不存在时返回由default填充的列表"""
+        values = self._columns.get(column)
+        if values is None:
+            return [default] * self._length
+        return values
+
+    def index(self, index: int, default: t.Any = None):
+        """按位置获取一列"""
+        names = list(self._columns)
+        if -len(names) <= index < len(names):
+            return self._columns[names[index]]
+        return [default] * self._length
+
+    def get_many(self, columns: t.Iterable) -> t.Dict[t.Any, t.Any]:
+        """批量获取多列"""
+        return {column: self.get(column) for column in columns}
+
+    def drop(self, columns: t.Iterable) -> 'Columns':
+        """删除多列，返回新对象"""
+        columns = set(columns)
+        return Columns({k: v for k, v in self._columns.items() if k not in columns}, self._length)
+
+    def select(self, columns: t.Iterable) -> 'Columns':
+        """只保留指定的列，返回新对象"""
+        return Columns({column: self.get(column) for column in columns}, self._length)
+
+    def take(self, indices) -> 'Columns':
+        """按行号取出多行，返回新对象"""
+        if numpy is not None and not isinstance(indices, numpy.ndarray) and any(
+                isinstance(v, numpy.ndarray) for v in self._columns.values()):
+            indices = numpy.asarray(indices, dtype=numpy.intp)
+        return Columns({k: _take(v, indices) for k, v in self._columns.items()}, len(indices))
+
+    def where(self, column, op: str, value) -> 'Columns':
+        """按条件过滤行，op可以是==、!=、<、<=、>、>=、in，NumPy列使用向量化比较"""
+        values = self.get(column)
+        if op == 'in':
+            if numpy is not None and isinstance(values, numpy.ndarray):
+                return self.take(numpy.flatnonzero(numpy.isin(values, list(value))))
+            value = set(value)
+            return self.take([i for i, v in enumerate(values) if v in value])
+        else:
+            compare = _OPERATORS.get(op)
+            if compare is None:
+                raise ValueError(f'不支持的比较方式:{op},请在{[*_OPERATORS, "in"]}中选择.')
+            if numpy is not None and isinstance(values, numpy.ndarray):
+                return self.take(numpy.flatnonzero(compare(values, value)))
+            return self.take([i for i, v in enumerate(values) if v is not None and compare(v, value)])
+
+    def filter(self, column, predicate: t.Callable[[t.Any], bool]) -> 'Columns':
+        """按列的值过滤行，predicate返回True的行保留"""
+        values = _tolist(self.get(column))
+        return self.take([i for i, v in enumerate(values) if predicate(v)])
+
+    def sort(self, column, reverse: bool = False) -> 'Columns':
+        """按列排序(稳定排序)，值为None的行不论正序倒序都排在最后，返回新对象"""
+        values = self.get(column)
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            if reverse:
+                # 倒序时保持相同值的原始顺序，与sorted(reverse=True)一致
+                order = (self._length - 1 - numpy.argsort(values[::-1], kind='stable'))[::-1]
+            else:
+                order = numpy.argsort(values, kind='stable')
+        else:
+            present = [i for i, v in enumerate(values) if v is not None]
+            order = sorted(present, key=values.__getitem__, reverse=reverse)
+            if len(present) < self._length:
+                order += [i for i, v in enumerate(values) if v is None]
+        return self.take(order)
+
+    def group_by(self, column) -> t.Dict[t.Any, 'Columns']:
+        """按列的值分组 {值: 该组的数据}，分组按值第一次出现的顺序排列"""
+        groups: t.Dict[t.Any, list] = {}
+        for i, value in enumerate(_tolist(self.get(column))):
+            indices = groups.get(value)
+            if indices is None:
+                groups[value] = [i]
+            else:
+                indices.append(i)
+        return {value: self.take(indices) for value, indices in groups.items()}
+
+    def count_by(self, column) -> t.Dict[t.Any, int]:
+        """按列的值计数"""
+        counts: t.Dict[t.Any, int] = {}
+        for value in _tolist(self.get(column)):
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def to_dict(self) -> t.Dict[t.Any, list]:
+        """转换为 {列名: 值列表}"""
+        return {k: _tolist(v) for k, v in self._columns.items()}
+
+    def to_rows(self) -> t.List[dict]:
+        """转换为字典列表"""
+        names = list(self._columns)
+        values = [_tolist(v) for v in self._columns.values()]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def to_json(self, orient: str = 'records', **json_kwargs) -> bytes:
+        """使用当前配置的JSON后端序列化
+
+        :param orient: records输出字典列表，columns输出 {列名: 值列表}，后者更小、更快
+        """
+        if orient == 'records':
+            data = self.to_rows()
+        elif orient == 'columns':
+            data = {str(k): v for k, v in self.to_dict().items()}
+        else:
+            raise ValueError(f'不支持的orient:{orient},请在{["records", "columns"]}中选择.')
+        return get_json_codec().dumps(data, **json_kwargs)
@@ -1,5 +1,10 @@
 import typing as t
 
+from miniapi.objects import stream
+
+if t.TYPE_CHECKING:
+    from miniapi.objects.columns import Columns
+
 
 class _Know:
     """不明确的值"""
@@ -64,3 +69,42 @@ class DataObjects:
                 value = row[index]
             values.append(value)
         return values
+
+    @staticmethod
+    def o_columns(
+            data: t.Iterable[t.Union[dict, t.Sequence]],
+            columns: t.Optional[t.Sequence] = None,
+            default: t.Any = None,
+            use_numpy: t.Optional[bool] = None) -> 'Columns':
+        """将行数据转换为列式存储，需要对同一份数据做多次取值、过滤、排序、分组时使用
+
+        :param data: 数据
+        :param columns: 需要保留的字段，为None时使用第一行的所有字段
+        :param default: 缺少字段时使用的默认值
+        :param use_numpy: 是否使用NumPy数组保存数值列，为None时安装了NumPy就使用
+        """
+        # 安装了NumPy时导入较慢，只在使用时导入
+        from miniapi.objects.columns import Columns
+
+        return Columns.from_rows(data, columns, default, use_numpy)
+
+    @staticmethod
+    def iter_get(data: t.Iterable[dict], column: str, default: t.Any = None, ignore: bool = False) -> t.Iterator:
+        """o_get的生成器版本，data可以是任意可迭代对象(例如数据库游标)，逐行产出结果"""
+        return stream.iter_get(data, column, default, ignore)
+
+    @staticmethod
+    def iter_drop(data: t.Iterable[dict], columns: t.Iterable[str]) -> t.Iterator[dict]:
+        """o_drop的生成器版本，逐行产出删除字段后的新字典，不修改原数据"""
+        return stream.iter_drop(data, columns)
+
+    @staticmethod
+    def iter_index(data: t.Iterable[t.Sequence], index: int = 0, default: t.Any = None,
+                   ignore: bool = False) -> t.Iterator:
+        """o_index的生成器版本，data可以是任意可迭代对象，逐行产出结果"""
+        return stream.iter_index(data, index, default, ignore)
+
+    @staticmethod
+    def o_stream(data: t.Iterable) -> stream.RowStream:
+        """创建惰性的行数据处理流水线，可以链式调用map/filter/get/pluck/drop/batch"""
+        return stream.RowStream(data)
@@ -0,0 +1,100 @@
+import itertools
+import typing as t
+
+
+# 字段不存在
+_missing = object()
+
+
+def iter_get(data: t.Iterable[dict], column: str, default: t.Any = None, ignore: bool = False) -> t.Iterator:
+    """逐行获取指定字段的值"""
+    for row in data:
+        value = row.get(column, _missing)
+        if value is _missing:
+            if ignore:
+                continue
+            value = default
+        yield value
+
+
+def iter_drop(data: t.Iterable[dict], columns: t.Iterable[str]) -> t.Iterator[dict]:
+    """逐行删除指定的多个字段，返回新的字典，不修改原数据"""
+    columns = frozenset(columns)
+    for row in data:
+        yield {k: v for k, v in row.items() if k not in columns}
+
+
+def iter_index(data: t.Iterable[t.Sequence], index: int = 0, default: t.Any = None,
+               ignore: bool = False) -> t.Iterator:
+    """逐行获取指定索引位置的值"""
+    for row in data:
+        if len(row) == 0:
+            if ignore:
+                continue
+            yield default
+        else:
+            yield row[index]
+
+
+def iter_batch(data: t.Iterable, size: int) -> t.Iterator[list]:
+    """每size行组成一个列表"""
+    if size <= 0:
+        raise ValueError(f'批大小必须大于0,当前值为{size}')
+    iterator = iter(data)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class RowStream:
+    """惰性的行数据处理流水线
+
+    可以接收任意可迭代对象(例如数据库游标)，每个阶段都是生成器，只有在迭代时才逐行处理，
+    内存占用与数据总量无关:
+        rows = DataObjects.o_stream(cursor).filter(lambda r: r['enabled']).drop('password')
+        for batch in rows.batch(1000):
+            ...
+    """
+
+    __slots__ = ('_iterable',)
+
+    def __init__(self, iterable: t.Iterable):
+        self._iterable = iterable
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def map(self, func: t.Callable[[t.Any], t.Any]) -> 'RowStream':
+        return RowStream(map(func, self._iterable))
+
+    def filter(self, predicate: t.Callable[[t.Any], bool]) -> 'RowStream':
+        return RowStream(filter(predicate, self._iterable))
+
+    def get(self, column: str, default: t.Any = None, ignore: bool = False) -> 'RowStream':
+        """每行只保留指定字段的值"""
+        return RowStream(iter_get(self._iterable, column, default, ignore))
+
+    def index(self, index: int = 0, default: t.Any = None, ignore: bool = False) -> 'RowStream':
+        """每行只保留指定索引位置的值"""
+        return RowStream(iter_index(self._iterable, index, default, ignore))
+
+    def pluck(self, *columns: str, default: t.Any = None) -> 'RowStream':
+        """每行只保留指定的多个字段"""
+        return RowStream({column: row.get(column, default) for column in columns} for row in self._iterable)
+
+    def drop(self, *columns: str) -> 'RowStream':
+        """每行删除指定的多个字段"""
+        return RowStream(iter_drop(self._iterable, columns))
+
+    def batch(self, size: int) -> 'RowStream':
+        """每size行组成一个列表，适合批量写入或者批量查询关联数据"""
+        return RowStream(iter_batch(self._iterable, size))
+
+    def limit(self, count: int) -> 'RowStream':
+        return RowStream(itertools.islice(self._iterable, count))
+
+    def collect(self) -> list:
+        """执行流水线并返回列表"""
+        return list(self._iterable)
@@ -0,0 +1,569 @@
+"""类型注解参数注入
+
+接口函数除request以外带类型注解的参数，在注册路由时编译为读取以及转换函数，请求时直接调用，不再做任何反射:
+
+    @dataclass
+    class Item:
+        name: str
+        price: float
+        tags: t.List[str] = dataclasses.field(default_factory=list)
+
+    @app.post('/shops/{shop_id:int}/items')
+    def create_item(request, shop_id: int, item: Item, dry_run: bool = False):
+        ...
+
+参数来源:
+    - 名称与路由规则中的路径参数相同: 路径参数
+    - dataclass或者msgspec.Struct: 整个JSON请求体
+    - 其他类型: 查询参数，t.List[X]接收同名的多个值
+    - 使用Query()、Body()、Path()作为默认值时显式指定来源，Body()用于读取JSON请求体对象中的某个字段
+
+没有类型注解也没有指定来源的参数保持原样，不会注入。
+校验失败时返回422，响应体为 {"detail": [{"loc": ["query", "page"], "msg": "...", "type": "..."}]}。
+msgspec.Struct使用msgspec直接从请求体解码并校验；未安装msgspec时只支持dataclass。
+"""
+import functools
+import inspect
+import sys
+import types
+import typing as t
+
+from miniapi.codec import get_json_codec
+from miniapi.exc import ValidationError
+from miniapi.response import JsonResponse
+from miniapi.route import rule_params
+from miniapi.status import HTTPStatus
+
+# 读取或者转换失败，错误已经记录
+_invalid = object()
+_empty = inspect.Parameter.empty
+
+# 转换函数 (值, 位置, 错误列表) -> 转换后的值或者_invalid
+Converter = t.Callable[[t.Any, tuple, t.List[dict]], t.Any]
+
+_TRUE_VALUES = frozenset(('true', '1', 'yes', 'on'))
+_FALSE_VALUES = frozenset(('false', '0', 'no', 'off'))
+
+# t.Optional[X]以及 X | None
+_UNION_TYPES = (t.Union, getattr(types, 'UnionType', t.Union))
+
+# 路径参数转换器转换后的类型
+_CONVERTER_TYPES = {'int': int, 'float': float, 'str': str, 'path': str}
+
+
+class Param:
+    """参数来源标记，作为参数的默认值使用，alias为请求中的名称"""
+
+    source = ''
+
+    __slots__ = ('default', 'alias')
+
+    def __init__(self, default: t.Any = _empty, alias: t.Optional[str] = None):
+        self.default = default
+        self.alias = alias
+
+    def __repr__(self):
+        return f'{type(self).__name__}(default={self.default!r}, alias={self.alias!r})'
+
+
+class Path(Param):
+    source = 'path'
+
+
+class Query(Param):
+    source = 'query'
+
+
+class Body(Param):
+    source = 'body'
+
+
+def _error(errors: t.List[dict], loc: tuple, msg: str, type_: str):
+    errors.append({'loc': list(loc), 'msg': msg, 'type': type_})
+    return _invalid
+
+
+def _struct_type():
+    """msgspec.Struct，只在用户已经导入msgspec时存在，不为此导入msgspec"""
+    msgspec = sys.modules.get('msgspec')
+    return msgspec.Struct if msgspec is not None else None
+
+
+def _is_model(annotation) -> bool:
+    # 等价于dataclasses.is_dataclass，避免启动时导入dataclasses
+    if isinstance(annotation, type) and hasattr(annotation, '__dataclass_fields__'):
+        return True
+    struct = _struct_type()
+    return struct is not None and isinstance(annotation, type) and issubclass(annotation, struct)
+
+
+def _optional_inner(annotation) -> t.Tuple[bool, t.Any]:
+    """Optional[X]返回(True, X)，其他返回(False, annotation)"""
+    if t.get_origin(annotation) in _UNION_TYPES:
+        args = [arg for arg in t.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1 and len(t.get_args(annotation)) == 2:
+            return True, args[0]
+    return False, annotation
+
+
+# ----- 字符串(路径参数以及查询参数)转换 -----
+
+def _str_to_int(value, loc, errors):
+    try:
+        return int(value)
+    except ValueError:
+        return _error(errors, loc, f'必须是整数,当前值为{value!r}', 'int_parsing')
+
+
+def _str_to_float(value, loc, errors):
+    try:
+        return float(value)
+    except ValueError:
+        return _error(errors, loc, f'必须是数字,当前值为{value!r}', 'float_parsing')
+
+
+def _str_to_bool(value, loc, errors):
+    lowered = value.lower()
+    if lowered in _TRUE_VALUES:
+        return True
+    if lowered in _FALSE_VALUES:
+        return False
+    return _error(errors, loc, f'必须是布尔值,当前值为{value!r}', 'bool_parsing')
+
+
+def _identity(value, loc, errors):
+    return value
+
+
+_STR_CONVERTERS: t.Dict[t.Any, Converter] = {
+    str: _identity,
+    int: _str_to_int,
+    float: _str_to_float,
+    bool: _str_to_bool,
+    t.Any: _identity,
+}
+
+
+def compile_str_converter(annotation, where: str) -> Converter:
+    """字符串到annotation的转换函数"""
+    converter = _STR_CONVERTERS.get(annotation)
+    if converter is None:
+        raise AssertionError(f'{where}不支持的参数类型:{annotation},请使用{[c.__name__ for c in (str, int, float, bool)]}')
+    return converter
+
+
+# ----- JSON值转换 -----
+
+def _json_int(value, loc, errors):
+    if type(value) is int:
+        return value
+    return _error(errors, loc, f'必须是整数,当前值为{value!r}', 'int_type')
+
+
+def _json_float(value, loc, errors):
+    if type(value) is float:
+        return value
+    if type(value) is int:
+        return float(value)
+    return _error(errors, loc, f'必须是数字,当前值为{value!r}', 'float_type')
+
+
+def _json_type(expected: type, type_: str, description: str) -> Converter:
+    def convert(value, loc, errors):
+        if type(value) is expected:
+            return value
+        return _error(errors, loc, f'必须是{description},当前值为{value!r}', type_)
+
+    return convert
+
+
+_JSON_CONVERTERS: t.Dict[t.Any, Converter] = {
+    str: _json_type(str, 'string_type', '字符串'),
+    bool: _json_type(bool, 'bool_type', '布尔值'),
+    int: _json_int,
+    float: _json_float,
+    t.Any: _identity,
+    _empty: _identity,
+}
+
+# 值的类型与注解完全相同时不需要转换，跳过转换函数调用以及错误位置的拼接 {转换函数: 类型}
+_EXACT_TYPES: t.Dict[Converter, type] = {_JSON_CONVERTERS[tp]: tp for tp in (str, bool, int, float)}
+
+# 已经编译的dataclass以及msgspec.Struct转换函数 {类型: 转换函数}
+_model_converters: t.Dict[type, Converter] = {}
+
+
+def compile_json_converter(annotation) -> Converter:
+    """JSON解码后的值到annotation的转换函数"""
+    converter = _JSON_CONVERTERS.get(annotation)
+    if converter is not None:
+        return converter
+    if annotation in (list, dict):
+        return _json_type(annotation, f'{annotation.__name__}_type', '数组' if annotation is list else '对象')
+    if isinstance(annotation, type) and _is_model(annotation):
+        converter = _model_converters.get(annotation)
+        if converter is None:
+            converter = _model_converters[annotation] = _compile_model(annotation)
+        return converter
+
+    origin, args = t.get_origin(annotation), t.get_args(annotation)
+    if origin in _UNION_TYPES:
+        return _compile_union(args)
+    if origin is list:
+        return _compile_list(compile_json_converter(args[0]) if args else _identity)
+    if origin is dict:
+        return _compile_dict(compile_json_converter(args[1]) if args else _identity)
+    raise AssertionError(f'不支持的请求体参数类型:{annotation}')
+
+
+def _compile_union(args: tuple) -> Converter:
+    nullable = type(None) in args
+    converters = [compile_json_converter(arg) for arg in args if arg is not type(None)]
+
+    def convert(value, loc, errors):
+        if value is None:
+            if nullable:
+                return None
+            return _error(errors, loc, '不能为null', 'none_forbidden')
+        # 依次尝试，全部失败时只记录最后一个类型的错误
+        attempt = []
+        for item_converter in converters:
+            attempt = []
+            result = item_converter(value, loc, attempt)
+            if result is not _invalid:
+                return result
+        errors.extend(attempt)
+        return _invalid
+
+    return convert
+
+
+def _compile_list(item_converter: Converter) -> Converter:
+    exact_type = _EXACT_TYPES.get(item_converter)
+
+    def convert(value, loc, errors):
+        if type(value) is not list:
+            return _error(errors, loc, f'必须是数组,当前值为{value!r}', 'list_type')
+        if item_converter is _identity:
+            return value
+        if exact_type is not None:
+            for item in value:
+                if type(item) is not exact_type:
+                    break
+            else:
+                return value
+        count = len(errors)
+        result = [item_converter(item, loc + (i,), errors) for i, item in enumerate(value)]
+        return result if len(errors) == count else _invalid
+
+    return convert
+
+
+def _compile_dict(value_converter: Converter) -> Converter:
+    def convert(value, loc, errors):
+        if type(value) is not dict:
+            return _error(errors, loc, f'必须是对象,当前值为{value!r}', 'dict_type')
+        if value_converter is _identity:
+            return value
+        count = len(errors)
+        result = {key: value_converter(item, loc + (key,), errors) for key, item in value.items()}
+        return result if len(errors) == count else _invalid
+
+    return convert
+
+
+def _compile_model(model: type) -> Converter:
+    import dataclasses
+
+    struct = _struct_type()
+    if struct is not None and issubclass(model, struct):
+        return _compile_struct(model)
+
+    hints = t.get_type_hints(model)
+    # (字段名, 转换函数, 不需要转换的类型, 是否必填)
+    fields = []
+    for field in dataclasses.fields(model):
+        if not field.init:
+            continue
+        required = field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING
+        converter = compile_json_converter(hints.get(field.name, t.Any))
+        fields.append((field.name, converter, _EXACT_TYPES.get(converter), required))
+    fields = tuple(fields)
+
+    def convert(value, loc, errors):
+        if type(value) is not dict:
+            return _error(errors, loc, f'必须是对象,当前值为{value!r}', 'dict_type')
+        count = len(errors)
+        kwargs = {}
+        for name, field_converter, exact_type, required in fields:
+            item = value.get(name, _invalid)
+            if type(item) is exact_type:
+                kwargs[name] = item
+            elif item is _invalid:
+                if required:
+                    _error(errors, loc + (name,), '缺少必填字段', 'missing')
+            else:
+                kwargs[name] = field_converter(item, loc + (name,), errors)
+        if len(errors) != count:
+            return _invalid
+        return model(**kwargs)
+
+    return convert
+
+
+def _msgspec_error(errors: t.List[dict], loc: tuple, error: Exception):
+    # msgspec的错误信息形如 "Expected `int`, got `str` - at `$.price`"
+    message, _, path = str(error).partition(' - at `$')
+    fields = tuple(part for part in path.rstrip('`').replace('[', '.').replace(']', '').split('.') if part)
+    return _error(errors, loc + tuple(int(f) if f.isdigit() else f for f in fields), message, 'msgspec')
+
+
+def _compile_struct(model: type) -> Converter:
+    import msgspec
+
+    def convert(value, loc, errors):
+        try:
+            return msgspec.convert(value, model)
+        except msgspec.ValidationError as e:
+            return _msgspec_error(errors, loc, e)
+
+    return convert
+
+
+# ----- 参数读取 -----
+
+def _read_path(key: str, converter: t.Optional[Converter]):
+    loc = ('path', key)
+
+    def read(request, body, errors):
+        value = request.path_params[key]
+        if converter is None:
+            return value
+        return converter(str(value), loc, errors)
+
+    return read
+
+
+def _read_query(key: str, converter: Converter, default, many: bool):
+    loc = ('query', key)
+
+    def read(request, body, errors):
+        values = request.query_params.get(key)
+        if not values:
+            if default is _empty:
+                return _error(errors, loc, '缺少必填参数', 'missing')
+            return default
+        if many:
+            count = len(errors)
+            result = [converter(value, loc, errors) for value in values]
+            return result if len(errors) == count else _invalid
+        return converter(values[0], loc, errors)
+
+    return read
+
+
+def _read_body_field(key: str, converter: Converter, default):
+    loc = ('body', key)
+
+    def read(request, body, errors):
+        # 请求体不是对象的错误已经在bind中记录
+        if body is _invalid:
+            return _invalid
+        value = _invalid if body is None else body.get(key, _invalid)
+        if value is _invalid:
+            if default is _empty:
+                return _error(errors, loc, '缺少必填字段', 'missing')
+            return default
+        return converter(value, loc, errors)
+
+    return read
+
+
+def _read_body(converter: Converter, default):
+    loc = ('body',)
+
+    def read(request, body, errors):
+        if body is _invalid:
+            return _invalid
+        if body is None:
+            if default is _empty:
+                return _error(errors, loc, '缺少请求体', 'missing')
+            return default
+        return converter(body, loc, errors)
+
+    return read
+
+
+def _read_struct_body(model: type, default):
+    """msgspec.Struct直接从原始请求体解码，不经过JSON后端"""
+    import msgspec
+
+    decoder = msgspec.json.Decoder(model)
+    loc = ('body',)
+
+    def read(request, body, errors):
+        data = request.data
+        if not data:
+            if default is _empty:
+                return _error(errors, loc, '缺少请求体', 'missing')
+            return default
+        try:
+            return decoder.decode(data)
+        except msgspec.ValidationError as e:
+            return _msgspec_error(errors, loc, e)
+        except msgspec.DecodeError:
+            return _error(errors, loc, '请求体不是合法的JSON', 'json_invalid')
+
+    return read
+
+
+def _load_json(request, errors: t.List[dict]):
+    """解析JSON请求体，空请求体返回None，解析失败时记录错误并返回_invalid"""
+    data = request.data
+    if not data:
+        return None
+    codec = get_json_codec()
+    try:
+        return codec.loads(data)
+    except codec.decode_error:
+        return _error(errors, ('body',), '请求体不是合法的JSON', 'json_invalid')
+
+
+def _param_source(name: str, annotation, marker: t.Optional[Param], path_params) -> t.Optional[str]:
+    """判断参数的来源，返回 path/query/body；不需要注入时返回None"""
+    if marker is not None:
+        return marker.source
+    if name in path_params:
+        return 'path'
+    if annotation is _empty:
+        # 没有类型注解也没有标记的参数不注入
+        return None
+    if _is_model(annotation):
+        return 'body'
+    return 'query'
+
+
+def _compile_path_reader(key: str, annotation, path_params, rule: str, where: str):
+    if key not in path_params:
+        raise AssertionError(f'{where}对应的路径参数 {key} 不在路由规则 {rule} 中')
+    _, inner = _optional_inner(annotation)
+    converter = None
+    if inner is not _empty and inner is not _CONVERTER_TYPES[path_params[key]]:
+        converter = compile_str_converter(inner, where)
+    return _read_path(key, converter)
+
+
+def _compile_query_reader(key: str, annotation, default, where: str):
+    nullable, inner = _optional_inner(annotation)
+    if nullable and default is _empty:
+        default = None
+    many = t.get_origin(inner) is list
+    if many:
+        args = t.get_args(inner)
+        inner = args[0] if args else str
+    converter = compile_str_converter(str if inner is _empty else inner, where)
+    return _read_query(key, converter, default, many)
+
+
+def _compile_body_reader(key: str, annotation, default, marker: t.Optional[Param]):
+    """编译请求体参数的读取函数，返回 (读取函数, 是否需要JSON解析, 是否读取请求体对象的字段)"""
+    nullable, inner = _optional_inner(annotation)
+    if nullable and default is _empty:
+        default = None
+    struct = _struct_type()
+    if marker is None and struct is not None and isinstance(inner, type) and issubclass(inner, struct):
+        return _read_struct_body(inner, default), False, False
+    converter = compile_json_converter(inner)
+    if marker is None:
+        return _read_body(converter, default), True, False
+    return _read_body_field(key, converter, default), True, True
+
+
+def compile_params(
+        func: t.Callable,
+        rule: str,
+        stream_body: bool = False) -> t.Optional[t.Callable[[t.Any], dict]]:
+    """根据接口函数的签名编译参数读取函数，返回 request -> 参数字典 的函数；没有需要注入的参数时返回None"""
+    path_params = rule_params(rule)
+    signature = inspect.signature(func)
+    try:
+        hints = t.get_type_hints(func)
+    except (NameError, TypeError):
+        hints = {}
+
+    readers = []
+    # needs_json: 是否需要使用JSON后端解析请求体
+    # needs_object: 是否有参数读取请求体对象中的字段，请求体必须是对象
+    needs_json = needs_object = False
+    for name, parameter in signature.parameters.items():
+        if name == 'request' or parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        annotation = hints.get(name, parameter.annotation)
+        default = parameter.default
+        marker = default if isinstance(default, Param) else None
+        if marker is not None:
+            default = marker.default
+        key = marker.alias if marker is not None and marker.alias else name
+
+        source = _param_source(name, annotation, marker, path_params)
+        if source is None:
+            continue
+        if parameter.kind is parameter.POSITIONAL_ONLY:
+            raise AssertionError(f"函数 '{func.__name__}' 的参数 '{name}' 不能是仅限位置参数")
+        where = f"函数 '{func.__name__}' 的参数 '{name}' "
+
+        if source == 'path':
+            readers.append((name, _compile_path_reader(key, annotation, path_params, rule, where)))
+        elif source == 'query':
+            readers.append((name, _compile_query_reader(key, annotation, default, where)))
+        else:
+            if stream_body:
+                raise AssertionError(f'{where}从请求体读取，不能用于stream_body的路由')
+            read, json_body, object_body = _compile_body_reader(key, annotation, default, marker)
+            needs_json = needs_json or json_body
+            needs_object = needs_object or object_body
+            readers.append((name, read))
+
+    if not readers:
+        return None
+    readers = tuple(readers)
+
+    def bind(request) -> dict:
+        errors = []
+        body = _load_json(request, errors) if needs_json else None
+        if needs_object and body is not None and body is not _invalid and type(body) is not dict:
+            body = _error(errors, ('body',), '请求体必须是JSON对象', 'dict_type')
+        kwargs = {}
+        for name, read in readers:
+            kwargs[name] = read(request, body, errors)
+        if errors:
+            raise ValidationError(errors)
+        return kwargs
+
+    return bind
+
+
+def error_response(error: ValidationError) -> JsonResponse:
+    return JsonResponse({'detail': error.errors}, HTTPStatus.UNPROCESSABLE_ENTITY)
+
+
+def inject_params(func: t.Callable, bind: t.Callable[[t.Any], dict]) -> t.Callable:
+    """包装接口函数，调用前注入参数；参数或者接口函数中抛出的ValidationError转换为422响应"""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(request):
+            try:
+                return await func(request, **bind(request))
+            except ValidationError as e:
+                return error_response(e)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(request):
+        try:
+            return func(request, **bind(request))
+        except ValidationError as e:
+            return error_response(e)
+
+    return wrapper
@@ -0,0 +1,156 @@
+"""请求分阶段耗时分析
+
+启用后dispatch_request记录每个请求各阶段的耗时：解析请求、每个中间件的before_request/after_request、
+接口函数、响应序列化(Response.prepare)以及写出响应体。耗时超过阈值的请求保留最近的keep条，
+可以通过调试接口查看；profile_rate大于0时按比例使用cProfile分析请求，慢请求的分析结果写入profile_dir。
+
+只用于WSGI模式，各阶段的耗时通过Application.dispatch_request的trace回调记录。
+"""
+import collections
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+import typing as t
+
+
+class _TracedBody:
+    """记录响应体写出耗时的可迭代对象，服务关闭响应时结束记录"""
+
+    def __init__(self, body: t.Iterable[bytes], finish: t.Callable[[float], None]):
+        self.body = body
+        self._finish = finish
+        self._start: t.Optional[float] = None
+
+    def __iter__(self):
+        self._start = time.perf_counter()
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            end = time.perf_counter()
+            self._finish(end - (self._start or end))
+
+
+class Profiler:
+    """请求耗时分析"""
+
+    def __init__(
+            self,
+            threshold: float = 0.5,
+            keep: int = 50,
+            profile_rate: float = 0.0,
+            profile_dir: t.Optional[str] = None):
+        # threshold: 慢请求阈值(秒)
+        # keep: 保留最近的慢请求数量
+        # profile_rate: 使用cProfile分析的请求比例，0表示不使用
+        # profile_dir: 慢请求的cProfile分析结果保存目录，可以用pstats或者snakeviz查看
+        if threshold < 0:
+            raise ValueError(f'慢请求阈值不能小于0,当前值为{threshold}')
+        if not 0 <= profile_rate <= 1:
+            raise ValueError(f'profile_rate必须在0到1之间,当前值为{profile_rate}')
+        if profile_rate and not profile_dir:
+            raise ValueError('使用cProfile分析请求时必须指定profile_dir')
+        self.threshold = threshold
+        self.profile_rate = profile_rate
+        self.profile_dir = profile_dir
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        self.slow_requests: t.Deque[dict] = collections.deque(maxlen=keep)
+        # 同一时间只允许一个cProfile分析
+        self._profile_lock = threading.Lock()
+
+    def slowest(self, limit: t.Optional[int] = None) -> t.List[dict]:
+        """最近的慢请求，按耗时从高到低排列"""
+        requests = sorted(list(self.slow_requests), key=lambda item: item['duration_ms'], reverse=True)
+        return requests[:limit] if limit else requests
+
+    def _start_profile(self) -> t.Optional[cProfile.Profile]:
+        if not self.profile_rate or random.random() >= self.profile_rate:
+            return None
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 其他分析工具正在运行
+            self._profile_lock.release()
+            return None
+        return profile
+
+    def _stop_profile(self, profile: cProfile.Profile):
+        profile.disable()
+        self._profile_lock.release()
+
+    def dispatch(self, app, environ, start_response):
+        """记录各阶段耗时的dispatch_request"""
+        phases: t.List[t.Tuple[str, float]] = []
+        status = None
+        profile = self._start_profile()
+        try:
+            start = mark = time.perf_counter()
+
+            def trace(phase: str):
+                nonlocal mark
+                now = time.perf_counter()
+                phases.append((phase, now - mark))
+                mark = now
+
+            def _start_response(_status, headers, exc_info=None):
+                nonlocal status
+                status = _status
+                return start_response(_status, headers, exc_info)
+
+            def finish(write: float):
+                nonlocal profile
+                phases.append(('write', write))
+                # 只停止一次cProfile分析，之后出现异常时不再重复释放
+                finished, profile = profile, None
+                if finished is not None:
+                    self._stop_profile(finished)
+                self._record(environ, status, phases, time.perf_counter() - start, finished)
+
+            body = app.dispatch_request(environ, _start_response, trace)
+            file_wrapper = environ.get('wsgi.file_wrapper')
+            if file_wrapper is not None and isinstance(body, file_wrapper):
+                # 保留file_wrapper，以便服务使用sendfile发送文件，此时不记录写出耗时
+                finish(0.0)
+                return body
+            return _TracedBody(body, finish)
+        except BaseException:
+            # 没有返回响应体时服务不会调用close，需要在这里停止cProfile分析并释放锁，否则之后的请求都不能再分析
+            if profile is not None:
+                self._stop_profile(profile)
+            raise
+
+    def _record(self, environ, status: str, phases: list, duration: float, profile: t.Optional[cProfile.Profile]):
+        if duration < self.threshold:
+            return
+        method = environ.get('REQUEST_METHOD', 'GET')
+        path = environ.get('PATH_INFO', '/')
+        sample = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'method': method,
+            'path': path,
+            'query': environ.get('QUERY_STRING', ''),
+            'status': status,
+            'duration_ms': round(duration * 1000, 3),
+            'phases': [{'phase': name, 'ms': round(seconds * 1000, 3)} for name, seconds in phases],
+            'profile': None,
+        }
+        if profile is not None:
+            sample['profile'] = self._dump_profile(profile, method, path, duration)
+        self.slow_requests.append(sample)
+
+    def _dump_profile(self, profile: cProfile.Profile, method: str, path: str, duration: float) -> str:
+        path = re.sub(r'[^A-Za-z0-9_.-]+', '_', path).strip('_') or 'root'
+        filename = f'{time.strftime("%Y%m%d-%H%M%S")}-{method}-{path[:64]}-{int(duration * 1000)}ms.prof'
+        filepath = os.path.join(self.profile_dir, filename)
+        profile.dump_stats(filepath)
+        return filepath
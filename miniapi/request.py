@@ -1,16 +1,212 @@
-import json
+import tempfile
+import typing as t
+from urllib.parse import parse_qs
+
+from miniapi.codec import get_json_codec
+from miniapi.exc import HTTPException
+from miniapi.status import HTTPStatus
+
+# 未计算的惰性属性
+_missing = object()
+
+# 流式读取请求体时默认的分块大小
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class BodyStream:
+    """请求体输入流
+
+    length为None时(例如分块传输编码)一直读取到输入流结束；累计读取超过max_size时抛出413异常。
+    """
+
+    __slots__ = ('_stream', 'remaining', 'max_size', 'consumed')
+
+    def __init__(self, stream, length: t.Optional[int], max_size: t.Optional[int] = None):
+        self._stream = stream
+        self.remaining = length
+        self.max_size = max_size
+        self.consumed = 0
+
+    def _consume(self, size: int):
+        self.consumed += size
+        if self.remaining is not None:
+            self.remaining = self.remaining - size if size else 0
+        if self.max_size is not None and self.consumed > self.max_size:
+            raise HTTPException(HTTPStatus.PAYLOAD_TOO_LARGE)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            return b''.join(self.iter_chunks())
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+        if size == 0:
+            return b''
+        data = self._stream.read(size)
+        self._consume(len(data))
+        return data
+
+    def readinto(self, buffer) -> int:
+        """读取数据到调用方提供的缓冲区，返回读取的字节数，避免额外的bytes对象分配"""
+        view = memoryview(buffer).cast('B')
+        size = len(view)
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+        if size == 0:
+            return 0
+        readinto = getattr(self._stream, 'readinto', None)
+        if readinto is not None:
+            read_size = readinto(view[:size]) or 0
+        else:
+            data = self._stream.read(size)
+            read_size = len(data)
+            view[:read_size] = data
+        self._consume(read_size)
+        return read_size
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> t.Iterator[bytes]:
+        while True:
+            data = self.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+    def __iter__(self):
+        return self.iter_chunks()
 
 
 class Request:
-    def __init__(self, environ):
+    """请求对象
+
+    请求头、请求体、查询参数以及JSON都在第一次访问时才解析，并缓存解析结果，
+    没有用到这些数据的接口不需要付出解析的开销。
+    """
+
+    __slots__ = ('environ', 'method', 'path', 'query_string', 'path_params', 'max_body_size', 'endpoint',
+                 '_headers', '_stream', '_data', '_body', '_query_params', '_json', '_state')
+
+    def __init__(self, environ, max_body_size: t.Optional[int] = None):
+        # max_body_size: 允许的最大请求体字节数，None表示不限制
         self.environ = environ
+        self.max_body_size = max_body_size
         self.method = environ.get('REQUEST_METHOD', 'GET')
         self.path = environ.get('PATH_INFO', '/')
         self.query_string = environ.get('QUERY_STRING', '')
-        self.headers = self._parse_headers(environ)
-        self.body = self._get_body(environ)
-        self._parse_query_params()
-        self.state: dict = {}
+        self.path_params: dict = {}
+        # 匹配到的路由，由Application在分发请求时设置
+        self.endpoint = None
+        self._headers = None
+        self._stream = None
+        self._data = None
+        self._body = None
+        self._query_params = None
+        self._json = _missing
+        self._state = None
+
+    @property
+    def headers(self) -> dict:
+        """请求头"""
+        if self._headers is None:
+            self._headers = self._parse_headers(self.environ)
+        return self._headers
+
+    @property
+    def content_length(self) -> t.Optional[int]:
+        """请求头中声明的请求体长度，未声明时为None"""
+        try:
+            return int(self.environ.get('CONTENT_LENGTH') or '')
+        except ValueError:
+            return None
+
+    @property
+    def stream(self) -> BodyStream:
+        """请求体输入流，适用于不希望一次性把请求体读入内存的场景"""
+        if self._stream is None:
+            length = self.content_length
+            if length is None and not self.environ.get('wsgi.input_terminated'):
+                length = 0
+            self._stream = BodyStream(self.environ['wsgi.input'], length, self.max_body_size)
+        return self._stream
+
+    @property
+    def data(self) -> bytes:
+        """原始请求体"""
+        if self._data is None:
+            if 'asgi.receive' in self.environ:
+                raise RuntimeError('当前路由在ASGI模式下以流的方式接收请求体,'
+                                   '请使用 await request.aread() 或者 request.aiter_body() 读取')
+            self._data = self.stream.read()
+        return self._data
+
+    def iter_body(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> t.Iterator[bytes]:
+        """分块读取请求体"""
+        if self._data is not None:
+            if self._data:
+                yield self._data
+            return
+        yield from self.stream.iter_chunks(chunk_size)
+
+    def readinto(self, buffer) -> int:
+        """读取请求体到调用方提供的缓冲区，返回读取的字节数，读取完毕时返回0"""
+        return self.stream.readinto(buffer)
+
+    def spool(self, max_memory_size: int = 1024 * 1024) -> t.IO[bytes]:
+        """将请求体写入临时文件，超过max_memory_size的部分写入磁盘，返回已经定位到开头的文件对象"""
+        file = tempfile.SpooledTemporaryFile(max_size=max_memory_size)
+        for chunk in self.iter_body():
+            file.write(chunk)
+        file.seek(0)
+        return file
+
+    async def aiter_body(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> t.AsyncIterator[bytes]:
+        """ASGI模式下异步分块读取请求体，其他情况下按iter_body读取"""
+        receive = self.environ.get('asgi.receive')
+        if receive is None or self._data is not None:
+            for chunk in self.iter_body(chunk_size):
+                yield chunk
+            return
+
+        # 请求体只能被读取一次
+        del self.environ['asgi.receive']
+        consumed = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunk = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            consumed += len(chunk)
+            if self.max_body_size is not None and consumed > self.max_body_size:
+                raise HTTPException(HTTPStatus.PAYLOAD_TOO_LARGE)
+            if chunk:
+                yield chunk
+
+    async def aread(self) -> bytes:
+        """ASGI模式下异步读取完整的请求体，读取后data、body、get_json可以正常使用"""
+        if self._data is None:
+            self._data = b''.join([chunk async for chunk in self.aiter_body()])
+        return self._data
+
+    @property
+    def body(self) -> str:
+        """UTF-8解码后的请求体，二进制数据请使用data"""
+        if self._body is None:
+            self._body = self.data.decode('utf-8')
+        return self._body
+
+    @property
+    def query_params(self) -> dict:
+        """查询参数 {参数名: 参数值列表}"""
+        if self._query_params is None:
+            self._query_params = parse_qs(self.query_string) if self.query_string else {}
+        return self._query_params
+
+    @property
+    def state(self) -> dict:
+        """供中间件以及接口函数在一次请求中传递数据"""
+        if self._state is None:
+            self._state = {}
+        return self._state
 
     @staticmethod
     def _parse_headers(environ):
@@ -20,21 +216,10 @@ class Request:
             if key.startswith('HTTP_'):
                 header_key = key[5:].replace('_', '-').title()
                 headers[header_key] = value
+            elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH') and value:
+                headers[key.replace('_', '-').title()] = value
         return headers
 
-    @staticmethod
-    def _get_body(environ):
-        """Read and return the request body."""
-        content_length = int(environ.get('CONTENT_LENGTH') or 0)
-        if content_length > 0:
-            return environ['wsgi.input'].read(content_length).decode('utf-8')
-        return ''
-
-    def _parse_query_params(self):
-        """Parse query parameters into a dictionary."""
-        import urllib.parse
-        self.query_params = urllib.parse.parse_qs(self.query_string)
-
     def get_header(self, name):
         """Get a header value by name."""
         return self.headers.get(name.title(), None)
@@ -45,12 +230,15 @@ class Request:
 
     def get_json(self):
         """Parse and return the request body as JSON, if applicable."""
-        if 'application/json' in self.get_header('Content-Type') or '':
-            try:
-                return json.loads(self.body)
-            except json.JSONDecodeError:
-                return None
-        return None
+        if self._json is _missing:
+            self._json = None
+            if 'application/json' in (self.environ.get('CONTENT_TYPE') or ''):
+                codec = get_json_codec()
+                try:
+                    self._json = codec.loads(self.data)
+                except codec.decode_error:
+                    pass
+        return self._json
 
     def __repr__(self):
         return f"<Request method={self.method} path={self.path}>"
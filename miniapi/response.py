@@ -1,61 +1,456 @@
-import json
+import io as _io
 import mimetypes
+import os
+import pathlib
 import typing as t
 
-from miniapi.status import HTTPStatus
+from miniapi.codec import get_json_codec
+from miniapi.headers import FrozenHeaders, Headers
+from miniapi.status import HTTPStatus, status_line
 
-try:
-    import orjson
-except ImportError:
-    orjson = None
+# 不能包含响应体的状态码
+_NO_BODY_STATUS_CODES = frozenset(('204', '304'))
+
+
+def _file_size(file) -> t.Optional[int]:
+    """文件对象从当前位置到结尾的字节数，无法确定时返回None"""
+    try:
+        position = file.tell()
+        try:
+            size = os.fstat(file.fileno()).st_size
+        except (AttributeError, OSError, _io.UnsupportedOperation):
+            size = file.seek(0, os.SEEK_END)
+            file.seek(position)
+    except (AttributeError, OSError, _io.UnsupportedOperation):
+        return None
+    return max(size - position, 0)
+
+
+class FileSlice:
+    """文件中从offset开始长度为length的一段，用于Range请求，支持sendfile"""
+
+    def __init__(self, file, offset: int, length: int):
+        self.file = file
+        self.offset = offset
+        self.length = length
+        self._remaining = length
+        file.seek(offset)
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self.file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _iter_file(file, chunk_size: int) -> t.Iterator[bytes]:
+    try:
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                return
+            yield data
+    finally:
+        file.close()
+
+
+def _iter_chunks(body: t.Iterable) -> t.Iterator[bytes]:
+    try:
+        for chunk in body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            elif not isinstance(chunk, bytes):
+                chunk = bytes(chunk)
+            if chunk:
+                yield chunk
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def iter_async(body: t.AsyncIterable) -> t.Iterator[bytes]:
+    """在WSGI模式下迭代异步响应体，为当前响应单独运行事件循环"""
+    import asyncio
+    loop = asyncio.new_event_loop()
+    iterator = body.__aiter__()
+    try:
+        while True:
+            try:
+                chunk = loop.run_until_complete(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield chunk
+    finally:
+        if hasattr(iterator, 'aclose'):
+            loop.run_until_complete(iterator.aclose())
+        loop.close()
+
+
+def _iter_json(items: t.Iterable, dumps: t.Callable[[t.Any], bytes], start: bytes, separator: bytes,
+               suffix: bytes, end: bytes, buffer_size: int) -> t.Iterator[bytes]:
+    """逐个编码items，累计到buffer_size字节时输出一次；第一个元素编码后立即输出，缩短首字节时间"""
+    buffer = bytearray(start)
+    first = True
+    try:
+        for item in items:
+            if not first:
+                buffer += separator
+            buffer += dumps(item)
+            buffer += suffix
+            if first or len(buffer) >= buffer_size:
+                yield bytes(buffer)
+                buffer.clear()
+            first = False
+        buffer += end
+        if buffer:
+            yield bytes(buffer)
+    finally:
+        if hasattr(items, 'close'):
+            items.close()
+
+
+async def _aiter_json(items: t.AsyncIterable, dumps: t.Callable[[t.Any], bytes], start: bytes, separator: bytes,
+                      suffix: bytes, end: bytes, buffer_size: int) -> t.AsyncIterator[bytes]:
+    """_iter_json的异步版本"""
+    buffer = bytearray(start)
+    first = True
+    async for item in items:
+        if not first:
+            buffer += separator
+        buffer += dumps(item)
+        buffer += suffix
+        if first or len(buffer) >= buffer_size:
+            yield bytes(buffer)
+            buffer.clear()
+        first = False
+    buffer += end
+    if buffer:
+        yield bytes(buffer)
+
+
+def parse_range(header: str, size: int) -> t.Optional[t.Tuple[int, int]]:
+    """解析单个字节范围的Range请求头，返回[start, end)；无法识别或包含多个范围时返回None，范围无法满足时抛出ValueError"""
+    unit, _, ranges = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in ranges:
+        return None
+    first, sep, last = ranges.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+        else:
+            start = size - int(last)
+            end = size
+    except ValueError:
+        return None
+    start = max(start, 0)
+    end = min(end, size)
+    if start >= end:
+        raise ValueError(header)
+    return start, end
 
 
 class Response:
+    """响应
+
+    status可以是状态行(HTTPStatus中的常量)或者状态码；headers可以是Headers、(名称, 值)列表或者字典，
+    同名响应头只保留一个，headers中已经包含Content-Type时不再使用content_type。
+    """
+
+    __slots__ = ('body', 'status', '_headers')
+
+    # 流式发送文件以及迭代器响应体时每次读取的字节数
+    chunk_size = 64 * 1024
+
     def __init__(self, body: t.Any = None, status=HTTPStatus.OK, headers=None, content_type='text/html'):
         self.body = body
-        self.status = status
-        self.headers = headers if headers is not None else []
-        self.content_type = content_type
-        self.headers.append(('Content-Type', self.content_type))
+        self.status = status_line(status)
+        if headers is None:
+            self._headers = Headers.single('Content-Type', content_type)
+        else:
+            if type(headers) is not Headers:
+                headers = Headers(headers)
+            if content_type is not None:
+                headers.setdefault('Content-Type', content_type)
+            self._headers = headers
+
+    @property
+    def headers(self) -> Headers:
+        return self._headers
+
+    @headers.setter
+    def headers(self, headers):
+        self._headers = headers if type(headers) is Headers else Headers(headers)
+
+    @property
+    def content_type(self) -> t.Optional[str]:
+        return self._headers.get('Content-Type')
+
+    @content_type.setter
+    def content_type(self, content_type: str):
+        self._headers.set('Content-Type', content_type)
+
+    @property
+    def status_code(self) -> int:
+        return int(self.status[:3])
 
     def set_body(self, body):
         self.body = body
 
     def set_status(self, status):
-        self.status = status
+        self.status = status_line(status)
 
     def add_header(self, key, value):
-        self.headers.append((key, value))
+        self._headers.add(key, value)
 
     def get_response(self):
-        return {'status': self.status, 'headers': self.headers, 'body': self.body}
+        return {'status': self.status, 'headers': self._headers.to_list(), 'body': self.body}
+
+    def get_header(self, key, default=None):
+        return self._headers.get(key, default)
+
+    def set_default_header(self, key, value):
+        self._headers.setdefault(key, value)
+
+    def asgi_headers(self) -> t.List[t.Tuple[bytes, bytes]]:
+        """ASGI http.response.start需要的响应头"""
+        return [(k.lower().encode('latin-1'), str(v).encode('latin-1')) for k, v in self._headers]
+
+    def copy(self) -> 'Response':
+        """复制为普通的可修改响应，响应体不复制"""
+        response = Response.__new__(Response)
+        response.body = self.body
+        response.status = self.status
+        response._headers = self._headers.copy()
+        return response
+
+    def prepare(self, environ: dict) -> t.Iterable[bytes]:
+        """发送响应前调用，补充Content-Length并返回响应体的可迭代对象
+
+        响应体可以是str、bytes、文件对象、文件路径(os.PathLike)、迭代器/生成器或者异步迭代器，
+        文件以及迭代器会分块发送，不会一次性读入内存；异步迭代器原样返回，由调用方决定如何迭代。
+        """
+        body = self.body
+        if body is None:
+            body = b''
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+        elif isinstance(body, os.PathLike):
+            body = open(body, 'rb')
+
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            body = bytes(body)
+            # 204、304响应没有响应体，不添加Content-Length
+            if self.status[:3] not in _NO_BODY_STATUS_CODES:
+                self.set_default_header('Content-Length', str(len(body)))
+            return [body]
+        if hasattr(body, 'read'):
+            return self._prepare_file(environ, body)
+        if hasattr(body, '__aiter__'):
+            return body
+        return _iter_chunks(body)
+
+    def _prepare_file(self, environ: dict, file) -> t.Iterable[bytes]:
+        size = file.length if isinstance(file, FileSlice) else _file_size(file)
+        if size is not None:
+            self.set_default_header('Content-Length', str(size))
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(file, self.chunk_size)
+        return _iter_file(file, self.chunk_size)
 
 
 class FileStreamResponse(Response):
-    def __init__(self, io: bytes, filename: str, status=HTTPStatus.OK, headers=None):
-        headers = headers if headers is not None else []
+    """文件下载响应
+
+    io可以是bytes、文件对象或者文件路径，文件对象以及文件路径会流式发送，并且支持Range断点续传。
+    """
+
+    __slots__ = ()
+
+    def __init__(
+            self,
+            io: t.Union[bytes, t.IO[bytes], str, os.PathLike],
+            filename: t.Optional[str] = None,
+            status=HTTPStatus.OK,
+            headers=None):
+        if isinstance(io, str):
+            io = pathlib.Path(io)
+        if filename is None:
+            if not isinstance(io, os.PathLike):
+                raise ValueError('非文件路径的FileStreamResponse必须指定filename')
+            filename = os.path.basename(os.fspath(io))
+
+        headers = Headers(headers)
         filetype, _ = mimetypes.guess_type(filename)
         filetype = filetype or 'application/octet-stream'
-        headers.append(('Content-Type', filetype))
-        headers.append(('Content-Disposition', f'attachment; filename="{filename}"'))
+        headers.set('Content-Disposition', f'attachment; filename="{filename}"')
+        headers.set('Accept-Ranges', 'bytes')
         super().__init__(body=io, status=status, headers=headers, content_type=filetype)
 
+    def prepare(self, environ: dict) -> t.Iterable[bytes]:
+        range_header = environ.get('HTTP_RANGE')
+        if not range_header or not self.status.startswith('200'):
+            return super().prepare(environ)
+
+        body = self.body
+        if isinstance(body, os.PathLike):
+            body = open(body, 'rb')
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            size = len(body)
+        else:
+            size = _file_size(body)
+            if size is None:
+                self.body = body
+                return super().prepare(environ)
+            offset = body.tell()
+
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            if hasattr(body, 'close'):
+                body.close()
+            self.status = HTTPStatus.RANGE_NOT_SATISFIABLE
+            self.body = b''
+            self._headers.set('Content-Range', f'bytes */{size}')
+            return super().prepare(environ)
+
+        if byte_range is None:
+            self.body = body
+            return super().prepare(environ)
+
+        start, end = byte_range
+        self.status = HTTPStatus.PARTIAL_CONTENT
+        self._headers.set('Content-Range', f'bytes {start}-{end - 1}/{size}')
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            self.body = body[start:end]
+        else:
+            self.body = FileSlice(body, offset + start, end - start)
+        return super().prepare(environ)
+
 
 class JsonResponse(Response):
+    """使用当前配置的JSON后端序列化的响应，json_kwargs传给后端的dumps，可用的参数见JsonCodec"""
+
+    __slots__ = ()
+
     def __init__(self, data, status=HTTPStatus.OK, headers=None, **json_kwargs):
-        body = json.dumps(data, **json_kwargs)
-        content_type = 'application/json'
-        headers = headers if headers is not None else []
-        headers.append(('Content-Type', content_type))
-        super().__init__(body=body, status=status, headers=headers, content_type=content_type)
+        body = get_json_codec().dumps(data, **json_kwargs)
+        super().__init__(body=body, status=status, headers=headers, content_type='application/json')
 
 
 class OrJsonResponse(Response):
+    __slots__ = ()
+
     def __init__(self, data, status=HTTPStatus.OK, headers=None, **orjson_kwargs):
-        if orjson is None:
-            raise ImportError('orjson未安装，请安装它以使用OrJsonResponse.')
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError('orjson未安装，请安装它以使用OrJsonResponse.') from None
         body = orjson.dumps(data, **orjson_kwargs)
-        content_type = 'application/json'
-        headers = headers if headers is not None else []
-        headers.append(('Content-Type', content_type))
-        super().__init__(body=body, status=status, headers=headers, content_type=content_type)
+        super().__init__(body=body, status=status, headers=headers, content_type='application/json')
+
+
+class StreamingJsonResponse(Response):
+    """流式输出JSON数组的响应
+
+    items可以是任意可迭代对象(例如数据库游标、生成器、DataObjects.o_stream的流水线)或者异步迭代器，
+    逐个元素编码，累计到chunk_size字节时输出一次，不需要在内存中保存完整的列表以及编码结果。
+    响应没有Content-Length，HTTP/1.1下使用分块传输编码发送。
+    """
+
+    __slots__ = ()
+
+    # 数组的开始、元素分隔符、元素后缀、结束
+    _framing = (b'[', b',', b'', b']')
+    media_type = 'application/json'
+
+    def __init__(
+            self,
+            items: t.Union[t.Iterable, t.AsyncIterable],
+            status=HTTPStatus.OK,
+            headers=None,
+            chunk_size: t.Optional[int] = None,
+            **json_kwargs):
+        dumps = get_json_codec().encoder(**json_kwargs)
+        buffer_size = chunk_size or self.chunk_size
+        if hasattr(items, '__aiter__'):
+            body = _aiter_json(items, dumps, *self._framing, buffer_size)
+        else:
+            body = _iter_json(items, dumps, *self._framing, buffer_size)
+        super().__init__(body=body, status=status, headers=headers, content_type=self.media_type)
+
+
+class NDJSONResponse(StreamingJsonResponse):
+    """流式输出NDJSON(每行一个JSON)的响应，适合客户端边接收边处理的场景"""
+
+    __slots__ = ()
+
+    _framing = (b'', b'', b'\n', b'')
+    media_type = 'application/x-ndjson'
+
+
+class FrozenResponse(Response):
+    """预先创建的不可修改响应，可以在多个请求之间共享
+
+    状态行、响应头列表以及ASGI响应头在创建时计算好，发送时不再做任何处理；需要修改时先调用copy()。
+    """
+
+    __slots__ = ('_asgi_headers',)
+
+    def __init__(self, body: bytes = b'', status=HTTPStatus.OK, headers=None, content_type='text/html'):
+        response = Response(bytes(body), status, headers, content_type)
+        response.set_default_header('Content-Length', str(len(response.body)))
+        setattr_ = object.__setattr__
+        setattr_(self, 'body', response.body)
+        setattr_(self, 'status', response.status)
+        setattr_(self, '_headers', FrozenHeaders(response.headers))
+        setattr_(self, '_asgi_headers', response.asgi_headers())
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__}不可修改,请先调用copy()')
+
+    def asgi_headers(self) -> t.List[t.Tuple[bytes, bytes]]:
+        return self._asgi_headers
+
+    def prepare(self, environ: dict) -> t.Iterable[bytes]:
+        return [self.body]
+
+
+# 常见错误的共享响应 {状态行: FrozenResponse}
+ERROR_RESPONSES: t.Dict[str, FrozenResponse] = {
+    status: FrozenResponse(b'', status) for status in (
+        HTTPStatus.NOT_FOUND,
+        HTTPStatus.METHOD_NOT_ALLOWED,
+        HTTPStatus.PAYLOAD_TOO_LARGE,
+        HTTPStatus.TOO_MANY_REQUESTS,
+        HTTPStatus.INTERNAL_SERVER_ERROR,
+    )
+}
+
+
+def error_response(status, shared: bool = False) -> Response:
+    """响应体为空的错误响应
+
+    常见错误复制预先创建的响应，不需要重新构建响应头；shared为True时直接返回共享的FrozenResponse，
+    只能在之后不会再被修改(例如不再执行请求后的中间件)时使用。
+    """
+    status = status_line(status)
+    prebuilt = ERROR_RESPONSES.get(status)
+    if prebuilt is None:
+        return Response('', status)
+    return prebuilt if shared else prebuilt.copy()
@@ -1,51 +1,333 @@
 import inspect
 import typing as t
 
+from miniapi.exc import HTTPException
+from miniapi.status import HTTPStatus
+
+
+def _convert_str(value: str) -> str:
+    if not value:
+        raise ValueError(value)
+    return value
+
+
+def _convert_int(value: str) -> int:
+    if not value.isascii() or not value.isdigit():
+        raise ValueError(value)
+    return int(value)
+
+
+def _convert_float(value: str) -> float:
+    if not value or not value.isascii():
+        raise ValueError(value)
+    return float(value)
+
+
+# 路径参数转换器 {转换器名称: 转换函数}，转换失败时抛出ValueError表示不匹配
+# path转换器会匹配剩余的全部路径（包含'/'），只能出现在规则的最后一段
+CONVERTERS: t.Dict[str, t.Callable[[str], t.Any]] = {
+    'str': _convert_str,
+    'int': _convert_int,
+    'float': _convert_float,
+}
+PATH_CONVERTER = 'path'
+
+# 同一位置存在多个参数节点时的匹配优先级，越小越优先
+_CONVERTER_PRIORITY = {'int': 0, 'float': 1, 'str': 2}
+
+
+class Endpoint:
+    """路由中某个请求方式对应的执行函数，以及预先编译好的中间件链"""
+
+    __slots__ = ('handler', 'middlewares', 'forbidden', 'before_middlewares', 'after_middlewares',
+                 'short_circuit_middlewares', 'teardown_middlewares', 'handler_is_async', 'is_async', 'offload',
+                 'stream_body', 'rule', 'method', 'metrics')
+
+    def __init__(
+            self,
+            handler: t.Callable,
+            middlewares: t.Sequence = (),
+            forbidden: t.Iterable[str] = (),
+            offload: bool = True,
+            stream_body: bool = False,
+            rule: t.Optional[str] = None,
+            method: t.Optional[str] = None):
+        # middlewares: 局部中间件对象
+        # forbidden: 禁用的全局中间件名称
+        # offload: ASGI模式下同步执行函数是否放到线程池中执行
+        # stream_body: ASGI模式下是否不预先读取请求体，由接口函数通过request.aiter_body()流式读取
+        # rule、method: 所属的路由规则以及请求方式，用于按路由统计指标
+        self.handler = handler
+        self.middlewares = tuple(middlewares)
+        self.forbidden = frozenset(forbidden)
+        self.offload = offload
+        self.stream_body = stream_body
+        self.rule = rule
+        self.method = method
+        # 启用指标统计后由Metrics设置的路由指标
+        self.metrics = None
+
+        # before_middlewares: 请求前依次执行的中间件
+        # after_middlewares: 请求后依次执行的中间件
+        self.before_middlewares: tuple = ()
+        self.after_middlewares: tuple = ()
+        # short_circuit_middlewares[i]: 第i个请求前中间件返回Response时，需要执行请求后处理的中间件(只包含已经执行过的)
+        self.short_circuit_middlewares: tuple = ()
+        # teardown_middlewares: 请求结束时执行teardown_request的中间件，大多数路由为空
+        self.teardown_middlewares: tuple = ()
+
+        # handler_is_async: 执行函数是否为协程函数
+        # is_async: 执行函数或者中间件链中是否存在协程函数
+        self.handler_is_async = inspect.iscoroutinefunction(handler)
+        self.is_async = self.handler_is_async
+
+    def compile(self, global_middlewares: dict):
+        """编译中间件链: 全局中间件(排除禁用的) + 局部中间件"""
+        _globals = tuple(m for name, m in global_middlewares.items() if name not in self.forbidden)
+        self.before_middlewares = _globals + self.middlewares
+        self.after_middlewares = tuple(reversed(self.middlewares)) + _globals
+
+        # after_middlewares中每个中间件在before_middlewares中的位置
+        positions = [len(_globals) + i for i in reversed(range(len(self.middlewares)))] + list(range(len(_globals)))
+        self.short_circuit_middlewares = tuple(
+            tuple(m for m, position in zip(self.after_middlewares, positions) if position <= index)
+            for index in range(len(self.before_middlewares))
+        )
+        self.teardown_middlewares = tuple(m for m in self.after_middlewares if m.has_teardown())
+        self.is_async = self.handler_is_async or any(m.is_async() for m in self.before_middlewares)
+
+
+class Route:
+    """已注册的路由规则"""
+
+    __slots__ = ('rule', 'endpoints', 'param_names')
+
+    def __init__(self, rule: str, param_names: t.Tuple[str, ...] = ()):
+        self.rule = rule
+        self.endpoints: t.Dict[str, Endpoint] = {}
+        self.param_names = param_names
+
+    def __repr__(self):
+        return f'<Route {self.rule} {list(self.endpoints)}>'
+
+
+def _raise_not_found(request):
+    raise HTTPException(HTTPStatus.NOT_FOUND)
+
+
+def _raise_method_not_allowed(request):
+    raise HTTPException(HTTPStatus.METHOD_NOT_ALLOWED)
+
+
+def _raise_payload_too_large(request):
+    raise HTTPException(HTTPStatus.PAYLOAD_TOO_LARGE)
+
+
+class _Node:
+    """路由前缀树节点，每个节点对应路径中的一段"""
+
+    __slots__ = ('static', 'params', 'catch_all', 'route')
+
+    def __init__(self):
+        self.static: t.Dict[str, '_Node'] = {}
+        self.params: t.List[t.Tuple[str, str, t.Callable, '_Node']] = []
+        self.catch_all: t.Optional[t.Tuple[str, Route]] = None
+        self.route: t.Optional[Route] = None
+
+    def param_child(self, rule: str, name: str, converter: str) -> '_Node':
+        """同一位置、同一转换器的参数节点只有一个，参数名必须一致，否则先注册的节点总是优先匹配"""
+        for p_name, p_converter, _, node in self.params:
+            if p_converter == converter:
+                if p_name != name:
+                    raise AssertionError(f'路由规则冲突:{rule},路径参数{{{name}}}与已注册的{{{p_name}}}位于同一位置')
+                return node
+        node = _Node()
+        self.params.append((name, converter, CONVERTERS[converter], node))
+        self.params.sort(key=lambda item: _CONVERTER_PRIORITY.get(item[1], len(_CONVERTER_PRIORITY)))
+        return node
+
+
+def _parse_segment(rule: str, segment: str) -> t.Tuple[t.Optional[str], t.Optional[str]]:
+    """解析规则中的一段，返回(参数名, 转换器名)，静态段返回(None, None)"""
+    if not (segment.startswith('{') and segment.endswith('}')):
+        if '{' in segment or '}' in segment:
+            raise AssertionError(f'路由规则错误:{rule},路径参数必须独占一段,例如 /users/{{id:int}}')
+        return None, None
+    name, _, converter = segment[1:-1].partition(':')
+    converter = converter or 'str'
+    if not name.isidentifier():
+        raise AssertionError(f'路由规则错误:{rule},非法的路径参数名:{name}')
+    if converter != PATH_CONVERTER and converter not in CONVERTERS:
+        raise AssertionError(f'路由规则错误:{rule},不支持的路径参数类型:{converter},'
+                             f'请在{[*CONVERTERS, PATH_CONVERTER]}中选择.')
+    return name, converter
+
+
+def rule_params(rule: str) -> t.Dict[str, str]:
+    """路由规则中的路径参数 {参数名: 转换器名}"""
+    params = {}
+    for segment in rule.split('/'):
+        name, converter = _parse_segment(rule, segment)
+        if name is not None:
+            params[name] = converter
+    return params
+
 
 class HandlerMapper:
+    """路由映射表
+
+    不包含路径参数的静态路由直接保存在字典中，查找为O(1)；
+    包含路径参数的路由按'/'分段保存在前缀树中，查找开销只与请求路径的段数有关，与注册的路由数量无关。
+    """
 
     def __init__(self):
-        self.__mapper: dict = {}
-        self.endpoint_mapper: dict = {}
+        # static_routes: 静态路由映射表 {路由规则: Route}
+        # routes: 所有路由 {路由规则: Route}
+        self.static_routes: t.Dict[str, Route] = {}
+        self.routes: t.Dict[str, Route] = {}
+        self._root = _Node()
+
+        # 全局中间件映射表 {中间件名称: 中间件对象}，用于编译每个Endpoint的中间件链
+        self._global_middlewares: dict = {}
+
+        # 未匹配到路由、请求方式不被允许以及请求体过大时使用的Endpoint，只执行全局中间件
+        self.not_found = Endpoint(_raise_not_found, offload=False, rule='<not_found>')
+        self.method_not_allowed = Endpoint(_raise_method_not_allowed, offload=False, rule='<method_not_allowed>')
+        self.payload_too_large = Endpoint(_raise_payload_too_large, offload=False, rule='<payload_too_large>')
+
+    def match(self, path: str) -> t.Tuple[t.Optional[Route], dict]:
+        """根据请求路径查找路由，返回(路由, 路径参数)，未找到时路由为None"""
+        route = self.static_routes.get(path)
+        if route is not None:
+            return route, {}
+        params = {}
+        route = self._match(self._root, path.split('/'), 0, params)
+        return route, params
+
+    def _match(self, node: _Node, segments: t.List[str], index: int, params: dict) -> t.Optional[Route]:
+        if index == len(segments):
+            return node.route
+
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            route = self._match(child, segments, index + 1, params)
+            if route is not None:
+                return route
 
-    def get_method_handlers(self, path):
-        endpoint = self.endpoint_mapper.get(path)
-        if not endpoint:
+        for name, _, convert, child in node.params:
+            try:
+                value = convert(segment)
+            except ValueError:
+                continue
+            route = self._match(child, segments, index + 1, params)
+            if route is not None:
+                params[name] = value
+                return route
+
+        if node.catch_all is not None and segment:
+            name, route = node.catch_all
+            params[name] = '/'.join(segments[index:])
+            return route
+        return None
+
+    def resolve(self, method: str, path: str) -> t.Tuple[Endpoint, dict]:
+        """根据请求方式和请求路径查找Endpoint，返回(Endpoint, 路径参数)
+
+        未匹配到路由或者请求方式不被允许时，返回执行时会抛出404/405异常的Endpoint
+        """
+        route, params = self.match(path)
+        if route is None:
+            return self.not_found, params
+        endpoint = route.endpoints.get(method)
+        if endpoint is None:
+            return self.method_not_allowed, params
+        return endpoint, params
+
+    def get_method_handlers(self, path) -> t.Optional[t.Dict[str, t.Callable]]:
+        route, _ = self.match(path)
+        if route is None:
             return None
-        method_handlers = self.__mapper[endpoint]
-        return method_handlers
+        return {method: endpoint.handler for method, endpoint in route.endpoints.items()}
+
+    def endpoints(self) -> t.Iterator[Endpoint]:
+        """所有Endpoint，包括404/405/413使用的Endpoint"""
+        yield self.not_found
+        yield self.method_not_allowed
+        yield self.payload_too_large
+        for route in self.routes.values():
+            yield from route.endpoints.values()
+
+    def compile(self, global_middlewares: dict):
+        """全局中间件发生变化时，重新编译所有Endpoint的中间件链"""
+        self._global_middlewares = global_middlewares
+        for endpoint in self.endpoints():
+            endpoint.compile(global_middlewares)
+
+    def _get_or_create_route(self, path: str) -> Route:
+        route = self.routes.get(path)
+        if route is not None:
+            return route
+
+        segments = path.split('/')
+        parsed = [_parse_segment(path, segment) for segment in segments]
+        param_names = tuple(name for name, _ in parsed if name is not None)
+        if len(set(param_names)) != len(param_names):
+            raise AssertionError(f'路由规则错误:{path},路径参数名重复')
 
-    def _get_handler_name(self, handler):
-        if inspect.isfunction(handler):
-            endpoint = handler.__name__
+        route = Route(path, param_names)
+        if not param_names:
+            self.static_routes[path] = route
+            self.routes[path] = route
+            return route
+
+        node = self._root
+        for i, (segment, (name, converter)) in enumerate(zip(segments, parsed)):
+            if name is None:
+                node = node.static.setdefault(segment, _Node())
+            elif converter == PATH_CONVERTER:
+                if i != len(segments) - 1:
+                    raise AssertionError(f'路由规则错误:{path},path类型的路径参数只能位于最后一段')
+                if node.catch_all is not None:
+                    raise AssertionError(f'路由规则冲突:{path}与{node.catch_all[1].rule}')
+                node.catch_all = (name, route)
+                break
+            else:
+                node = node.param_child(path, name, converter)
         else:
-            endpoint = self._get_handler_name(handler.handler)
-        return endpoint
+            if node.route is not None:
+                raise AssertionError(f'路由规则冲突:{path}与{node.route.rule}')
+            node.route = route
+
+        self.routes[path] = route
+        return route
 
-    def add(self, path, method, handler):
-        endpoint = self._get_handler_name(handler)
-        path_exist, method_exist = self.exists(endpoint, method)
+    def add(
+            self,
+            path,
+            method,
+            handler,
+            middlewares: t.Sequence = (),
+            forbidden: t.Iterable[str] = (),
+            stream_body: bool = False) -> Endpoint:
+        path_exist, method_exist = self.exists(path, method)
         if path_exist and method_exist:
             raise AssertionError(f"{method} {path} 已经注册过了")
-        self.endpoint_mapper[path] = endpoint
-        self.__mapper[endpoint] = dict()
-        self.__mapper[endpoint][method] = handler
+        route = self._get_or_create_route(path)
+        endpoint = Endpoint(handler, middlewares, forbidden, stream_body=stream_body, rule=path, method=method)
+        endpoint.compile(self._global_middlewares)
+        route.endpoints[method] = endpoint
+        return endpoint
 
     def exists(self, path, method) -> t.Tuple[bool, bool]:
-        if path in self.endpoint_mapper:
-            path_exist = True
-            if method in self.__mapper[self.endpoint_mapper[path]]:
-                method_exist = True
-            else:
-                method_exist = False
-        else:
-            path_exist = False
-            method_exist = False
-        return path_exist, method_exist
+        route = self.routes.get(path)
+        if route is None:
+            return False, False
+        return True, method in route.endpoints
 
     def print_mapper(self):
         """展示注册过的请求的地址以及请求方式"""
-        for path, method_handlers in self.__mapper.items():
+        for path, route in self.routes.items():
             print(f'| {path}')
-            for method, handler in method_handlers.items():
-                print(f'|: {method} {handler.__name__}')
+            for method, endpoint in route.endpoints.items():
+                print(f'|: {method} {endpoint.handler.__name__}')
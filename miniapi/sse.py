@@ -0,0 +1,370 @@
+"""服务器推送事件(Server-Sent Events)
+
+EventStreamResponse把事件源(异步迭代器或者迭代器)转换为text/event-stream响应：
+    - 事件源在heartbeat秒内没有新事件时发送注释行作为心跳，避免代理以及客户端因空闲断开连接
+    - 事件源积压了多个事件时合并为一次写入，发送由send/socket写入的速度决定，客户端读取慢时不会在内存中堆积
+    - ASGI模式下客户端断开后立即结束事件源，WSGI模式下在下一次写入(事件或心跳)失败时结束
+
+Broadcaster把一个生产者发布的事件分发给多个订阅者，每个订阅者只是一个有界队列以及一个等待中的Future，
+不需要为每个订阅者创建线程或者任务；保留最近的事件，客户端带着Last-Event-ID重连时补发错过的事件:
+
+    hub = Broadcaster(history=100)
+
+    @app.get('/events')
+    async def events(request):
+        return EventStreamResponse(hub.subscribe(request.get_header('Last-Event-ID')))
+
+    hub.publish({'progress': 42}, event='progress')
+"""
+import asyncio
+import collections
+import threading
+import typing as t
+
+from miniapi.codec import get_json_codec
+from miniapi.headers import Headers
+from miniapi.response import Response
+from miniapi.status import HTTPStatus
+
+# 心跳使用的注释行，客户端会忽略
+HEARTBEAT = b':\n\n'
+
+
+class ServerSentEvent:
+    """一个事件，编码结果会被缓存，广播给多个订阅者时只编码一次"""
+
+    __slots__ = ('data', 'event', 'id', 'retry', '_encoded')
+
+    def __init__(self, data: t.Any = '', event: t.Optional[str] = None, id: t.Optional[str] = None,  # noqa
+                 retry: t.Optional[int] = None):
+        # data: str原样发送，bytes按utf-8解码，其他类型使用当前配置的JSON后端序列化
+        # retry: 客户端断开后的重连间隔(毫秒)
+        self.data = data
+        self.event = event
+        self.id = None if id is None else str(id)
+        self.retry = retry
+        self._encoded: t.Optional[bytes] = None
+
+    def encode(self) -> bytes:
+        if self._encoded is None:
+            self._encoded = encode_event(self.data, self.event, self.id, self.retry)
+        return self._encoded
+
+    def __repr__(self):
+        return f'<ServerSentEvent id={self.id!r} event={self.event!r}>'
+
+
+def encode_event(data: t.Any = '', event: t.Optional[str] = None, id: t.Optional[str] = None,  # noqa
+                 retry: t.Optional[int] = None) -> bytes:
+    """按text/event-stream格式编码一个事件，多行数据拆分为多个data字段"""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    elif not isinstance(data, str):
+        data = get_json_codec().dumps(data).decode('utf-8')
+    lines = []
+    if id is not None:
+        lines.append(f'id: {_single_line(id)}')
+    if event is not None:
+        lines.append(f'event: {_single_line(event)}')
+    if retry is not None:
+        lines.append(f'retry: {int(retry)}')
+    lines.extend(f'data: {line}' for line in data.splitlines() or ('',))
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def _single_line(value: str) -> str:
+    if '\n' in value or '\r' in value:
+        raise ValueError(f'事件的id以及event不能包含换行符,当前值为{value!r}')
+    return value
+
+
+def _to_bytes(item: t.Any) -> bytes:
+    if isinstance(item, ServerSentEvent):
+        return item.encode()
+    return encode_event(item)
+
+
+async def _wait_disconnect(receive: t.Callable):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+class EventStreamResponse(Response):
+    """text/event-stream流式响应
+
+    source可以是异步迭代器(推荐，例如Broadcaster.subscribe的返回值)或者迭代器，元素可以是ServerSentEvent，
+    或者作为data字段的str、bytes、dict等；迭代器只能在产生下一个元素时发送心跳，可以产生None表示暂时没有事件。
+    """
+
+    __slots__ = ('source', 'heartbeat', 'retry')
+
+    def __init__(
+            self,
+            source: t.Union[t.AsyncIterable, t.Iterable],
+            status=HTTPStatus.OK,
+            headers=None,
+            heartbeat: t.Optional[float] = 15.0,
+            retry: t.Optional[int] = None):
+        # heartbeat: 没有新事件时发送心跳的间隔(秒)，None表示不发送
+        # retry: 通知客户端断开后的重连间隔(毫秒)
+        if heartbeat is not None and heartbeat <= 0:
+            raise ValueError(f'心跳间隔必须大于0,当前值为{heartbeat}')
+        self.source = source
+        self.heartbeat = heartbeat
+        self.retry = retry
+        headers = Headers(headers)
+        headers.set('Cache-Control', 'no-cache')
+        # 禁止nginx缓冲响应
+        headers.set('X-Accel-Buffering', 'no')
+        super().__init__(body=None, status=status, headers=headers, content_type='text/event-stream; charset=utf-8')
+
+    def prepare(self, environ: dict) -> t.Union[t.Iterable[bytes], t.AsyncIterable[bytes]]:
+        if hasattr(self.source, '__aiter__'):
+            self.body = self._aiter_events(environ.get('miniapi.receive'))
+        else:
+            self.body = self._iter_events()
+        return self.body
+
+    def _preamble(self) -> bytearray:
+        # 先发送一次数据，使客户端以及中间代理立即收到响应头
+        return bytearray(b'retry: %d\n\n' % self.retry if self.retry is not None else HEARTBEAT)
+
+    def _iter_events(self) -> t.Iterator[bytes]:
+        yield bytes(self._preamble())
+        source = self.source
+        try:
+            for item in source:
+                yield HEARTBEAT if item is None else _to_bytes(item)
+        finally:
+            if hasattr(source, 'close'):
+                source.close()
+
+    async def _aiter_events(self, receive: t.Optional[t.Callable]) -> t.AsyncIterator[bytes]:
+        buffer = self._preamble()
+        iterator = self.source.__aiter__()
+        disconnect = asyncio.ensure_future(_wait_disconnect(receive)) if receive is not None else None
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    # Subscription.__anext__返回Future，ensure_future不会额外创建任务
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                if not pending.done():
+                    # 没有积压的事件，先把已编码的事件写出，再等待下一个事件
+                    if buffer:
+                        yield bytes(buffer)
+                        buffer.clear()
+                    waits = (pending,) if disconnect is None else (pending, disconnect)
+                    await asyncio.wait(waits, timeout=self.heartbeat, return_when=asyncio.FIRST_COMPLETED)
+                    if disconnect is not None and disconnect.done():
+                        return
+                    if not pending.done():
+                        yield HEARTBEAT
+                        continue
+                try:
+                    item = pending.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    pending = None
+                buffer += HEARTBEAT if item is None else _to_bytes(item)
+                if len(buffer) >= self.chunk_size:
+                    yield bytes(buffer)
+                    buffer.clear()
+            if buffer:
+                yield bytes(buffer)
+        finally:
+            if pending is not None:
+                pending.cancel()
+            if disconnect is not None:
+                disconnect.cancel()
+            if hasattr(iterator, 'aclose'):
+                await iterator.aclose()
+
+
+class Subscription:
+    """Broadcaster的一个订阅者，异步迭代得到事件，结束迭代或者调用aclose时取消订阅
+
+    订阅时不需要事件循环，第一次迭代时绑定到当前的事件循环，之前发布的事件保存在队列中。
+    队列满时按照Broadcaster.overflow处理：drop_oldest丢弃最早的事件，close断开这个订阅者。
+    """
+
+    __slots__ = ('_hub', '_loop', '_queue', '_waiter', '_closed', 'dropped')
+
+    def __init__(self, hub: 'Broadcaster'):
+        self._hub = hub
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+        self._queue: t.Deque[ServerSentEvent] = collections.deque()
+        self._waiter: t.Optional[asyncio.Future] = None
+        self._closed = False
+        # 因为队列满而丢弃的事件数
+        self.dropped = 0
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self) -> asyncio.Future:
+        if self._loop is None:
+            self._hub._bind(self, asyncio.get_running_loop())  # noqa
+        future = self._loop.create_future()
+        if self._queue:
+            future.set_result(self._queue.popleft())
+        elif self._closed:
+            future.set_exception(StopAsyncIteration())
+        else:
+            self._waiter = future
+        return future
+
+    def _put(self, event: ServerSentEvent):
+        """绑定事件循环之前在Broadcaster的锁中调用，之后只在绑定的事件循环中调用"""
+        if self._closed:
+            return
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            if not waiter.done():
+                waiter.set_result(event)
+                return
+        queue = self._queue
+        if len(queue) >= self._hub.max_queue:
+            self.dropped += 1
+            if self._hub.overflow == 'close':
+                self._close()
+                return
+            queue.popleft()
+        queue.append(event)
+
+    def _close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.clear()
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            self._waiter = None
+            waiter.set_exception(StopAsyncIteration())
+
+    async def aclose(self):
+        self._hub.unsubscribe(self)
+
+
+class Broadcaster:
+    """一对多的事件分发
+
+    publish可以在任意线程以及事件循环中调用：与发布者在同一个事件循环中的订阅者直接放入队列，
+    其他事件循环(例如WSGI模式下每个连接单独运行的事件循环)中的订阅者通过call_soon_threadsafe放入队列。
+    """
+
+    def __init__(self, history: int = 0, max_queue: int = 100, overflow: str = 'drop_oldest'):
+        # history: 保留最近的事件数，用于Last-Event-ID补发；0表示不保留
+        # max_queue: 每个订阅者最多积压的事件数
+        # overflow: 订阅者积压的事件超过max_queue时，drop_oldest丢弃最早的事件，close断开这个订阅者
+        if max_queue <= 0:
+            raise ValueError(f'订阅者队列大小必须大于0,当前值为{max_queue}')
+        if overflow not in ('drop_oldest', 'close'):
+            raise ValueError(f'不支持的overflow:{overflow},请在{["drop_oldest", "close"]}中选择.')
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.history: t.Deque[ServerSentEvent] = collections.deque(maxlen=history)
+        # {事件循环: 订阅者集合}，还没有绑定事件循环的订阅者保存在None中
+        self._subscribers: t.Dict[t.Optional[asyncio.AbstractEventLoop], t.Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def __len__(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(self, last_event_id: t.Optional[str] = None) -> Subscription:
+        """订阅，last_event_id不为None时先补发保留的事件中在它之后的事件
+
+        last_event_id不在保留的事件中(例如已经过期或者来自重启之前)时补发所有保留的事件。
+        """
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscribers.setdefault(None, set()).add(subscription)
+            if last_event_id is not None and self.history:
+                replay = list(self.history)
+                for index, event in enumerate(replay):
+                    if event.id == last_event_id:
+                        replay = replay[index + 1:]
+                        break
+                for event in replay:
+                    subscription._put(event)  # noqa
+        return subscription
+
+    def _bind(self, subscription: Subscription, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            unbound = self._subscribers.get(None)
+            if unbound is not None and subscription in unbound:
+                self._remove(None, subscription)
+                self._subscribers.setdefault(loop, set()).add(subscription)
+            subscription._loop = loop  # noqa
+
+    def _remove(self, loop: t.Optional[asyncio.AbstractEventLoop], subscription: Subscription):
+        subscribers = self._subscribers.get(loop)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[loop]
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._remove(subscription._loop, subscription)  # noqa
+            subscription._close()  # noqa
+
+    def publish(self, data: t.Any = '', event: t.Optional[str] = None, id: t.Optional[str] = None,  # noqa
+                retry: t.Optional[int] = None) -> ServerSentEvent:
+        """发布事件，保留历史事件时没有指定id会自动生成递增的id"""
+        sse = data if isinstance(data, ServerSentEvent) else ServerSentEvent(data, event, id, retry)
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        with self._lock:
+            if self.history.maxlen:
+                if sse.id is None:
+                    self._next_id += 1
+                    sse.id = str(self._next_id)
+                self.history.append(sse)
+            # 在发布时编码，所有订阅者共用编码结果
+            sse.encode()
+            groups = []
+            for loop, subscribers in self._subscribers.items():
+                if loop is None:
+                    for subscription in subscribers:
+                        subscription._put(sse)  # noqa
+                else:
+                    groups.append((loop, list(subscribers)))
+
+        for loop, subscribers in groups:
+            if loop is current:
+                self._deliver(subscribers, sse)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(self._deliver, subscribers, sse)
+        return sse
+
+    @staticmethod
+    def _deliver(subscribers: t.List[Subscription], sse: ServerSentEvent):
+        for subscription in subscribers:
+            subscription._put(sse)  # noqa
+
+    def close(self):
+        """断开所有订阅者"""
+        with self._lock:
+            groups = dict(self._subscribers)
+            self._subscribers.clear()
+            for subscription in groups.pop(None, ()):
+                subscription._close()  # noqa
+        current = None
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        for loop, subscribers in groups.items():
+            for subscription in subscribers:
+                if loop is current:
+                    subscription._close()  # noqa
+                elif not loop.is_closed():
+                    loop.call_soon_threadsafe(subscription._close)  # noqa
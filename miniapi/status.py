@@ -1,3 +1,7 @@
+import sys
+import typing as t
+
+
 class HTTPStatus:
     # 1xx Informational
     CONTINUE = "100 Continue"
@@ -66,5 +70,22 @@ class HTTPStatus:
 
     @classmethod
     def values(cls):
-        return [
-            getattr(cls, attr) for attr in dir(cls) if not callable(getattr(cls, attr)) and not attr.startswith("__")]
+        return list(STATUS_LINES.values())
+
+
+# 状态码到状态行的映射 {404: '404 Not Found'}，只在导入时构建一次，状态行直接使用HTTPStatus中的字符串对象
+STATUS_LINES: t.Dict[int, str] = {
+    int(value[:3]): sys.intern(value) for name, value in vars(HTTPStatus).items() if name.isupper()}
+
+# 合法的状态行
+STATUS_LINE_SET: t.FrozenSet[str] = frozenset(STATUS_LINES.values())
+
+
+def status_line(status: t.Union[int, str]) -> str:
+    """状态码转换为预先构建好的状态行，状态行原样返回，未知的状态码抛出ValueError"""
+    if type(status) is int:
+        try:
+            return STATUS_LINES[status]
+        except KeyError:
+            raise ValueError(f'非法的HTTP状态码:{status}') from None
+    return status
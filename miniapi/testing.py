@@ -0,0 +1,162 @@
+"""测试工具
+
+TestClient不经过socket，使用构造的environ直接调用Application.wsgi_app，可以用于接口测试以及基准测试:
+
+    client = TestClient(app)
+    response = client.post('/users', json={'name': 'miniapi'}, headers={'Authorization': 'Bearer token'})
+    assert response.status_code == 200
+    assert response.json()['name'] == 'miniapi'
+"""
+import io
+import sys
+import typing as t
+from urllib.parse import urlencode
+
+from miniapi.codec import get_json_codec
+
+
+def make_environ(
+        path: str = '/',
+        method: str = 'GET',
+        query: str = '',
+        body: bytes = b'',
+        headers: t.Optional[dict] = None,
+        remote_addr: str = '127.0.0.1') -> dict:
+    """构造一个WSGI environ"""
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': '127.0.0.1',
+        'SERVER_PORT': '3334',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': remote_addr,
+        'CONTENT_LENGTH': str(len(body)) if body else '',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for key, value in (headers or {}).items():
+        key = key.upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = 'HTTP_' + key
+        environ[key] = value
+    return environ
+
+
+def start_response(status, headers, exc_info=None):
+    """不记录任何内容的start_response，用于只关心耗时的基准测试"""
+
+
+class TestResponse:
+    """TestClient返回的响应"""
+
+    # 避免pytest把这个类当作测试用例收集
+    __test__ = False
+
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: str, headers: t.List[t.Tuple[str, str]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def __repr__(self):
+        return f'<TestResponse {self.status}>'
+
+    @property
+    def status_code(self) -> int:
+        return int(self.status[:3])
+
+    @property
+    def text(self) -> str:
+        return self.body.decode('utf-8')
+
+    def json(self) -> t.Any:
+        return get_json_codec().loads(self.body)
+
+    def get_header(self, name: str, default: t.Optional[str] = None) -> t.Optional[str]:
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return default
+
+
+class TestClient:
+    """直接调用wsgi_app的测试客户端
+
+    headers为每个请求默认带上的请求头；响应体会被完整读取并关闭，流式响应也会在返回前读取完毕。
+    """
+
+    __test__ = False
+
+    def __init__(self, app, headers: t.Optional[dict] = None, remote_addr: str = '127.0.0.1'):
+        self.app = app
+        self.headers = dict(headers or {})
+        self.remote_addr = remote_addr
+
+    def request(
+            self,
+            method: str,
+            path: str,
+            query: t.Union[str, dict, None] = None,
+            headers: t.Optional[dict] = None,
+            body: t.Union[bytes, str, None] = None,
+            json: t.Any = None,
+            form: t.Optional[dict] = None) -> TestResponse:
+        """发送请求
+
+        :param path: 请求路径，可以带有查询字符串，例如/items?page=1
+        :param query: 查询字符串或者字典，与path中的查询字符串合并
+        :param body: 原始请求体
+        :param json: 使用当前配置的JSON后端序列化为请求体，并设置Content-Type
+        :param form: 编码为application/x-www-form-urlencoded请求体
+        """
+        headers = {**self.headers, **(headers or {})}
+        if json is not None:
+            body = get_json_codec().dumps(json)
+            headers.setdefault('Content-Type', 'application/json')
+        elif form is not None:
+            body = urlencode(form, doseq=True)
+            headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if isinstance(query, dict):
+            query = urlencode(query, doseq=True)
+        path, _, path_query = path.partition('?')
+        if path_query:
+            query = f'{path_query}&{query}' if query else path_query
+
+        environ = make_environ(path, method.upper(), query or '', body or b'', headers, self.remote_addr)
+        started = []
+
+        def _start_response(status, response_headers, exc_info=None):
+            started[:] = [status, response_headers]
+
+        result = self.app.wsgi_app(environ, _start_response)
+        try:
+            data = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return TestResponse(started[0], started[1], data)
+
+    def get(self, path: str, **kwargs) -> TestResponse:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> TestResponse:
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> TestResponse:
+        return self.request('PUT', path, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> TestResponse:
+        return self.request('PATCH', path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> TestResponse:
+        return self.request('DELETE', path, **kwargs)
@@ -0,0 +1,15 @@
+import pytest
+
+from miniapi import Application
+from miniapi.testing import TestClient
+
+
+@pytest.fixture
+def app(tmp_path):
+    (tmp_path / 'application.yaml').write_text('middlewares: []\n', encoding='utf-8')
+    return Application(__name__, root_path=str(tmp_path))
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
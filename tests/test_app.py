@@ -0,0 +1,33 @@
+import pytest
+
+from miniapi import Application
+from miniapi.middleware.compress import CompressionMiddleware
+from miniapi.middleware.logger import LoggerMiddleware
+
+
+def make_app(tmp_path, config: str) -> Application:
+    (tmp_path / 'application.yaml').write_text(config, encoding='utf-8')
+    return Application(__name__, root_path=str(tmp_path))
+
+
+def test_config_middleware_options(tmp_path):
+    app = make_app(tmp_path, (
+        'middlewares:\n'
+        '  - name: miniapi.middleware.logger:LoggerMiddleware\n'
+        '    demo_param: "*"\n'
+        '  - name: miniapi.middleware.compress:CompressionMiddleware\n'
+        '    options:\n'
+        '      min_size: 10\n'
+    ))
+    middlewares = list(app.middleware_mapper.values())
+    assert [type(m) for m in middlewares] == [LoggerMiddleware, CompressionMiddleware]
+    assert middlewares[1].min_size == 10
+
+
+def test_config_middleware_options_must_be_dict(tmp_path):
+    with pytest.raises(ValueError, match='options'):
+        make_app(tmp_path, (
+            'middlewares:\n'
+            '  - name: miniapi.middleware.compress:CompressionMiddleware\n'
+            '    options: 10\n'
+        ))
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+from miniapi.response import Response
+
+
+def asgi_request(app, method='GET', path='/', body=b'', chunks=None, headers=(), query=b''):
+    """以ASGI方式执行一个请求，chunks为分多次发送的请求体，返回(状态码, 响应头, 响应体分块)"""
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': True} for chunk in chunks or ()]
+    messages.append({'type': 'http.request', 'body': body, 'more_body': False})
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': [(k.lower().encode(), v.encode()) for k, v in headers]}
+    asyncio.run(app.asgi_app(scope, receive, send))
+    start = sent[0]
+    assert start['type'] == 'http.response.start'
+    assert not sent[-1].get('more_body', False)
+    response_headers = {k.decode().lower(): v.decode() for k, v in start['headers']}
+    return start['status'], response_headers, [m['body'] for m in sent[1:] if m['body']]
+
+
+def test_sync_and_async_handlers(app):
+    @app.get('/sync/{id:int}')
+    def sync(request):
+        return {'id': request.path_params['id'], 'page': request.query('page')}
+
+    @app.get('/async')
+    async def async_handler(request):
+        await asyncio.sleep(0)
+        return 'async'
+
+    status, headers, body = asgi_request(app, path='/sync/7', query=b'page=2')
+    assert status == 200
+    assert headers['content-type'].startswith('application/json')
+    assert json.loads(b''.join(body)) == {'id': 7, 'page': '2'}
+    assert asgi_request(app, path='/async')[2] == [b'async']
+    assert asgi_request(app, path='/missing')[0] == 404
+    assert asgi_request(app, method='POST', path='/async')[0] == 405
+
+
+def test_request_body_in_chunks(app):
+    @app.post('/echo')
+    def echo(request):
+        return request.get_json()
+
+    status, _, body = asgi_request(app, 'POST', '/echo', chunks=[b'{"a": ', b'[1, 2'], body=b']}',
+                                   headers=[('Content-Type', 'application/json')])
+    assert status == 200
+    assert json.loads(b''.join(body)) == {'a': [1, 2]}
+
+
+def test_body_too_large(app):
+    app.max_body_size = 4
+
+    @app.post('/echo')
+    def echo(request):
+        return request.data
+
+    assert asgi_request(app, 'POST', '/echo', body=b'1234')[2] == [b'1234']
+    assert asgi_request(app, 'POST', '/echo', chunks=[b'123'], body=b'45')[0] == 413
+
+
+def test_stream_body(app):
+    @app.post('/upload', stream_body=True)
+    async def upload(request):
+        size = 0
+        async for chunk in request.aiter_body():
+            size += len(chunk)
+        return {'size': size}
+
+    status, _, body = asgi_request(app, 'POST', '/upload', chunks=[b'a' * 10, b'b' * 5], body=b'c')
+    assert status == 200
+    assert json.loads(b''.join(body)) == {'size': 16}
+
+
+def test_streaming_response(app):
+    @app.get('/iter')
+    def sync_iter(request):
+        return Response(iter([b'a', b'b']))
+
+    @app.get('/aiter')
+    async def async_iter(request):
+        async def chunks():
+            yield b'c'
+            yield 'd'
+
+        return Response(chunks())
+
+    assert asgi_request(app, path='/iter')[2] == [b'a', b'b']
+    assert asgi_request(app, path='/aiter')[2] == [b'c', b'd']
+
+
+def test_lifespan_freezes_app(app):
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(app.asgi_app({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert app.frozen
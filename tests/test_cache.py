@@ -0,0 +1,60 @@
+import threading
+import time
+
+from miniapi.middleware.base import MiddlewareBase
+from miniapi.middleware.cache import CacheMiddleware
+from miniapi.response import Response
+
+
+class FailingMiddleware(MiddlewareBase):
+    def after_request(self, request, response):
+        raise RuntimeError('after_request failed')
+
+
+def test_cache_hit_skips_handler(app, client):
+    calls = []
+
+    @app.get('/items', middlewares=[CacheMiddleware(ttl=60)])
+    def items(request):
+        calls.append(1)
+        return 'items'
+
+    first, second = client.get('/items'), client.get('/items')
+    assert (first.status_code, second.status_code) == (200, 200)
+    assert second.text == 'items'
+    assert second.get_header('ETag') == first.get_header('ETag')
+    assert client.get('/items', headers={'If-None-Match': first.get_header('ETag')}).status_code == 304
+    assert len(calls) == 1
+
+
+def test_not_modified_has_no_entity_headers(app, client):
+    @app.get('/items', middlewares=[CacheMiddleware(ttl=60)])
+    def items(request):
+        return Response('items', headers={'Cache-Control': 'max-age=60', 'Vary': 'Accept', 'X-Trace': '1'})
+
+    etag = client.get('/items').get_header('ETag')
+    response = client.get('/items', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.body == b''
+    assert sorted(name for name, _ in response.headers) == ['Cache-Control', 'ETag', 'Vary']
+
+
+def test_flight_is_released_when_later_middleware_raises(app, client):
+    cache = CacheMiddleware(ttl=60, lock_timeout=10)
+
+    @app.get('/slow', middlewares=[cache, FailingMiddleware()])
+    def slow(request):
+        time.sleep(0.2)
+        return 'slow'
+
+    statuses = []
+    threads = [threading.Thread(target=lambda: statuses.append(client.get('/slow').status_code)) for _ in range(3)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 等待的请求不会一直等到lock_timeout
+    assert time.monotonic() - start < 5
+    assert statuses == [500, 500, 500]
+    assert not cache._flights  # noqa
@@ -0,0 +1,40 @@
+import pytest
+
+from miniapi.codec import make_json_codec
+
+BACKENDS = ['stdlib', 'orjson', 'ujson', 'msgspec']
+
+
+def codec_or_skip(backend):
+    try:
+        return make_json_codec(backend)
+    except ImportError:
+        pytest.skip(f'{backend}未安装')
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_portable_kwargs(backend):
+    codec = codec_or_skip(backend)
+    body = codec.dumps({'b': '中', 'a': 1}, ensure_ascii=False, sort_keys=True, indent=2)
+    assert codec.loads(body) == {'a': 1, 'b': '中'}
+    assert body.index(b'"a"') < body.index(b'"b"')
+    assert '中'.encode('utf-8') in body
+    assert b'\n' in body
+    assert codec.loads(codec.dumps({'value': object()}, default=lambda _: 'x')) == {'value': 'x'}
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_unknown_kwargs_are_rejected(backend):
+    codec = codec_or_skip(backend)
+    with pytest.raises(TypeError, match='ensure_asci'):
+        codec.dumps({}, ensure_asci=False)
+    with pytest.raises(TypeError):
+        codec.encoder(ensure_asci=False)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_encoder(backend):
+    codec = codec_or_skip(backend)
+    dumps = codec.encoder(sort_keys=True)
+    assert codec.loads(dumps({'b': 1, 'a': 2})) == {'a': 2, 'b': 1}
+    assert dumps({'b': 1, 'a': 2}).index(b'"a"') < dumps({'b': 1, 'a': 2}).index(b'"b"')
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from miniapi.objects.columns import Columns, _to_array
+
+ROWS = [
+    {'id': 1, 'name': 'a', 'score': 3.5},
+    {'id': 2, 'name': 'b', 'score': None},
+    {'id': 3, 'name': 'c', 'score': 1.0},
+    {'id': 4, 'name': 'd', 'score': None},
+]
+
+
+@pytest.mark.parametrize('use_numpy', [False, None])
+def test_sort_with_none(use_numpy):
+    columns = Columns.from_rows(ROWS, use_numpy=use_numpy)
+    assert columns.sort('score').get('id') == [3, 1, 2, 4]
+    assert columns.sort('score', reverse=True).get('id') == [1, 3, 2, 4]
+
+
+@pytest.mark.parametrize('use_numpy', [False, None])
+def test_where_and_group_by(use_numpy):
+    columns = Columns.from_rows(ROWS, use_numpy=use_numpy)
+    assert list(columns.where('id', '>', 2).get('name')) == ['c', 'd']
+    assert list(columns.where('name', 'in', ['a', 'd']).get('id')) == [1, 4]
+    assert {k: len(v) for k, v in columns.group_by('score').items()} == {3.5: 1, None: 2, 1.0: 1}
+
+
+def test_mixed_columns_round_trip():
+    rows = [{'flag': True, 'n': 1.5}, {'flag': 1, 'n': True}, {'flag': 2, 'n': 2}]
+    columns = Columns.from_rows(rows)
+    assert json.loads(columns.to_json()) == rows
+    assert [type(v) for v in columns.to_rows()[1].values()] == [int, bool]
+
+
+def test_homogeneous_columns_become_arrays():
+    numpy = pytest.importorskip('numpy')
+    assert isinstance(_to_array([True, False]), numpy.ndarray)
+    assert _to_array([1, 2.5]).dtype.kind == 'f'
+    for values in ([True, 1, 2], [False, 1.5], [1, None], [1, '2']):
+        assert _to_array(values) is values
@@ -0,0 +1,24 @@
+import gzip
+
+from miniapi.middleware.compress import CompressionMiddleware
+from miniapi.response import Response
+
+
+def test_cache_does_not_mix_routes_with_same_etag(app, client):
+    compression = CompressionMiddleware(min_size=10, encodings=['gzip'], cache_size=16)
+    app.add_middlewares(compression)
+
+    # 两个路由使用相同的ETag以及相同长度的响应体
+    @app.get('/a')
+    def a(request):
+        return Response('a' * 100, headers=[('ETag', '"v1"')], content_type='text/plain')
+
+    @app.get('/b')
+    def b(request):
+        return Response('b' * 100, headers=[('ETag', '"v1"')], content_type='text/plain')
+
+    headers = {'Accept-Encoding': 'gzip'}
+    for path, char in (('/a', b'a'), ('/b', b'b'), ('/a', b'a')):
+        response = client.get(path, headers=headers)
+        assert response.get_header('Content-Encoding') == 'gzip'
+        assert gzip.decompress(response.body) == char * 100
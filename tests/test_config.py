@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from miniapi import config
+from miniapi.config import _SetupConfig
+
+YAML = 'socket:\n  port: 4000\nmiddlewares: []\n'
+
+
+@pytest.fixture
+def root_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, '_compiled_configs', {})
+    monkeypatch.setattr(config.sys, 'dont_write_bytecode', False)
+    monkeypatch.setattr(config.sys, 'pycache_prefix', None)
+    root = tmp_path / 'project'
+    root.mkdir()
+    (root / 'application.yaml').write_text(YAML, encoding='utf-8')
+    return root
+
+
+def test_cache_written_next_to_config(root_path):
+    assert _SetupConfig(str(root_path)).get_socket_info()[1] == 4000
+    assert (root_path / '__pycache__' / 'application.yaml.cache').is_file()
+
+
+def test_cache_dir(root_path, tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setattr(_SetupConfig, 'CACHE_DIR', str(cache_dir))
+    _SetupConfig(str(root_path))
+    assert not (root_path / '__pycache__').exists()
+    expected = os.path.join(str(cache_dir), str(root_path).lstrip(os.sep), 'application.yaml.cache')
+    assert os.path.isfile(expected)
+
+    # 进程内缓存清空后从缓存文件读取
+    monkeypatch.setattr(config, '_compiled_configs', {})
+    assert _SetupConfig(str(root_path)).get_socket_info()[1] == 4000
+
+
+def test_unwritable_cache_dir_is_ignored(root_path):
+    # __pycache__是普通文件时无法创建缓存目录，与只读目录一样
+    (root_path / '__pycache__').write_text('', encoding='utf-8')
+    assert _SetupConfig(str(root_path)).get_socket_info()[1] == 4000
+    assert not list(root_path.glob('**/*.tmp'))
+
+
+def test_dont_write_bytecode(root_path, monkeypatch):
+    monkeypatch.setattr(config.sys, 'dont_write_bytecode', True)
+    _SetupConfig(str(root_path))
+    assert not (root_path / '__pycache__').exists()
+
+
+def test_prefork_workers_default_to_cpu_count(root_path, monkeypatch):
+    (root_path / 'application.yaml').write_text('socket:\n  prefork: true\n', encoding='utf-8')
+    assert _SetupConfig(str(root_path)).get_prefork_options()['workers'] == (os.cpu_count() or 1)
+
+    # 项目自带的application.yaml不固定工作进程数
+    monkeypatch.setattr(config.sys, 'dont_write_bytecode', True)
+    shipped = _SetupConfig(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert 'workers' not in shipped.config['socket']
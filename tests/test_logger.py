@@ -0,0 +1,85 @@
+import json
+import logging
+
+from miniapi.middleware.logger import JsonFormatter, LoggerMiddleware
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_app(app, middleware):
+    app.add_middlewares(middleware)
+
+    @app.get('/ping')
+    def ping(request):
+        return 'pong'
+
+
+def test_records_go_through_logger(app, client):
+    logger = logging.getLogger('test.access.filters')
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.addFilter(lambda record: '/ping' in record.getMessage())
+    make_app(app, LoggerMiddleware(fmt='json', logger_name=logger.name))
+
+    client.get('/ping')
+    client.get('/missing')
+    assert [record.access['path'] for record in handler.records] == ['/ping']
+
+    logger.setLevel(logging.WARNING)
+    client.get('/ping')
+    assert len(handler.records) == 1
+
+
+def test_user_handler_formatter_is_kept():
+    handler = ListHandler()
+    formatter = logging.Formatter('%(message)s')
+    handler.setFormatter(formatter)
+    LoggerMiddleware(fmt='json', handler=handler, logger_name='test.access.formatter')
+    assert handler.formatter is formatter
+    assert handler in logging.getLogger('test.access.formatter').handlers
+
+
+def test_default_handler():
+    # 不使用pytest在根logger上添加的handler
+    logging.getLogger('test.access.default').propagate = False
+    middleware = LoggerMiddleware(fmt='json', logger_name='test.access.default')
+    assert isinstance(middleware.handler.formatter, JsonFormatter)
+    assert middleware.logger.level == logging.INFO
+
+
+def test_background_uses_logger_handlers(app, client):
+    logger = logging.getLogger('test.access.background')
+    handler = ListHandler()
+    logger.addHandler(handler)
+    middleware = LoggerMiddleware(fmt='logfmt', background=True, logger_name=logger.name)
+    assert logger.handlers == [middleware.writer.queue_handler]
+    make_app(app, middleware)
+
+    client.get('/ping')
+    middleware.writer.stop()
+    assert [json.dumps(record.access['status']) for record in handler.records] == ['200']
+
+
+def test_background_without_own_handlers(app, client, capsys):
+    parent = logging.getLogger('test.access.inherit')
+    parent_handler = ListHandler()
+    parent.addHandler(parent_handler)
+    logger = logging.getLogger('test.access.inherit.child')
+    middleware = LoggerMiddleware(fmt='json', background=True, logger_name=logger.name)
+    assert middleware.writer is not None
+    assert logger.handlers == [middleware.writer.queue_handler]
+    assert middleware.writer.handlers == (middleware.handler,)
+    assert logger.propagate is False
+    make_app(app, middleware)
+
+    client.get('/ping')
+    middleware.writer.stop()
+    assert parent_handler.records == []
+    assert json.loads(capsys.readouterr().err)['path'] == '/ping'
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from miniapi.metrics import Metrics
+from miniapi.route import Endpoint
+
+
+def handler(request):
+    return None
+
+
+def test_route_labels_and_status_classes(app, client):
+    app.enable_metrics(buckets=[0.5, 60])
+
+    @app.get('/users/{id:int}')
+    def user(request):
+        if request.path_params['id'] == 0:
+            raise ValueError('boom')
+        return 'user'
+
+    for path in ('/users/1', '/users/2', '/users/0', '/missing'):
+        client.get(path)
+    text = client.get('/metrics').text
+
+    labels = 'method="GET",route="/users/{id:int}"'
+    assert f'miniapi_requests_total{{{labels}}} 3' in text
+    assert f'miniapi_responses_total{{{labels},status="2xx"}} 2' in text
+    assert f'miniapi_responses_total{{{labels},status="5xx"}} 1' in text
+    assert 'miniapi_requests_total{method="",route="<not_found>"} 1' in text
+    assert f'miniapi_request_duration_seconds_bucket{{{labels},le="60"}} 3' in text
+    assert f'miniapi_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f'miniapi_request_duration_seconds_count{{{labels}}} 3' in text
+    assert f'miniapi_requests_in_flight{{{labels}}} 0' in text
+
+
+def test_shards_are_summed():
+    metrics = Metrics(buckets=[1])
+    endpoint = Endpoint(handler, rule='/a', method='GET')
+
+    def work():
+        for _ in range(100):
+            metrics.finish(metrics.start(endpoint), '200 OK')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    token = metrics.start(endpoint)
+    text = metrics.render()
+    assert 'miniapi_requests_total{method="GET",route="/a"} 400' in text
+    assert 'miniapi_requests_in_flight{method="GET",route="/a"} 1' in text
+    metrics.finish(token, '999 Unknown')
+    assert 'miniapi_responses_total{method="GET",route="/a",status="other"} 1' in metrics.render()
+
+
+def test_invalid_buckets():
+    with pytest.raises(ValueError):
+        Metrics(buckets=[0, 1])
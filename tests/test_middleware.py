@@ -0,0 +1,142 @@
+from miniapi.middleware.base import MiddlewareBase
+from miniapi.response import Response
+
+
+def recording(name: str, calls: list) -> MiddlewareBase:
+    """创建记录调用顺序的中间件，uni_name为类名，每个中间件使用单独的类"""
+
+    def before_request(self, request):
+        calls.append(f'before:{name}')
+        return request
+
+    def after_request(self, request, response):
+        calls.append(f'after:{name}')
+        return response
+
+    cls = type(name, (MiddlewareBase,), {'before_request': before_request, 'after_request': after_request})
+    return cls()
+
+
+def test_chain_order(app, client):
+    calls = []
+    app.add_middlewares(recording('A', calls))
+    app.add_middlewares(recording('B', calls))
+
+    @app.get('/ping', middlewares=[recording('C', calls)])
+    def ping(request):
+        calls.append('handler')
+        return 'pong'
+
+    assert client.get('/ping').text == 'pong'
+    # 请求后局部中间件倒序执行，全局中间件按注册顺序执行
+    assert calls == ['before:A', 'before:B', 'before:C', 'handler', 'after:C', 'after:A', 'after:B']
+
+
+def test_forbidden_global_middleware(app, client):
+    calls = []
+    app.add_middlewares(recording('A', calls))
+    app.add_middlewares(recording('B', calls))
+
+    @app.get('/ping', forbidden=['A'])
+    def ping(request):
+        return 'pong'
+
+    client.get('/ping')
+    assert calls == ['before:B', 'after:B']
+
+
+def test_chain_recompiled_when_middleware_added(app, client):
+    calls = []
+
+    @app.get('/ping')
+    def ping(request):
+        return 'pong'
+
+    client.get('/ping')
+    assert calls == []
+    app.add_middlewares(recording('A', calls))
+    client.get('/ping')
+    # 未匹配到路由的请求也只执行全局中间件
+    assert client.get('/missing').status_code == 404
+    assert calls == ['before:A', 'after:A', 'before:A', 'after:A']
+
+
+def test_async_middleware_marks_endpoint_async(app, client):
+    class AsyncMiddleware(MiddlewareBase):
+        async def before_request(self, request):
+            request.state['async'] = True
+            return request
+
+    @app.get('/sync')
+    def sync(request):
+        return {'async': request.state.get('async', False)}
+
+    mapper = app._handlers_mapper  # noqa
+    endpoint = mapper.routes['/sync'].endpoints['GET']
+    assert not endpoint.is_async
+    app.add_middlewares(AsyncMiddleware())
+    assert endpoint.is_async
+    assert client.get('/sync').json() == {'async': True}
+
+
+class Deny(MiddlewareBase):
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    def before_request(self, request):
+        self.calls.append('before:Deny')
+        if request.get_header('X-Allow') is None:
+            return Response('denied', 403)
+        return request
+
+    def after_request(self, request, response):
+        self.calls.append('after:Deny')
+        return response
+
+
+def test_before_request_short_circuits(app, client):
+    calls = []
+    app.add_middlewares(recording('A', calls))
+    app.add_middlewares(Deny(calls))
+
+    @app.get('/ping', middlewares=[recording('C', calls)])
+    def ping(request):
+        calls.append('handler')
+        return 'pong'
+
+    response = client.get('/ping')
+    assert (response.status_code, response.text) == (403, 'denied')
+    # 返回Response的中间件以及之前执行过的中间件执行请求后处理，之后的中间件以及接口函数不执行
+    assert calls == ['before:A', 'before:Deny', 'after:A', 'after:Deny']
+
+    calls.clear()
+    assert client.get('/ping', headers={'X-Allow': '1'}).text == 'pong'
+    assert calls == ['before:A', 'before:Deny', 'before:C', 'handler', 'after:C', 'after:A', 'after:Deny']
+
+
+def test_local_middleware_short_circuits(app, client):
+    calls = []
+    app.add_middlewares(recording('A', calls))
+
+    @app.get('/ping', middlewares=[Deny(calls), recording('C', calls)])
+    def ping(request):
+        calls.append('handler')
+        return 'pong'
+
+    assert client.get('/ping').status_code == 403
+    assert calls == ['before:A', 'before:Deny', 'after:Deny', 'after:A']
+
+
+def test_async_before_request_short_circuits(app, client):
+    class AsyncDeny(MiddlewareBase):
+        async def before_request(self, request):
+            return Response('async denied', 401)
+
+    app.add_middlewares(AsyncDeny())
+
+    @app.get('/ping')
+    def ping(request):
+        return 'pong'
+
+    response = client.get('/ping')
+    assert (response.status_code, response.text) == (401, 'async denied')
@@ -0,0 +1,87 @@
+import dataclasses
+import typing as t
+
+import pytest
+
+from miniapi.exc import ValidationError
+from miniapi.params import Body, Path, Query
+
+
+@dataclasses.dataclass
+class Item:
+    name: str
+    price: float
+    tags: t.List[str] = dataclasses.field(default_factory=list)
+
+
+def test_path_query_and_body(app, client):
+    @app.post('/shops/{shop_id:int}/items')
+    def create_item(request, shop_id: int, item: Item, dry_run: bool = False, page: t.Optional[int] = None):
+        return {'shop_id': shop_id, 'item': dataclasses.asdict(item), 'dry_run': dry_run, 'page': page}
+
+    response = client.post('/shops/3/items?dry_run=yes', json={'name': 'pen', 'price': 2, 'tags': ['a']})
+    assert response.status_code == 200
+    assert response.json() == {'shop_id': 3, 'item': {'name': 'pen', 'price': 2.0, 'tags': ['a']},
+                               'dry_run': True, 'page': None}
+
+
+def test_validation_errors(app, client):
+    @app.post('/items')
+    def create_item(request, item: Item, page: int):
+        return 'ok'
+
+    response = client.post('/items?page=x', json={'price': 'free', 'tags': ['a', 1]})
+    assert response.status_code == 422
+    assert sorted(tuple(error['loc']) for error in response.json()['detail']) == [
+        ('body', 'name'), ('body', 'price'), ('body', 'tags', 1), ('query', 'page')]
+
+    response = client.post('/items?page=1', body=b'{', headers={'Content-Type': 'application/json'})
+    assert response.json()['detail'][0]['type'] == 'json_invalid'
+    assert client.post('/items?page=1').json()['detail'][0] == {'loc': ['body'], 'msg': '缺少请求体', 'type': 'missing'}
+
+
+def test_markers_and_lists(app, client):
+    @app.post('/search')
+    def search(request, tag: t.List[str] = Query(alias='t'), limit: int = Body(10), query: str = Body()):
+        return {'tags': tag, 'limit': limit, 'query': query}
+
+    assert client.post('/search?t=a&t=b', json={'query': 'q'}).json() == {'tags': ['a', 'b'], 'limit': 10,
+                                                                          'query': 'q'}
+    response = client.post('/search?t=a', json=['q'])
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['type'] == 'dict_type'
+
+
+def test_unannotated_parameters_are_not_injected(app, client):
+    @app.get('/items/{id:int}')
+    def item(request, id: int, extra=None):  # noqa
+        return {'id': id, 'extra': extra}
+
+    assert client.get('/items/5?extra=1').json() == {'id': 5, 'extra': None}
+
+
+def test_invalid_signatures(app):
+    with pytest.raises(AssertionError):
+        @app.get('/items/{id}')
+        def by_id(request, id: t.Dict[str, int]):  # noqa
+            return 'ok'
+
+    with pytest.raises(AssertionError):
+        @app.get('/items')
+        def missing_path(request, id: int = Path()):  # noqa
+            return 'ok'
+
+    with pytest.raises(AssertionError):
+        @app.post('/upload', stream_body=True)
+        def upload(request, item: Item):
+            return 'ok'
+
+
+def test_handler_validation_error_becomes_422(app, client):
+    @app.get('/check')
+    def check(request, x: int = 0):
+        raise ValidationError([{'loc': ['query', 'x'], 'msg': 'bad', 'type': 'custom'}])
+
+    response = client.get('/check')
+    assert response.status_code == 422
+    assert response.json() == {'detail': [{'loc': ['query', 'x'], 'msg': 'bad', 'type': 'custom'}]}
@@ -0,0 +1,70 @@
+import sys
+
+import pytest
+
+from miniapi.middleware.base import MiddlewareBase
+from miniapi.testing import make_environ, start_response
+
+
+def failing_start_response(status, headers, exc_info=None):
+    raise OSError('client disconnected')
+
+
+@pytest.fixture
+def profiled_app(app, tmp_path):
+    app.enable_profiling(threshold=0, profile_rate=1, profile_dir=str(tmp_path / 'profiles'))
+
+    @app.get('/ping')
+    def ping(request):
+        return 'pong'
+
+    return app
+
+
+def test_profile_released_when_dispatch_raises(profiled_app):
+    with pytest.raises(OSError):
+        profiled_app(make_environ('/ping'), failing_start_response)
+    assert sys.getprofile() is None
+    assert not profiled_app.profiler._profile_lock.locked()  # noqa
+
+    body = profiled_app(make_environ('/ping'), start_response)
+    assert b''.join(body) == b'pong'
+    body.close()
+    assert profiled_app.profiler.slow_requests[-1]['profile'] is not None
+
+
+def test_phases_are_recorded(profiled_app):
+    body = profiled_app(make_environ('/ping'), start_response)
+    b''.join(body)
+    body.close()
+    phases = [phase['phase'] for phase in profiled_app.profiler.slow_requests[-1]['phases']]
+    assert phases == ['parse', 'handler', 'serialize', 'write']
+
+
+def test_middleware_phases_and_teardown(profiled_app):
+    class Tracked(MiddlewareBase):
+        torn_down = 0
+
+        def teardown_request(self, request):
+            Tracked.torn_down += 1
+
+    profiled_app.add_middlewares(Tracked())
+    body = profiled_app(make_environ('/ping'), start_response)
+    b''.join(body)
+    body.close()
+    phases = [phase['phase'] for phase in profiled_app.profiler.slow_requests[-1]['phases']]
+    assert phases == ['parse', 'before:Tracked', 'handler', 'after:Tracked', 'serialize', 'write']
+    assert Tracked.torn_down == 1
+
+
+def test_async_route_phases(profiled_app):
+    @profiled_app.get('/async')
+    async def async_ping(request):
+        return 'pong'
+
+    body = profiled_app(make_environ('/async', query='a=1'), start_response)
+    assert b''.join(body) == b'pong'
+    body.close()
+    sample = profiled_app.profiler.slow_requests[-1]
+    assert [phase['phase'] for phase in sample['phases']] == ['parse', 'handler', 'serialize', 'write']
+    assert (sample['method'], sample['path'], sample['query'], sample['status']) == ('GET', '/async', 'a=1', '200 OK')
@@ -0,0 +1,91 @@
+import pytest
+
+from miniapi.middleware.ratelimit import (MemoryRateLimitBackend, RateLimitMiddleware, SlidingWindow,
+                                          TokenBucket)
+from miniapi.testing import TestClient
+
+
+def apply_all(algorithm, times):
+    state, decisions = None, []
+    for now in times:
+        state, decision = algorithm.apply(state, now)
+        decisions.append(decision)
+    return decisions
+
+
+def test_token_bucket():
+    decisions = apply_all(TokenBucket(rate=1, burst=2), [0, 0, 0, 0.5, 1.0])
+    assert [d.allowed for d in decisions] == [True, True, False, False, True]
+    assert decisions[2].retry_after == pytest.approx(1.0)
+    assert decisions[3].retry_after == pytest.approx(0.5)
+
+
+def test_sliding_window():
+    decisions = apply_all(SlidingWindow(limit=2, period=10), [1, 2, 3, 10, 15, 15])
+    # 第二个窗口开始时上一个窗口的2个请求仍然全部计入，过了一半后只计入1个
+    assert [d.allowed for d in decisions] == [True, True, False, False, True, False]
+    assert decisions[2].retry_after == pytest.approx(7)
+
+
+def test_middleware_limits_per_client(app):
+    app.add_middlewares(RateLimitMiddleware(limit=2, period=60))
+
+    @app.get('/ping')
+    def ping(request):
+        return 'pong'
+
+    client, other = TestClient(app), TestClient(app, remote_addr='10.0.0.2')
+    assert [client.get('/ping').status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get('/ping')
+    assert response.get_header('Retry-After') == '30'
+    assert response.get_header('RateLimit-Limit') == '2'
+    assert other.get('/ping').status_code == 200
+
+
+def test_header_key_and_per_route(app, client):
+    limiter = RateLimitMiddleware(limit=1, period=60, key='header:X-Api-Key', per_route=True)
+    app.add_middlewares(limiter)
+
+    @app.get('/a')
+    def a(request):
+        return 'a'
+
+    @app.get('/b')
+    def b(request):
+        return 'b'
+
+    headers = {'X-Api-Key': 'k1'}
+    assert client.get('/a', headers=headers).status_code == 200
+    assert client.get('/a', headers=headers).status_code == 429
+    assert client.get('/b', headers=headers).status_code == 200
+    # 没有key的请求不限流
+    assert [client.get('/a').status_code for _ in range(3)] == [200, 200, 200]
+
+
+def test_memory_backend_evicts_oldest_keys():
+    backend = MemoryRateLimitBackend(shards=1, max_keys=2)
+    algorithm = TokenBucket(rate=1e-6, burst=1)
+    for key in ('a', 'b', 'c'):
+        assert backend.hit(key, algorithm).allowed
+    assert len(backend) == 2
+    assert backend.hit('a', algorithm).allowed
+    assert not backend.hit('c', algorithm).allowed
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    backend = f'sqlite:{tmp_path / "ratelimit.db"}'
+    first = RateLimitMiddleware(limit=2, period=60, key='global', backend=backend)
+    second = RateLimitMiddleware(limit=2, period=60, key='global', backend=backend)
+    algorithm = first.algorithm
+    decisions = [first.backend.hit('k', algorithm), second.backend.hit('k', algorithm),
+                 first.backend.hit('k', algorithm)]
+    assert [d.allowed for d in decisions] == [True, True, False]
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        RateLimitMiddleware(algorithm='leaky')
+    with pytest.raises(ValueError):
+        RateLimitMiddleware(key='cookie')
+    with pytest.raises(ValueError):
+        RateLimitMiddleware(backend='redis://localhost')
@@ -0,0 +1,102 @@
+import io
+
+import pytest
+
+from miniapi.exc import HTTPException
+from miniapi.request import Request
+from miniapi.testing import make_environ
+
+
+class UnreadableInput(io.RawIOBase):
+    """读取时报错的wsgi.input，用于确认请求体没有被提前读取"""
+
+    def read(self, size=-1):
+        raise AssertionError('请求体不应该被读取')
+
+
+def test_nothing_parsed_until_accessed():
+    environ = make_environ('/items', query='a=1', headers={'X-Token': 'abc'})
+    environ['wsgi.input'] = UnreadableInput()
+    environ['CONTENT_LENGTH'] = '10'
+    request = Request(environ)
+    assert (request.method, request.path, request.query_string) == ('GET', '/items', 'a=1')
+    assert request._headers is None and request._query_params is None  # noqa
+
+    assert request.get_header('x-token') == 'abc'
+    assert request.headers is request.headers
+    assert request.query('a') == '1'
+    assert request.query_params is request.query_params
+    assert request.content_length == 10
+
+
+def test_body_and_json_are_cached():
+    environ = make_environ('/', 'POST', body=b'{"a": 1}', headers={'Content-Type': 'application/json'})
+    request = Request(environ)
+    data = request.data
+    assert data == b'{"a": 1}'
+    assert request.data is data
+    assert request.body == '{"a": 1}'
+    json_value = request.get_json()
+    assert json_value == {'a': 1}
+    assert request.get_json() is json_value
+
+
+def test_get_json_requires_json_content_type_and_valid_body():
+    request = Request(make_environ('/', 'POST', body=b'{"a": 1}', headers={'Content-Type': 'text/plain'}))
+    assert request.get_json() is None
+    request = Request(make_environ('/', 'POST', body=b'{"a": ', headers={'Content-Type': 'application/json'}))
+    assert request.get_json() is None
+
+
+def test_state_and_missing_values():
+    request = Request(make_environ('/'))
+    assert request.query('missing', 'x') == 'x'
+    assert request.get_header('missing') is None
+    assert request.content_length is None
+    assert request.data == b''
+    request.state['user'] = 1
+    assert request.state == {'user': 1}
+
+
+def test_body_stream_stops_at_content_length():
+    environ = make_environ('/', 'POST', body=b'abcdef')
+    environ['CONTENT_LENGTH'] = '4'
+    request = Request(environ)
+    assert list(request.iter_body(chunk_size=3)) == [b'abc', b'd']
+    assert request.stream.read(10) == b''
+
+
+def test_readinto_and_spool():
+    request = Request(make_environ('/', 'POST', body=b'abcdef'))
+    buffer = bytearray(4)
+    assert request.readinto(buffer) == 4
+    assert buffer == b'abcd'
+    file = request.spool(max_memory_size=1)
+    assert file.read() == b'ef'
+
+
+def test_chunked_body_is_limited():
+    # 分块传输编码时没有Content-Length，读取到输入流结束为止，累计超过限制时抛出413
+    environ = make_environ('/', 'POST', body=b'x' * 10)
+    environ['CONTENT_LENGTH'] = ''
+    environ['wsgi.input_terminated'] = True
+    assert Request(environ).data == b'x' * 10
+    environ['wsgi.input'].seek(0)
+    with pytest.raises(HTTPException) as exc_info:
+        _ = Request(environ, max_body_size=5).data
+    assert exc_info.value.status.startswith('413')
+
+
+def test_declared_body_too_large(app, client):
+    app.max_body_size = 4
+    calls = []
+
+    @app.post('/upload')
+    def upload(request):
+        calls.append(1)
+        return request.data
+
+    assert client.post('/upload', body=b'1234').body == b'1234'
+    response = client.post('/upload', body=b'12345')
+    assert response.status_code == 413
+    assert calls == [1]
@@ -0,0 +1,227 @@
+import http.client
+import json
+import threading
+from wsgiref.util import FileWrapper
+
+import pytest
+
+from miniapi.exc import HTTPException
+from miniapi.headers import Headers
+from miniapi.httpserver.handler import WSGIRequestHandler
+from miniapi.httpserver.server import PooledWSGIServer
+from miniapi.response import (FileStreamResponse, JsonResponse, NDJSONResponse, Response, StreamingJsonResponse,
+                              error_response)
+from miniapi.status import HTTPStatus, status_line
+
+
+def test_status_line():
+    assert status_line(404) is HTTPStatus.NOT_FOUND
+    assert status_line('299 Custom') == '299 Custom'
+    with pytest.raises(ValueError):
+        status_line(999)
+
+
+def test_response_status():
+    assert Response('', 201).status == HTTPStatus.CREATED
+    with pytest.raises(ValueError):
+        Response('', 999)
+
+
+def test_http_exception_status():
+    assert HTTPException(404).status == HTTPException(HTTPStatus.NOT_FOUND).status
+    with pytest.raises(KeyError):
+        HTTPException(999)
+    with pytest.raises(KeyError):
+        HTTPException('299 Custom')
+
+
+def test_single_content_type():
+    response = JsonResponse({'a': 1}, headers=[('content-type', 'application/problem+json')])
+    assert response.headers.get_all('Content-Type') == ['application/problem+json']
+
+
+def read_body(response, environ=None):
+    body = response.prepare(environ or {})
+    try:
+        return b''.join(body)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(bytes(range(256)) * 1024)
+    return path
+
+
+def test_file_response_streams_in_chunks(data_file):
+    response = FileStreamResponse(data_file)
+    body = response.prepare({})
+    assert not isinstance(body, list)
+    assert response.headers.get('Content-Length') == str(256 * 1024)
+    assert response.headers.get('Content-Disposition') == 'attachment; filename="data.bin"'
+    assert b''.join(body) == data_file.read_bytes()
+
+
+def test_file_response_uses_file_wrapper(data_file):
+    response = FileStreamResponse(data_file)
+    body = response.prepare({'wsgi.file_wrapper': FileWrapper})
+    assert isinstance(body, FileWrapper)
+    body.close()
+
+
+@pytest.mark.parametrize('range_header, expected, content_range', [
+    ('bytes=0-9', slice(0, 10), 'bytes 0-9/262144'),
+    ('bytes=262140-', slice(262140, None), 'bytes 262140-262143/262144'),
+    ('bytes=-4', slice(-4, None), 'bytes 262140-262143/262144'),
+])
+def test_file_response_range(data_file, range_header, expected, content_range):
+    response = FileStreamResponse(data_file)
+    body = read_body(response, {'HTTP_RANGE': range_header})
+    assert response.status == HTTPStatus.PARTIAL_CONTENT
+    assert response.headers.get('Content-Range') == content_range
+    assert body == data_file.read_bytes()[expected]
+    assert response.headers.get('Content-Length') == str(len(body))
+
+
+def test_range_not_satisfiable_and_ignored(data_file):
+    response = FileStreamResponse(data_file)
+    assert read_body(response, {'HTTP_RANGE': 'bytes=300000-'}) == b''
+    assert response.status == HTTPStatus.RANGE_NOT_SATISFIABLE
+    assert response.headers.get('Content-Range') == 'bytes */262144'
+
+    # 多个范围不支持，返回完整内容
+    response = FileStreamResponse(b'abcdef', filename='a.txt')
+    assert read_body(response, {'HTTP_RANGE': 'bytes=0-1,3-4'}) == b'abcdef'
+    assert response.status == HTTPStatus.OK
+
+
+def test_iterator_body_has_no_content_length():
+    def chunks():
+        yield 'a'
+        yield b''
+        yield bytearray(b'b')
+
+    response = Response(chunks())
+    assert read_body(response) == b'ab'
+    assert response.headers.get('Content-Length') is None
+
+
+def test_file_slice_via_server(data_file):
+    # 内置服务使用sendfile发送文件以及文件中的一段
+    def app(environ, start_response):
+        response = FileStreamResponse(data_file)
+        body = response.prepare(environ)
+        start_response(response.status, response.headers.to_list())
+        return body
+
+    server = PooledWSGIServer(('127.0.0.1', 0), WSGIRequestHandler, workers=1)
+    server.set_app(app)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    try:
+        conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+        conn.request('GET', '/')
+        assert conn.getresponse().read() == data_file.read_bytes()
+        conn.request('GET', '/', headers={'Range': 'bytes=1000-1999'})
+        response = conn.getresponse()
+        assert response.status == 206
+        assert response.read() == data_file.read_bytes()[1000:2000]
+        conn.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join(5)
+
+
+def test_streaming_json_array(app, client):
+    closed = []
+
+    def rows(count):
+        try:
+            for i in range(count):
+                yield {'id': i, 'b': 1, 'a': 2}
+        finally:
+            closed.append(count)
+
+    @app.get('/rows/{count:int}')
+    def stream_rows(request):
+        return StreamingJsonResponse(rows(request.path_params['count']), chunk_size=64, sort_keys=True)
+
+    response = client.get('/rows/100')
+    assert response.get_header('Content-Type') == 'application/json'
+    assert response.get_header('Content-Length') is None
+    assert response.json() == [{'a': 2, 'b': 1, 'id': i} for i in range(100)]
+    assert response.text.startswith('[{"a": 2, "b": 1, "id": 0}')
+    assert client.get('/rows/0').json() == []
+    assert closed == [100, 0]
+
+
+def test_streaming_json_chunks():
+    response = StreamingJsonResponse(iter(range(100)), chunk_size=32)
+    chunks = list(response.prepare({}))
+    # 第一个元素立即输出，之后累计到chunk_size输出一次
+    assert chunks[0] == b'[0'
+    assert all(len(chunk) >= 32 for chunk in chunks[1:-1])
+    assert json.loads(b''.join(chunks)) == list(range(100))
+
+
+def test_ndjson_sync_and_async(app, client):
+    async def agen():
+        for i in range(3):
+            yield {'n': i}
+
+    @app.get('/sync')
+    def sync(request):
+        return NDJSONResponse([{'n': i} for i in range(3)])
+
+    @app.get('/async')
+    async def async_stream(request):
+        return NDJSONResponse(agen())
+
+    for path in ('/sync', '/async'):
+        response = client.get(path)
+        assert response.get_header('Content-Type') == 'application/x-ndjson'
+        assert response.text == '{"n": 0}\n{"n": 1}\n{"n": 2}\n'
+
+
+def test_headers_case_insensitive():
+    headers = Headers([('Content-Type', 'text/plain'), ('X-A', '1')])
+    headers.set('content-type', 'application/json')
+    headers.add('Set-Cookie', 'a=1')
+    headers.append(('set-cookie', 'b=2'))
+    assert headers.get('CONTENT-TYPE') == 'application/json'
+    assert headers.to_list() == [('content-type', 'application/json'), ('X-A', '1'),
+                                 ('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2')]
+    assert len(headers) == 4
+    assert headers.setdefault('x-a', '2') == '1'
+    copied = headers.copy()
+    copied.add('Set-Cookie', 'c=3')
+    assert headers.get_all('Set-Cookie') == ['a=1', 'b=2']
+
+
+def test_response_is_slotted():
+    response = Response('body')
+    with pytest.raises(AttributeError):
+        response.extra = 1  # noqa
+    assert response.status_code == 200
+    assert response.asgi_headers() == [(b'content-type', b'text/html')]
+
+
+def test_error_responses_are_shared_and_frozen():
+    shared = error_response(404, shared=True)
+    assert shared is error_response(HTTPStatus.NOT_FOUND, shared=True)
+    assert shared.prepare({}) == [b'']
+    assert shared.headers.to_list() == [('Content-Type', 'text/html'), ('Content-Length', '0')]
+    with pytest.raises(AttributeError):
+        shared.status = HTTPStatus.OK
+    with pytest.raises(TypeError):
+        shared.headers.set('X-A', '1')
+
+    response = error_response(404)
+    assert response is not shared
+    response.add_header('X-A', '1')
+    assert shared.headers.get('X-A') is None
+    assert error_response(418).status == HTTPStatus.IM_A_TEAPOT
@@ -0,0 +1,101 @@
+import pytest
+
+from miniapi.route import HandlerMapper
+
+
+def handler(request):
+    return None
+
+
+def _mapper(*rules, method='GET'):
+    mapper = HandlerMapper()
+    for rule in rules:
+        mapper.add(rule, method, handler)
+    return mapper
+
+
+def test_static_route():
+    mapper = _mapper('/', '/users', '/users/me')
+    for path in ('/', '/users', '/users/me'):
+        endpoint, params = mapper.resolve('GET', path)
+        assert endpoint.rule == path
+        assert params == {}
+
+
+def test_converter_priority():
+    mapper = _mapper('/items/{id:int}', '/items/{price:float}', '/items/{slug}')
+    assert mapper.resolve('GET', '/items/12') == (mapper.routes['/items/{id:int}'].endpoints['GET'], {'id': 12})
+    endpoint, params = mapper.resolve('GET', '/items/1.5')
+    assert endpoint.rule == '/items/{price:float}'
+    assert params == {'price': 1.5}
+    endpoint, params = mapper.resolve('GET', '/items/abc')
+    assert endpoint.rule == '/items/{slug}'
+    assert params == {'slug': 'abc'}
+
+
+def test_static_before_param():
+    mapper = _mapper('/users/{name}', '/users/me')
+    assert mapper.resolve('GET', '/users/me')[0].rule == '/users/me'
+    assert mapper.resolve('GET', '/users/bob') == (mapper.routes['/users/{name}'].endpoints['GET'], {'name': 'bob'})
+
+
+def test_path_catch_all():
+    mapper = _mapper('/static/{filename:path}')
+    endpoint, params = mapper.resolve('GET', '/static/css/site.css')
+    assert endpoint.rule == '/static/{filename:path}'
+    assert params == {'filename': 'css/site.css'}
+    assert mapper.resolve('GET', '/static/')[0] is mapper.not_found
+
+
+def test_backtracking():
+    # 静态分支 /a/b 在下一段匹配失败后，回退到参数分支 /a/{x}/c
+    mapper = _mapper('/a/b/d', '/a/{x}/c')
+    endpoint, params = mapper.resolve('GET', '/a/b/c')
+    assert endpoint.rule == '/a/{x}/c'
+    assert params == {'x': 'b'}
+
+    # int分支下一段匹配失败后，回退到str分支
+    mapper = _mapper('/files/{id:int}/raw', '/files/{name}/meta')
+    endpoint, params = mapper.resolve('GET', '/files/1/meta')
+    assert endpoint.rule == '/files/{name}/meta'
+    assert params == {'name': '1'}
+
+
+def test_not_found_and_method_not_allowed():
+    mapper = _mapper('/users/{id:int}')
+    assert mapper.resolve('GET', '/users/x')[0] is mapper.not_found
+    assert mapper.resolve('GET', '/nothing')[0] is mapper.not_found
+    assert mapper.resolve('POST', '/users/1')[0] is mapper.method_not_allowed
+
+
+def test_same_converter_shares_node():
+    mapper = _mapper('/users/{id}')
+    mapper.add('/users/{id}/posts', 'GET', handler)
+    mapper.add('/users/{id}', 'POST', handler)
+    endpoint, params = mapper.resolve('POST', '/users/x')
+    assert endpoint.method == 'POST'
+    assert params == {'id': 'x'}
+    assert mapper.resolve('GET', '/users/x/posts')[0].rule == '/users/{id}/posts'
+
+
+def test_param_name_conflict():
+    mapper = _mapper('/users/{id}')
+    with pytest.raises(AssertionError, match='路由规则冲突'):
+        mapper.add('/users/{name}', 'POST', handler)
+    with pytest.raises(AssertionError, match='路由规则冲突'):
+        mapper.add('/users/{name}/posts', 'GET', handler)
+    # 不同转换器的参数可以同名也可以不同名
+    mapper.add('/users/{uid:int}', 'GET', handler)
+
+
+def test_invalid_rules():
+    mapper = HandlerMapper()
+    with pytest.raises(AssertionError):
+        mapper.add('/users/{id:uuid}', 'GET', handler)
+    with pytest.raises(AssertionError):
+        mapper.add('/files/{p:path}/raw', 'GET', handler)
+    with pytest.raises(AssertionError):
+        mapper.add('/a/{x}/{x}', 'GET', handler)
+    mapper.add('/static/{a:path}', 'GET', handler)
+    with pytest.raises(AssertionError, match='路由规则冲突'):
+        mapper.add('/static/{b:path}', 'GET', handler)
@@ -0,0 +1,117 @@
+import http.client
+import socket
+import threading
+import time
+
+import pytest
+
+from miniapi.httpserver.handler import WSGIRequestHandler
+from miniapi.httpserver.server import PooledWSGIServer
+
+WORKERS = 2
+TIMEOUT = 0.5
+
+
+def hello_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', '5')])
+    return [b'hello']
+
+
+@pytest.fixture
+def server(request):
+    options = dict(workers=WORKERS, request_timeout=TIMEOUT, keep_alive_timeout=TIMEOUT)
+    options.update(getattr(request, 'param', {}))
+    server = PooledWSGIServer(('127.0.0.1', 0), WSGIRequestHandler, **options)
+    server.set_app(hello_app)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(5)
+
+
+def get(server, path='/'):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def test_idle_connections_do_not_starve_workers(server):
+    idle = [socket.create_connection(server.server_address) for _ in range(WORKERS)]
+    try:
+        # 等待空闲连接占满所有工作线程
+        time.sleep(0.1)
+        start = time.monotonic()
+        assert get(server) == (200, b'hello')
+        assert time.monotonic() - start < 4
+    finally:
+        for sock in idle:
+            sock.close()
+
+
+def test_slow_headers_are_timed_out(server):
+    sock = socket.create_connection(server.server_address)
+    try:
+        sock.settimeout(5)
+        # 只发送请求行，不发送请求头
+        sock.sendall(b'GET / HTTP/1.1\r\n')
+        start = time.monotonic()
+        assert sock.recv(1024) == b''
+        assert time.monotonic() - start < 4
+    finally:
+        sock.close()
+
+
+def test_idle_keep_alive_connection_is_closed(server):
+    sock = socket.create_connection(server.server_address)
+    try:
+        sock.settimeout(5)
+        sock.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        response = b''
+        while not response.endswith(b'hello'):
+            response += sock.recv(1024)
+        assert response.startswith(b'HTTP/1.1 200')
+        # 长连接上不再发送请求，空闲超时后服务端关闭连接
+        start = time.monotonic()
+        assert sock.recv(1024) == b''
+        assert time.monotonic() - start < 4
+    finally:
+        sock.close()
+
+
+@pytest.mark.parametrize('server', [{'request_timeout': 30}], indirect=True)
+def test_first_request_waits_for_keep_alive_timeout(server):
+    sock = socket.create_connection(server.server_address)
+    try:
+        sock.settimeout(5)
+        # 连接后不发送请求，在空闲超时而不是读取请求的超时后关闭
+        start = time.monotonic()
+        assert sock.recv(1024) == b''
+        assert time.monotonic() - start < 4
+    finally:
+        sock.close()
+
+
+def not_modified_app(environ, start_response):
+    start_response('304 Not Modified', [('ETag', '"v1"')])
+    return [b'']
+
+
+def test_not_modified_keeps_connection(server):
+    server.set_app(not_modified_app)
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        for _ in range(2):
+            conn.request('GET', '/')
+            response = conn.getresponse()
+            assert response.status == 304
+            assert response.read() == b''
+            assert response.getheader('Connection') is None
+            assert response.getheader('Content-Length') is None
+    finally:
+        conn.close()
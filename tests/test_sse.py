@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from miniapi.sse import HEARTBEAT, Broadcaster, EventStreamResponse, ServerSentEvent, encode_event
+
+
+def test_encode_event():
+    assert encode_event('a\nb', event='update', id='3', retry=1000) == \
+        b'id: 3\nevent: update\nretry: 1000\ndata: a\ndata: b\n\n'
+    assert encode_event({'x': 1}) == b'data: {"x": 1}\n\n'
+    assert encode_event('') == b'data: \n\n'
+    with pytest.raises(ValueError):
+        encode_event('a', event='bad\nevent')
+
+
+def test_sync_source_with_heartbeats():
+    response = EventStreamResponse(iter(['a', None, ServerSentEvent('b', id='1')]), retry=500)
+    assert response.headers.get('Content-Type') == 'text/event-stream; charset=utf-8'
+    assert response.headers.get('Cache-Control') == 'no-cache'
+    assert list(response.prepare({})) == [b'retry: 500\n\n', b'data: a\n\n', HEARTBEAT, b'id: 1\ndata: b\n\n']
+
+
+async def collect(response, receive=None, limit=None):
+    chunks = []
+    body = response.prepare({'miniapi.receive': receive} if receive else {})
+    async for chunk in body:
+        chunks.append(chunk)
+        if limit is not None and len(chunks) >= limit:
+            await body.aclose()
+            break
+    return chunks
+
+
+def test_async_source_heartbeat_and_batching():
+    async def source():
+        yield 'a'
+        yield 'b'
+        await asyncio.sleep(0.05)
+        yield 'c'
+
+    chunks = asyncio.run(collect(EventStreamResponse(source(), heartbeat=0.01)))
+    data = b''.join(chunks)
+    assert data.startswith(HEARTBEAT)
+    assert HEARTBEAT in data[len(HEARTBEAT):]
+    assert data.replace(HEARTBEAT, b'') == b'data: a\n\ndata: b\n\ndata: c\n\n'
+
+
+def test_disconnect_ends_stream():
+    hub = Broadcaster()
+
+    async def run():
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        task = asyncio.ensure_future(collect(EventStreamResponse(hub.subscribe(), heartbeat=None), receive))
+        await asyncio.sleep(0.01)
+        hub.publish('a')
+        await asyncio.sleep(0.01)
+        disconnected.set()
+        return await asyncio.wait_for(task, 1)
+
+    assert b''.join(asyncio.run(run())) == HEARTBEAT + b'data: a\n\n'
+    assert len(hub) == 0
+
+
+def test_broadcast_history_replay():
+    hub = Broadcaster(history=3)
+    for i in range(5):
+        hub.publish({'n': i})
+    assert [event.id for event in hub.history] == ['3', '4', '5']
+
+    async def take(subscription, count):
+        return [(await subscription.__anext__()).data for _ in range(count)]
+
+    subscription = hub.subscribe(last_event_id='4')
+    hub.publish({'n': 5})
+    assert asyncio.run(take(subscription, 2)) == [{'n': 4}, {'n': 5}]
+    # 未知的Last-Event-ID补发所有保留的事件
+    assert asyncio.run(take(hub.subscribe(last_event_id='unknown'), 3)) == [{'n': 3}, {'n': 4}, {'n': 5}]
+
+
+def test_slow_subscriber_drops_oldest():
+    hub = Broadcaster(max_queue=2)
+    subscription = hub.subscribe()
+    for i in range(4):
+        hub.publish(i)
+
+    async def take():
+        return [(await subscription.__anext__()).data for _ in range(2)]
+
+    assert asyncio.run(take()) == [2, 3]
+    assert subscription.dropped == 2
+
+
+def test_slow_subscriber_closed():
+    hub = Broadcaster(max_queue=2, overflow='close')
+    subscription = hub.subscribe()
+    for i in range(3):
+        hub.publish(i)
+
+    async def drain():
+        return [event async for event in subscription]
+
+    assert asyncio.run(drain()) == []
+    assert subscription.dropped == 1
+
+
+def test_publish_from_another_thread():
+    hub = Broadcaster()
+
+    async def run():
+        subscription = hub.subscribe()
+        waiting = asyncio.ensure_future(subscription.__anext__())
+        await asyncio.sleep(0)
+        await asyncio.get_running_loop().run_in_executor(None, hub.publish, 'threaded')
+        event = await asyncio.wait_for(waiting, 1)
+        await subscription.aclose()
+        return event.data
+
+    assert asyncio.run(run()) == 'threaded'
+    assert len(hub) == 0
@@ -0,0 +1,43 @@
+import itertools
+
+import pytest
+
+from miniapi.objects import DataObjects
+
+ROWS = [{'id': 1, 'name': 'a', 'password': 'x'}, {'id': 2, 'password': 'y'}, {'id': 3, 'name': 'c'}]
+
+
+def test_iter_helpers_match_list_versions():
+    assert list(DataObjects.iter_get(ROWS, 'name')) == DataObjects.o_get(ROWS, 'name')
+    assert list(DataObjects.iter_get(ROWS, 'name', ignore=True)) == ['a', 'c']
+    rows = [[1, 2], [], [3]]
+    assert list(DataObjects.iter_index(rows, 0, default=0)) == DataObjects.o_index(rows, 0, default=0)
+
+
+def test_iter_drop_does_not_modify_rows():
+    dropped = list(DataObjects.iter_drop(ROWS, ['password']))
+    assert dropped == [{'id': 1, 'name': 'a'}, {'id': 2}, {'id': 3, 'name': 'c'}]
+    assert ROWS[0]['password'] == 'x'
+
+
+def test_stream_is_lazy():
+    consumed = []
+
+    def rows():
+        for i in itertools.count():
+            consumed.append(i)
+            yield {'id': i, 'secret': i}
+
+    pipeline = DataObjects.o_stream(rows()).filter(lambda r: r['id'] % 2 == 0).drop('secret').limit(3)
+    assert consumed == []
+    assert pipeline.collect() == [{'id': 0}, {'id': 2}, {'id': 4}]
+    assert consumed == [0, 1, 2, 3, 4]
+
+
+def test_stream_pipeline():
+    assert DataObjects.o_stream(ROWS).pluck('id', 'name').collect() == [
+        {'id': 1, 'name': 'a'}, {'id': 2, 'name': None}, {'id': 3, 'name': 'c'}]
+    assert list(DataObjects.o_stream(ROWS).get('id').map(str).batch(2)) == [['1', '2'], ['3']]
+    assert DataObjects.o_stream([(1,), (2,)]).index(0).collect() == [1, 2]
+    with pytest.raises(ValueError):
+        DataObjects.o_stream(ROWS).batch(0).collect()
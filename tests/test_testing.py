@@ -0,0 +1,19 @@
+def test_query_string_in_path(app, client):
+    @app.get('/items')
+    def items(request):
+        return {'page': request.query('page'), 'size': request.query('size'), 'tags': request.query_params.get('tag')}
+
+    response = client.get('/items?page=2')
+    assert response.status_code == 200
+    assert response.json() == {'page': '2', 'size': None, 'tags': None}
+
+    response = client.get('/items?page=2&tag=a', query={'size': 10, 'tag': 'b'})
+    assert response.json() == {'page': '2', 'size': '10', 'tags': ['a', 'b']}
+
+
+def test_json_body(app, client):
+    @app.post('/echo')
+    def echo(request):
+        return request.get_json()
+
+    assert client.post('/echo', json={'a': [1, 2]}).json() == {'a': [1, 2]}